@@ -0,0 +1,46 @@
+"""
+Compare the byte pair key decoding of `parse_json_file_to_dict` against the
+previous `ast.literal_eval` based object_hook on a synthetic file.
+
+Usage: python -m benchmarks.bench_key_decoding [n_ciphersuites] [n_byte_pairs]
+"""
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+from benchmarks.synthetic import write_profiling_json_file
+from utils.utils import parse_json_file_to_dict, parse_json_to_internal_dict
+
+
+def parse_with_literal_eval(path):
+    with open(path, 'r') as json_file:
+        return json.load(json_file, object_hook=parse_json_to_internal_dict)
+
+
+def main(n_ciphersuites=100, n_byte_pairs=2000, repeat=3):
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        write_profiling_json_file(path, n_ciphersuites, n_byte_pairs)
+        size_mb = os.path.getsize(path) / float(1 << 20)
+
+        assert parse_with_literal_eval(path) == parse_json_file_to_dict(path)
+
+        old = min(timeit.repeat(lambda: parse_with_literal_eval(path),
+                                number=1, repeat=repeat))
+        new = min(timeit.repeat(lambda: parse_json_file_to_dict(path),
+                                number=1, repeat=repeat))
+    finally:
+        os.remove(path)
+
+    print('file: {:.1f} MB, {} ciphersuites x {} byte pairs x 2 entities'.format(
+                                        size_mb, n_ciphersuites, n_byte_pairs))
+    print('literal_eval object_hook: {:.3f}s'.format(old))
+    print('BytePairKeyDecoder:       {:.3f}s'.format(new))
+    print('speedup:                  {:.1f}x'.format(old / new))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,227 @@
+"""
+Time and memory of the analyzer stages on synthetic files of growing sizes,
+saved as JSON to compare runs and spot regressions.
+
+Usage: python -m benchmarks.bench_suite [--scales small,medium]
+           [--output results.json] [--baseline previous.json] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy
+
+from benchmarks.synthetic import write_profiling_json_file
+from data.models import Defaults, EncryptionData, EncryptionDataContainer
+from utils.utils import parse_json_file_to_dict, write_excel_to_file
+
+# name: generate_profiling_data arguments
+SCALES = {
+    'tiny': dict(n_ciphersuites=4, n_byte_pairs=50),
+    'small': dict(n_ciphersuites=20, n_byte_pairs=500),
+    'medium': dict(n_ciphersuites=60, n_byte_pairs=2000, n_functions=2),
+    'samples': dict(n_ciphersuites=20, n_byte_pairs=1000, n_samples=10),
+    'large': dict(n_ciphersuites=150, n_byte_pairs=5000, n_functions=2),
+}
+DEFAULT_SCALES = ('small', 'medium', 'samples')
+
+# memory of the built functions (retained) and while building them (peak),
+#  in bytes per profiling value (a result, or a sample), once the fixed
+#  overheads are amortized (from the small scale up)
+RETAINED_BYTES_PER_VALUE_TARGET = 16
+PEAK_BYTES_PER_VALUE_TARGET = 32
+
+
+def measure(fn, repeat=3, setup=None):
+    """
+    Return (best time of `repeat` runs of `fn`, peak traced memory of one
+    run) in (seconds, bytes). `setup` is called before each run, outside
+    of the measures, and its result passed to `fn`.
+    """
+    setup = setup or (lambda: None)
+    best = float('inf')
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+
+    arg = setup()
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def _new_container(json_path):
+    return EncryptionDataContainer(json_path,
+                                   Defaults.DEFAULT_BYTES_SENT_LABEL,
+                                   Defaults.DEFAULT_BYTES_RECEIVED_LABEL,
+                                   Defaults.default_ciphersuite_label)
+
+
+def _build_all(container):
+    container.parse()
+    for entity in container.get_entities():
+        for function in container.get_functions(entity):
+            container.get_entity(entity, function)
+
+
+def measure_memory_per_value(json_path):
+    """
+    {'retained': ..., 'peak': ...} traced bytes per profiling value of
+    parsing `json_path` and building every function.
+    """
+    tracemalloc.start()
+    try:
+        ed = EncryptionData(json_path)
+        n_values = 0
+        for entity in ed.get_entities():
+            for function in ed.get_functions(entity):
+                entity_data = ed.get_data(entity, function)
+                values = entity_data.samples
+                if values is None:
+                    values = entity_data.profiling_results
+                n_values += values.size
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'retained': retained / n_values, 'peak': peak / n_values}
+
+
+def _without_byte_orders(ed):
+    """
+    `ed` with its cached byte orders dropped, so that its rows are sorted
+    again.
+    """
+    ed._byte_orders.clear()
+    return ed
+
+
+def bench_scale(json_path, out_dir, repeat=3):
+    """
+    {stage: {'seconds': ..., 'peak_memory': ...}} of every stage on
+    `json_path`.
+    """
+    ed = EncryptionData(json_path)
+    result_rows = list(ed.iter_xlxs_result_rows('client', 'sent'))
+    xlsx_path = os.path.join(out_dir, 'result.xlsx')
+
+    stages = [
+        ('parse_json_file_to_dict',
+         lambda _: parse_json_file_to_dict(json_path), None),
+        ('EncryptionDataContainer.parse',
+         lambda container: container.parse(),
+         lambda: _new_container(json_path)),
+        ('EncryptionDataContainer.parse+build',
+         _build_all, lambda: _new_container(json_path)),
+        ('iter_xlxs_result_rows',
+         lambda ed: list(ed.iter_xlxs_result_rows('client', 'sent')),
+         lambda: _without_byte_orders(ed)),
+        ('write_excel_to_file',
+         lambda _: write_excel_to_file(result_rows, xlsx_path), None),
+    ]
+
+    results = {}
+    for name, fn, setup in stages:
+        seconds, peak = measure(fn, repeat, setup)
+        results[name] = {'seconds': seconds, 'peak_memory': peak}
+    return results
+
+
+def run_suite(scales=DEFAULT_SCALES, repeat=3, seed=0):
+    out_dir = tempfile.mkdtemp()
+    try:
+        report = {
+            'meta': {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'numpy': numpy.__version__,
+                'platform': platform.platform(),
+                'repeat': repeat,
+                'seed': seed,
+            },
+            'scales': {},
+        }
+        for scale in scales:
+            params = SCALES[scale]
+            json_path = os.path.join(out_dir, '{}.json'.format(scale))
+            write_profiling_json_file(json_path, seed=seed, **params)
+            report['scales'][scale] = {
+                'params': params,
+                'file_size': os.path.getsize(json_path),
+                'stages': bench_scale(json_path, out_dir, repeat),
+                'memory_per_value': measure_memory_per_value(json_path),
+            }
+            os.remove(json_path)
+        return report
+    finally:
+        shutil.rmtree(out_dir)
+
+
+def print_report(report, baseline=None):
+    for scale, scale_report in report['scales'].items():
+        print('{} ({:.1f} MB, {})'.format(scale, scale_report['file_size'] / 2 ** 20,
+                                          scale_report['params']))
+        baseline_stages = {}
+        if baseline is not None:
+            baseline_stages = baseline['scales'].get(scale, {}).get('stages', {})
+        for stage, measures in scale_report['stages'].items():
+            line = '  {:38} {:9.4f}s {:9.1f} MB'.format(
+                        stage, measures['seconds'], measures['peak_memory'] / 2 ** 20)
+            previous = baseline_stages.get(stage)
+            if previous and previous['seconds'] > 0:
+                line += '  ({:+.0%} time, {:+.0%} memory)'.format(
+                    measures['seconds'] / previous['seconds'] - 1,
+                    measures['peak_memory'] / max(previous['peak_memory'], 1) - 1)
+            print(line)
+        memory = scale_report.get('memory_per_value')
+        if memory is not None:
+            print('  {:38} {:6.1f} B retained (target {}), {:.1f} B peak '
+                  '(target {})'.format('memory per value', memory['retained'],
+                                       RETAINED_BYTES_PER_VALUE_TARGET,
+                                       memory['peak'],
+                                       PEAK_BYTES_PER_VALUE_TARGET))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the analyzer stages')
+    parser.add_argument('--scales', type=str, default=','.join(DEFAULT_SCALES),
+                        help='comma separated scales among: {}'.format(
+                                                        ', '.join(SCALES)))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None,
+                        help='JSON file to save the results to')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='JSON results of a previous run to compare to')
+    args = parser.parse_args(argv)
+
+    scales = args.scales.split(',')
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error('unknown scales: {}'.format(', '.join(unknown)))
+
+    report = run_suite(scales, args.repeat, args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+"""
+Generator of synthetic profiling JSON files, in the same layout as the
+ones produced by the mbedTLS profiling harness. The output only depends on
+the parameters and the seed.
+"""
+import json
+import random
+
+ENTITIES = ('client', 'server')
+FUNCTIONS = ('mbedtls_ssl_write', 'mbedtls_ssl_read', 'mbedtls_ssl_handshake')
+
+KEY_EXCHANGES = ('RSA', 'DHE-RSA', 'ECDHE-RSA', 'ECDHE-ECDSA', 'PSK', 'ECDH-RSA')
+CIPHERS = (
+    # (name, cycles per byte)
+    ('AES-128-GCM-SHA256', 18),
+    ('AES-256-GCM-SHA384', 22),
+    ('AES-128-CBC-SHA256', 30),
+    ('AES-256-CBC-SHA', 35),
+    ('CAMELLIA-128-GCM-SHA256', 40),
+    ('CAMELLIA-256-GCM-SHA384', 48),
+    ('CHACHA20-POLY1305-SHA256', 12),
+    ('ARIA-128-GCM-SHA256', 55),
+    ('3DES-EDE-CBC-SHA', 120),
+    ('RC4-128-SHA', 15),
+)
+BLOCK_SIZE = 16
+
+
+def ciphersuite_names(n_ciphersuites):
+    """
+    `n_ciphersuites` distinct names, combining the key exchanges and
+    ciphers, numbered once every combination is used.
+    """
+    names = []
+    for i in range(n_ciphersuites):
+        cipher, _ = CIPHERS[i % len(CIPHERS)]
+        key_exchange = KEY_EXCHANGES[(i // len(CIPHERS)) % len(KEY_EXCHANGES)]
+        suffix = i // (len(CIPHERS) * len(KEY_EXCHANGES))
+        names.append('TLS-{}-WITH-{}{}'.format(key_exchange, cipher,
+                                              '-{}'.format(suffix) if suffix else ''))
+    return names
+
+
+def generate_byte_pairs(n_byte_pairs, rng):
+    """
+    Distinct (bytes sent, bytes received) pairs, sizes spread over a log
+    scale up to 16 KiB (the maximum TLS record size).
+    """
+    pairs = set()
+    while len(pairs) < n_byte_pairs:
+        pairs.add((int(2 ** rng.uniform(0, 14)), int(2 ** rng.uniform(0, 14))))
+    return sorted(pairs, key=lambda pair: rng.random())
+
+
+def generate_profiling_data(n_ciphersuites, n_byte_pairs, seed=0,
+                            entities=ENTITIES, n_functions=1, n_samples=None):
+    """
+    {entity: {function: {ciphersuite: {"(sent, received)": cycles}}}} with
+    cycles growing linearly with the padded number of bytes, plus noise.
+    With `n_samples`, each byte pair maps to a list of samples instead.
+    """
+    rng = random.Random(seed)
+    names = ciphersuite_names(n_ciphersuites)
+    functions = [FUNCTIONS[i] if i < len(FUNCTIONS) else 'function_{}'.format(i)
+                 for i in range(n_functions)]
+
+    data = {}
+    for entity in entities:
+        data[entity] = {}
+        for function in functions:
+            byte_pairs = generate_byte_pairs(n_byte_pairs, rng)
+            keys = ['({}, {})'.format(sent, received)
+                    for sent, received in byte_pairs]
+            ciphersuites = {}
+            for i, name in enumerate(names):
+                overhead = rng.randint(2000, 20000)
+                _, cost = CIPHERS[i % len(CIPHERS)]
+                ciphersuite = {}
+                for key, (sent, received) in zip(keys, byte_pairs):
+                    padded = -(-(sent + received) // BLOCK_SIZE) * BLOCK_SIZE
+                    expected = overhead + cost * padded
+                    if n_samples is None:
+                        ciphersuite[key] = int(rng.gauss(expected, expected * 0.02))
+                    else:
+                        ciphersuite[key] = [int(rng.gauss(expected, expected * 0.02))
+                                            for _ in range(n_samples)]
+                ciphersuites[name] = ciphersuite
+            data[entity][function] = ciphersuites
+    return data
+
+
+def write_profiling_json_file(path, n_ciphersuites, n_byte_pairs, seed=0,
+                              **kwargs):
+    """
+    Write `generate_profiling_data` to `path`, see its keyword arguments.
+    """
+    with open(path, 'w') as json_file:
+        json.dump(generate_profiling_data(n_ciphersuites, n_byte_pairs, seed,
+                                          **kwargs),
+                  json_file)
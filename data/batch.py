@@ -0,0 +1,101 @@
+"""
+Batch processing of many profiling JSON files across a process pool.
+"""
+import glob
+import os
+import time
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+class BatchResult(object):
+
+    def __init__(self, json_path, output, elapsed, error=None):
+        self._json_path = json_path
+        self._output = output
+        self._elapsed = elapsed
+        self._error = error
+
+    @property
+    def json_path(self):
+        return self._json_path
+
+    @property
+    def output(self):
+        return self._output
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def ok(self):
+        return self._error is None
+
+
+def expand_json_paths(path):
+    """
+    Return the sorted JSON files of a directory, or the files matching a glob.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, '*.json')
+    return sorted(glob.glob(path))
+
+
+def _output_paths(json_paths, out_dir, ext):
+    """
+    Output path of every file, keeping its directory relative to the common
+    directory of the files, so that files of the same name in different
+    directories (e.g. runs/*/edat.json) do not overwrite each other.
+    """
+    directories = [os.path.dirname(os.path.abspath(path)) for path in json_paths]
+    root = os.path.commonpath(directories) if directories else ''
+    return [os.path.normpath(os.path.join(
+                out_dir, os.path.relpath(directory, root),
+                os.path.splitext(os.path.basename(json_path))[0] + ext))
+            for json_path, directory in zip(json_paths, directories)]
+
+
+def _process_file(job, json_path, output):
+    start = time.perf_counter()
+    try:
+        job(json_path, output)
+    except Exception:
+        return BatchResult(json_path, output, time.perf_counter() - start,
+                           traceback.format_exc())
+    return BatchResult(json_path, output, time.perf_counter() - start)
+
+
+def process_batch(json_paths, out_dir, job, jobs=None, ext='.xlsx'):
+    """
+    Run `job(json_path, output_path)` for every file, `jobs` at a time
+    (defaults to the number of CPUs), yielding a `BatchResult` per file as
+    they complete. `job` must be picklable, e.g. a module level function or
+    a functools.partial of one. A failing file does not stop the batch.
+    """
+    tasks = list(zip(json_paths, _output_paths(json_paths, out_dir, ext)))
+    os.makedirs(out_dir, exist_ok=True)
+    for _, output in tasks:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+
+    if jobs == 1:
+        for json_path, output in tasks:
+            yield _process_file(job, json_path, output)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(_process_file, job, json_path, output):
+                   (json_path, output) for json_path, output in tasks}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception:
+                # the worker itself died (e.g. killed when out of memory)
+                json_path, output = futures[future]
+                yield BatchResult(json_path, output, None,
+                                  traceback.format_exc())
@@ -0,0 +1,135 @@
+"""
+On-disk cache of the parsed profiling data.
+
+The arrays of each section (an entity's function) are stored as one .npy
+file each, so that they can be memory mapped on load instead of
+re-decoding the JSON file. Every source file gets its own cache entry,
+invalidated when the file size or modification time (and optionally its
+contents hash) change.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from collections import OrderedDict
+
+import numpy
+
+
+def file_fingerprint(path, hash_contents=False):
+    """
+    Size and modification time of a file and, with `hash_contents`, the
+    SHA-256 of its contents.
+    """
+    stat = os.stat(path)
+    fingerprint = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+    if hash_contents:
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as json_file:
+            for chunk in iter(lambda: json_file.read(1 << 20), b''):
+                sha256.update(chunk)
+        fingerprint['sha256'] = sha256.hexdigest()
+    return fingerprint
+
+
+class ParsedDataCache(object):
+
+    VERSION = 3
+    DEFAULT_DIR_NAME = '.edat_cache'
+    METADATA_FILENAME = 'metadata.json'
+    ARRAY_NAMES = ('bytes_sent', 'bytes_received', 'ciphersuites',
+                   'profiling_results')
+
+    def __init__(self, cache_dir=None, hash_contents=False, mmap=True):
+        """
+        `cache_dir` defaults to a directory next to each JSON file. With
+        `hash_contents` the entries are also validated against a SHA-256 of
+        the file, which is safer but reads the whole file on every load.
+        """
+        self._cache_dir = cache_dir
+        self._hash_contents = hash_contents
+        self._mmap_mode = 'r' if mmap else None
+
+    def _entry_dir(self, json_path):
+        json_path = os.path.abspath(json_path)
+        cache_dir = self._cache_dir
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(json_path),
+                                     self.DEFAULT_DIR_NAME)
+        path_digest = hashlib.sha1(json_path.encode('utf-8')).hexdigest()
+        return os.path.join(cache_dir, path_digest)
+
+    def fingerprint(self, json_path):
+        fingerprint = file_fingerprint(json_path, self._hash_contents)
+        fingerprint['version'] = self.VERSION
+        return fingerprint
+
+    def load(self, json_path):
+        """
+        Return {(entity, function): {array name: array}} for `json_path`, or
+        None if there is no valid cache entry for it.
+        """
+        entry_dir = self._entry_dir(json_path)
+        try:
+            with open(os.path.join(entry_dir, self.METADATA_FILENAME)) as meta_file:
+                metadata = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+        if metadata.get('fingerprint') != self.fingerprint(json_path):
+            return None
+
+        sections = OrderedDict()
+        try:
+            for index, (entity, function, names) in enumerate(metadata['sections']):
+                sections[(entity, function)] = {
+                    name: numpy.load(os.path.join(entry_dir,
+                                                  '{}_{}.npy'.format(index, name)),
+                                     mmap_mode=self._mmap_mode,
+                                     allow_pickle=False)
+                    for name in names}
+        except (OSError, ValueError, KeyError):
+            return None
+        return sections
+
+    def store(self, json_path, sections):
+        """
+        Store {(entity, function): {array name: array}} for `json_path`.
+        Every section must have the `ARRAY_NAMES` arrays, and may have
+        others. The entry is written to a temporary directory first and then
+        moved in place.
+        """
+        entry_dir = self._entry_dir(json_path)
+        parent_dir = os.path.dirname(entry_dir)
+        os.makedirs(parent_dir, exist_ok=True)
+
+        tmp_dir = tempfile.mkdtemp(dir=parent_dir)
+        try:
+            metadata_sections = []
+            for index, ((entity, function), arrays) in enumerate(sections.items()):
+                for name, array in arrays.items():
+                    numpy.save(os.path.join(tmp_dir,
+                                            '{}_{}.npy'.format(index, name)),
+                               array, allow_pickle=False)
+                metadata_sections.append([entity, function, list(arrays)])
+            metadata = {
+                'fingerprint': self.fingerprint(json_path),
+                'sections': metadata_sections,
+            }
+            with open(os.path.join(tmp_dir, self.METADATA_FILENAME), 'w') as meta_file:
+                json.dump(metadata, meta_file)
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # another process stored the same entry concurrently
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
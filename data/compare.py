@@ -0,0 +1,201 @@
+"""
+Comparison of the profiling results of several files (e.g. two builds of
+mbedTLS), aligned cell by cell, to find performance regressions.
+"""
+import numpy
+
+from collections import OrderedDict
+
+DEFAULT_THRESHOLD = 0.05
+
+
+def _first_seen_unique(values):
+    """
+    Return (unique values in order of first appearance, position of each
+    value in them).
+    """
+    _, first, inverse = numpy.unique(values, return_index=True,
+                                     return_inverse=True)
+    order = numpy.argsort(first, kind='stable')
+    positions = numpy.empty_like(order)
+    positions[order] = numpy.arange(len(order))
+    return values[numpy.sort(first)], positions[inverse.reshape(-1)]
+
+
+class AlignedResults(object):
+    """
+    Profiling results of one (entity, function) in several datasets, on the
+    union of their ciphersuites and byte pairs. `values` has a
+    (dataset, ciphersuite, byte pair) shape, NaN where a dataset has no
+    result. The first dataset is the baseline of the deltas.
+    """
+
+    def __init__(self, entity, function, ciphersuites, labels, bytes_sent,
+                 bytes_received, values):
+        self._entity = entity
+        self._function = function
+        self._ciphersuites = ciphersuites
+        self._labels = labels
+        self._bytes_sent = bytes_sent
+        self._bytes_received = bytes_received
+        self._values = values
+
+    @property
+    def entity(self):
+        return self._entity
+
+    @property
+    def function(self):
+        return self._function
+
+    @property
+    def ciphersuites(self):
+        return self._ciphersuites
+
+    @property
+    def labels(self):
+        return self._labels
+
+    @property
+    def bytes_sent(self):
+        return self._bytes_sent
+
+    @property
+    def bytes_received(self):
+        return self._bytes_received
+
+    @property
+    def values(self):
+        return self._values
+
+    @property
+    def baseline(self):
+        return self._values[0]
+
+    def absolute_delta(self):
+        """
+        (other dataset, ciphersuite, byte pair) differences to the baseline.
+        """
+        return self._values[1:] - self._values[0]
+
+    def relative_delta(self):
+        """
+        Differences to the baseline as a fraction of it, NaN where the
+        baseline is 0.
+        """
+        baseline = self._values[0]
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return numpy.where(baseline != 0,
+                               self.absolute_delta() / numpy.abs(baseline),
+                               numpy.nan)
+
+    def flagged(self, threshold=DEFAULT_THRESHOLD, relative=True,
+                direction='increase'):
+        """
+        Mask of the deltas beyond `threshold`: increases (regressions of
+        timings) by default, 'decrease' or 'both'. Cells missing in either
+        dataset are never flagged.
+        """
+        delta = self.relative_delta() if relative else self.absolute_delta()
+        with numpy.errstate(invalid='ignore'):
+            if direction == 'increase':
+                return delta > threshold
+            if direction == 'decrease':
+                return delta < -threshold
+            if direction == 'both':
+                return numpy.abs(delta) > threshold
+        raise ValueError('Unknown direction: {}'.format(direction))
+
+    def report(self, names, threshold=DEFAULT_THRESHOLD, relative=True,
+               direction='increase', flagged_only=True):
+        """
+        Columns of the diff report, one row per (ciphersuite, byte pair)
+        cell, flagged in any dataset unless `flagged_only` is False. `names`
+        are the names of the datasets, the baseline first.
+        """
+        flagged = self.flagged(threshold, relative, direction)
+        any_flagged = flagged.any(axis=0)
+        if flagged_only:
+            rows, cols = numpy.nonzero(any_flagged)
+        else:
+            rows, cols = numpy.indices(any_flagged.shape).reshape(2, -1)
+
+        absolute_delta = self.absolute_delta()
+        relative_delta = self.relative_delta()
+        columns = OrderedDict([
+            ('ciphersuite', self._ciphersuites[rows]),
+            ('label', self._labels[rows]),
+            ('bytes sent', self._bytes_sent[cols]),
+            ('bytes received', self._bytes_received[cols]),
+            (names[0], self._values[0][rows, cols]),
+        ])
+        for i, name in enumerate(names[1:]):
+            columns[name] = self._values[i + 1][rows, cols]
+            columns['{} delta'.format(name)] = absolute_delta[i][rows, cols]
+            columns['{} relative delta'.format(name)] = relative_delta[i][rows, cols]
+        columns['flagged'] = any_flagged[rows, cols]
+        return columns
+
+
+def align(entity, function, entity_datas):
+    """
+    Align the `EntityDTO`s of several datasets (None for a dataset without
+    the function) into an `AlignedResults`. The ciphersuites are in order of
+    first appearance and the byte pairs sorted by (sent, received).
+    """
+    present = [data for data in entity_datas if data is not None]
+    pairs = numpy.concatenate([numpy.column_stack((data.bytes_sent,
+                                                   data.bytes_received))
+                               for data in present])
+    union_pairs, pair_positions = numpy.unique(pairs, axis=0,
+                                               return_inverse=True)
+    pair_positions = pair_positions.reshape(-1)
+    names = numpy.concatenate([data.ciphersuites for data in present])
+    labels = numpy.concatenate([data.labels for data in present])
+    ciphersuites, cs_positions = _first_seen_unique(names)
+    _, first = numpy.unique(cs_positions, return_index=True)
+
+    values = numpy.full((len(entity_datas), len(ciphersuites), len(union_pairs)),
+                        numpy.nan)
+    cs_start = pair_start = 0
+    for i, data in enumerate(entity_datas):
+        if data is None:
+            continue
+        n_cs, n_pairs = data.profiling_results.shape
+        cs = cs_positions[cs_start:cs_start + n_cs]
+        pair = pair_positions[pair_start:pair_start + n_pairs]
+        values[i][numpy.ix_(cs, pair)] = data.profiling_results
+        cs_start += n_cs
+        pair_start += n_pairs
+
+    return AlignedResults(entity, function, ciphersuites, labels[first],
+                          union_pairs[:, 0], union_pairs[:, 1], values)
+
+
+def compare(datasets, entity, function=None):
+    """
+    `AlignedResults` of `entity` in several `EncryptionData`, the first one
+    being the baseline. `function` defaults to the first function of the
+    baseline.
+    """
+    if function is None:
+        function = datasets[0].get_functions(entity)[0]
+    return align(entity, function,
+                 [data.get_data(entity, function)
+                  if entity in data.get_entities() and
+                     function in data.get_functions(entity) else None
+                  for data in datasets])
+
+
+def iter_comparisons(datasets, all_functions=False):
+    """
+    Yield the `AlignedResults` of every entity of the baseline, for its
+    first function or, with `all_functions`, for every function.
+    """
+    baseline = datasets[0]
+    for entity in baseline.get_entities():
+        functions = baseline.get_functions(entity)
+        if not all_functions:
+            functions = functions[:1]
+        for function in functions:
+            yield compare(datasets, entity, function)
@@ -0,0 +1,233 @@
+"""
+Least-squares models of the profiling results (e.g. cycles) against the
+number of bytes, fitted for every ciphersuite at once: a fixed overhead
+(intercept) plus a cost per byte (slope).
+"""
+import numpy
+
+from collections import OrderedDict
+
+MAX_BREAKPOINTS = 32
+
+
+def _least_squares(design, values):
+    """
+    Fit `values` (ciphersuite x byte pair, NaN cells left out) against the
+    columns of `design` (byte pair x parameter, the first one being the
+    intercept) for every ciphersuite with a single batched solve of the
+    normal equations. Returns (coefficients, residual sum of squares, total
+    sum of squares), per ciphersuite.
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    weights = (~numpy.isnan(values)).astype(numpy.float64)
+    observed = numpy.where(weights > 0, values, 0)
+
+    # the first column is the intercept: the other ones are centered and
+    #  scaled, otherwise the Gram matrix of large byte sizes with a small
+    #  spread is too ill-conditioned to recover the intercept
+    shift = numpy.zeros(design.shape[1])
+    scale = numpy.ones(design.shape[1])
+    if len(design):
+        shift[1:] = design[:, 1:].mean(axis=0)
+        scale[1:] = numpy.abs(design[:, 1:] - shift[1:]).max(axis=0)
+        scale[scale == 0] = 1
+    # powers of two, so that the scaling itself is exact
+    scale = numpy.exp2(numpy.ceil(numpy.log2(scale)))
+    design = (design - shift) / scale
+
+    n_params = design.shape[1]
+    # the (parameter x parameter) Gram matrix of every ciphersuite, as a
+    #  single matrix product with the products of the design columns
+    outer = (design[:, :, numpy.newaxis] * design[:, numpy.newaxis, :])
+    gram = (weights @ outer.reshape(-1, n_params * n_params)).reshape(
+                                                    -1, n_params, n_params)
+    moments = observed @ design
+    # pinv rather than solve, so degenerate ciphersuites (e.g. a single
+    #  byte size) get a least-norm fit instead of failing the whole batch
+    inverse = numpy.linalg.pinv(gram)
+    coefficients = numpy.einsum('cpq,cq->cp', inverse, moments)
+    # one step of iterative refinement, solving again for the residuals,
+    #  recovers most of the precision lost by squaring the condition number
+    residuals = weights * (observed - coefficients @ design.T)
+    coefficients += numpy.einsum('cpq,cq->cp', inverse, residuals @ design)
+
+    residuals = weights * (observed - coefficients @ design.T)
+    counts = weights.sum(axis=1)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        means = observed.sum(axis=1) / counts
+    deviations = weights * (observed - means[:, numpy.newaxis])
+    sse = (residuals ** 2).sum(axis=1)
+
+    # back to the coefficients of the unscaled design
+    coefficients /= scale
+    coefficients[:, 0] -= coefficients[:, 1:] @ shift[1:]
+
+    underdetermined = counts < n_params
+    coefficients[underdetermined] = numpy.nan
+    sse[underdetermined] = numpy.nan
+    return coefficients, sse, (deviations ** 2).sum(axis=1)
+
+
+def _r_squared(sse, sst):
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        return numpy.where(sst > 0, 1 - sse / sst, numpy.nan)
+
+
+def throughput(slope, frequency=None):
+    """
+    Bytes per unit of the results (e.g. bytes per cycle) from a cost per
+    byte, or bytes per second given the `frequency` of the unit in Hz. NaN
+    where the slope is not positive.
+    """
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        res = numpy.where(slope > 0, 1 / slope, numpy.nan)
+    return res if frequency is None else res * frequency
+
+
+class LinearFit(object):
+    """
+    results = intercept + slope * bytes, per ciphersuite.
+    """
+
+    def __init__(self, intercept, slope, r_squared):
+        self._intercept = intercept
+        self._slope = slope
+        self._r_squared = r_squared
+
+    @property
+    def intercept(self):
+        return self._intercept
+
+    @property
+    def slope(self):
+        return self._slope
+
+    @property
+    def r_squared(self):
+        return self._r_squared
+
+    def throughput(self, frequency=None):
+        return throughput(self._slope, frequency)
+
+
+class PiecewiseFit(object):
+    """
+    results = intercept + slope * bytes + (slope_after - slope) *
+    max(0, bytes - breakpoint), per ciphersuite, each with its own
+    breakpoint (e.g. where the cost per byte changes with the block size).
+    """
+
+    def __init__(self, intercept, slope, slope_after, breakpoint, r_squared):
+        self._intercept = intercept
+        self._slope = slope
+        self._slope_after = slope_after
+        self._breakpoint = breakpoint
+        self._r_squared = r_squared
+
+    @property
+    def intercept(self):
+        return self._intercept
+
+    @property
+    def slope(self):
+        return self._slope
+
+    @property
+    def slope_after(self):
+        return self._slope_after
+
+    @property
+    def breakpoint(self):
+        return self._breakpoint
+
+    @property
+    def r_squared(self):
+        return self._r_squared
+
+    def throughput(self, frequency=None):
+        """
+        Throughput past the breakpoint, i.e. of large messages.
+        """
+        return throughput(self._slope_after, frequency)
+
+
+def fit_linear(bytes_array, profiling_results):
+    """
+    `LinearFit` of every row of `profiling_results` (ciphersuite x bytes)
+    against `bytes_array`.
+    """
+    x = numpy.asarray(bytes_array, dtype=numpy.float64)
+    design = numpy.column_stack((numpy.ones_like(x), x))
+    coefficients, sse, sst = _least_squares(design, profiling_results)
+    return LinearFit(coefficients[:, 0], coefficients[:, 1], _r_squared(sse, sst))
+
+
+def candidate_breakpoints(bytes_array, max_breakpoints=MAX_BREAKPOINTS):
+    """
+    Byte sizes tried as breakpoints: the distinct sizes leaving at least two
+    sizes on each side, thinned out to at most `max_breakpoints` quantiles.
+    """
+    sizes = numpy.unique(numpy.asarray(bytes_array, dtype=numpy.float64))[1:-2]
+    if len(sizes) > max_breakpoints:
+        sizes = sizes[numpy.linspace(0, len(sizes) - 1,
+                                     max_breakpoints).round().astype(int)]
+    return sizes
+
+
+def fit_piecewise(bytes_array, profiling_results, breakpoints=None):
+    """
+    `PiecewiseFit` of every row of `profiling_results` against
+    `bytes_array`, keeping for each ciphersuite the breakpoint of
+    `breakpoints` (see `candidate_breakpoints`) with the lowest residuals.
+    Every ciphersuite is fitted at once for each breakpoint.
+    """
+    x = numpy.asarray(bytes_array, dtype=numpy.float64)
+    if breakpoints is None:
+        breakpoints = candidate_breakpoints(x)
+    n_rows = numpy.shape(profiling_results)[0]
+    if len(breakpoints) == 0:
+        linear = fit_linear(x, profiling_results)
+        return PiecewiseFit(linear.intercept, linear.slope, linear.slope,
+                            numpy.full(n_rows, numpy.nan), linear.r_squared)
+
+    best_sse = numpy.full(n_rows, numpy.inf)
+    best_coefficients = numpy.full((n_rows, 3), numpy.nan)
+    best_breakpoint = numpy.full(n_rows, numpy.nan)
+    sst = None
+    for breakpoint in breakpoints:
+        design = numpy.column_stack((numpy.ones_like(x), x,
+                                     numpy.maximum(x - breakpoint, 0)))
+        coefficients, sse, sst = _least_squares(design, profiling_results)
+        better = sse < best_sse
+        best_sse[better] = sse[better]
+        best_coefficients[better] = coefficients[better]
+        best_breakpoint[better] = breakpoint
+
+    intercept, slope, slope_change = best_coefficients.T
+    return PiecewiseFit(intercept, slope, slope + slope_change, best_breakpoint,
+                        _r_squared(best_sse, sst))
+
+
+def fit_report(ciphersuites, labels, bytes_array, profiling_results,
+               frequency=None):
+    """
+    Columns of the linear and piecewise fits, one row per ciphersuite.
+    """
+    linear = fit_linear(bytes_array, profiling_results)
+    piecewise = fit_piecewise(bytes_array, profiling_results)
+    throughput_unit = 'bytes/unit' if frequency is None else 'bytes/s'
+    return OrderedDict([
+        ('ciphersuite', numpy.asarray(ciphersuites)),
+        ('label', numpy.asarray(labels)),
+        ('intercept', linear.intercept),
+        ('slope', linear.slope),
+        ('r2', linear.r_squared),
+        ('throughput ({})'.format(throughput_unit), linear.throughput(frequency)),
+        ('piecewise breakpoint', piecewise.breakpoint),
+        ('piecewise intercept', piecewise.intercept),
+        ('piecewise slope', piecewise.slope),
+        ('piecewise slope after', piecewise.slope_after),
+        ('piecewise r2', piecewise.r_squared),
+        ('piecewise throughput ({})'.format(throughput_unit),
+         piecewise.throughput(frequency)),
+    ])
@@ -0,0 +1,238 @@
+"""
+Two-dimensional view of the results of a function: every measurement is
+keyed by a (bytes sent, bytes received) pair, see `ResultGrid`.
+"""
+import numpy
+
+
+def _range_mask(values, selection):
+    """
+    Mask of the `values` within `selection`: a single value, or an
+    inclusive (low, high) range where a None bound is open.
+    """
+    if selection is None:
+        return numpy.ones(len(values), dtype=bool)
+    if not isinstance(selection, tuple):
+        return values == selection
+    low, high = selection
+    mask = numpy.ones(len(values), dtype=bool)
+    if low is not None:
+        mask &= values >= low
+    if high is not None:
+        mask &= values <= high
+    return mask
+
+
+class ResultGrid(object):
+    """
+    Results of the ciphersuites of a function over the (bytes sent, bytes
+    received) plane. `sent` and `received` are the sorted distinct byte
+    sizes of each axis, and each column (byte pair) of the results is
+    located on the plane by its (`sent_index`, `received_index`).
+
+    This coordinate form holds sparse sweeps as they are. The dense
+    (ciphersuites x sent x received) array, NaN where a pair was not
+    measured, is only built on the first call to `dense`.
+    """
+
+    __slots__ = ('_bytes_sent', '_bytes_received', '_ciphersuites', '_labels',
+                 '_results', '_sent', '_sent_index', '_received',
+                 '_received_index', '_dense')
+
+    def __init__(self, bytes_sent, bytes_received, ciphersuites, labels,
+                 results):
+        self._bytes_sent = bytes_sent
+        self._bytes_received = bytes_received
+        self._ciphersuites = ciphersuites
+        self._labels = labels
+        self._results = results
+        self._sent, self._sent_index = numpy.unique(bytes_sent,
+                                                    return_inverse=True)
+        self._received, self._received_index = numpy.unique(bytes_received,
+                                                            return_inverse=True)
+        self._dense = None
+
+    @classmethod
+    def from_entity(cls, entity_data, results=None):
+        """
+        Grid of an `EntityDTO`, with `results` (e.g. a statistic of its
+        samples) in place of its profiling results if given.
+        """
+        if results is None:
+            results = entity_data.profiling_results
+        return cls(entity_data.bytes_sent, entity_data.bytes_received,
+                   entity_data.ciphersuites, entity_data.labels, results)
+
+    @property
+    def bytes_sent(self):
+        return self._bytes_sent
+
+    @property
+    def bytes_received(self):
+        return self._bytes_received
+
+    @property
+    def ciphersuites(self):
+        return self._ciphersuites
+
+    @property
+    def labels(self):
+        return self._labels
+
+    @property
+    def results(self):
+        return self._results
+
+    @property
+    def sent(self):
+        return self._sent
+
+    @property
+    def received(self):
+        return self._received
+
+    @property
+    def sent_index(self):
+        return self._sent_index
+
+    @property
+    def received_index(self):
+        return self._received_index
+
+    @property
+    def shape(self):
+        return len(self._ciphersuites), len(self._sent), len(self._received)
+
+    @property
+    def nbytes(self):
+        """
+        Memory held by the grid on top of the results it was built from.
+        """
+        nbytes = sum(array.nbytes for array in (self._sent, self._sent_index,
+                                                self._received,
+                                                self._received_index))
+        if self._dense is not None:
+            nbytes += self._dense.nbytes
+        return nbytes
+
+    @property
+    def density(self):
+        """
+        Share of the cells of the plane that were measured.
+        """
+        n_cells = len(self._sent) * len(self._received)
+        return len(self._sent_index) / n_cells if n_cells else 0.0
+
+    def dense(self):
+        """
+        The (ciphersuites x sent x received) array of the results, NaN where
+        a byte pair was not measured. Built once, read-only.
+        """
+        if self._dense is None:
+            dense = numpy.full(self.shape, numpy.nan)
+            dense[:, self._sent_index, self._received_index] = self._results
+            dense.flags.writeable = False
+            self._dense = dense
+        return self._dense
+
+    def _position(self, values, value):
+        position = numpy.searchsorted(values, value)
+        if position == len(values) or values[position] != value:
+            raise KeyError(value)
+        return position
+
+    def cell(self, sent, received):
+        """
+        Results of every ciphersuite for the byte pair (`sent`, `received`).
+        """
+        columns = numpy.flatnonzero(
+                    (self._sent_index == self._position(self._sent, sent)) &
+                    (self._received_index == self._position(self._received,
+                                                            received)))
+        if not len(columns):
+            raise KeyError((sent, received))
+        return self._results[:, columns[-1]]
+
+    def ciphersuite_mask(self, ciphersuites):
+        """
+        Mask of the rows of `ciphersuites`, given by name or label.
+        """
+        ciphersuites = list(ciphersuites)
+        return (numpy.isin(self._ciphersuites, ciphersuites) |
+                numpy.isin(self._labels, ciphersuites))
+
+    def byte_mask(self, sent=None, received=None):
+        """
+        Mask of the columns whose bytes are within `sent` and `received`,
+        each a single size or an inclusive (low, high) range, None bounds
+        being open.
+        """
+        return (_range_mask(self._bytes_sent, sent) &
+                _range_mask(self._bytes_received, received))
+
+    def select(self, ciphersuites=None, sent=None, received=None):
+        """
+        Grid restricted to `ciphersuites` (names or labels) and to the byte
+        pairs within `sent` and `received` (see `byte_mask`).
+        """
+        columns = numpy.flatnonzero(self.byte_mask(sent, received))
+        rows = slice(None)
+        if ciphersuites is not None:
+            rows = numpy.flatnonzero(self.ciphersuite_mask(ciphersuites))
+        return ResultGrid(self._bytes_sent[columns],
+                          self._bytes_received[columns],
+                          self._ciphersuites[rows], self._labels[rows],
+                          self._results[rows][:, columns])
+
+    def _line(self, line_index, position, other_index, other_values):
+        columns = numpy.flatnonzero(line_index == position)
+        columns = columns[numpy.argsort(other_index[columns], kind='stable')]
+        return other_values[other_index[columns]], self._results[:, columns]
+
+    def sent_slice(self, sent):
+        """
+        (bytes received, results of every ciphersuite) of the byte pairs
+        sending `sent` bytes, sorted by the bytes received.
+        """
+        return self._line(self._sent_index, self._position(self._sent, sent),
+                          self._received_index, self._received)
+
+    def received_slice(self, received):
+        """
+        (bytes sent, results of every ciphersuite) of the byte pairs
+        receiving `received` bytes, sorted by the bytes sent.
+        """
+        return self._line(self._received_index,
+                          self._position(self._received, received),
+                          self._sent_index, self._sent)
+
+    def iter_rows(self, axis, bytes_label):
+        """
+        Rows of the grid projected on `axis` ('sent' or 'received'), ties
+        ordered by the other axis, in the [label, values array] format of
+        the exporters.
+        """
+        if axis == 'sent':
+            primary, secondary = self._bytes_sent, self._bytes_received
+        elif axis == 'received':
+            primary, secondary = self._bytes_received, self._bytes_sent
+        else:
+            raise ValueError('Unknown byte axis: {}'.format(axis))
+        order = numpy.lexsort((secondary, primary))
+
+        yield [bytes_label, primary[order]]
+        for label, values in zip(self._labels.tolist(), self._results):
+            yield [label, values[order]]
+
+    def heatmap_rows(self, row, corner_label=''):
+        """
+        Plane of the ciphersuite at `row` as rows for the exporters: the
+        bytes received as header, then one [bytes sent, values array] row
+        per size sent, NaN where a pair was not measured.
+        """
+        plane = numpy.full(self.shape[1:], numpy.nan)
+        plane[self._sent_index, self._received_index] = self._results[row]
+
+        yield [corner_label, self._received]
+        for sent, values in zip(self._sent.tolist(), plane):
+            yield [sent, values]
@@ -0,0 +1,199 @@
+"""
+Byte-offset index of a profiling JSON file, stored in a sidecar file next to
+it, used to decode single functions or ciphersuites without reading the rest
+of the file.
+"""
+import json
+import mmap
+import os
+
+from collections import OrderedDict
+
+from utils import index_profiling_json_file, parse_json_bytes_to_dict
+from utils.utils import BytePairKeyDecoder
+from data.cache import file_fingerprint
+
+
+class ProfilingIndex(object):
+    """
+    entity -> function -> ciphersuite byte ranges of a profiling JSON file.
+    """
+
+    VERSION = 1
+    SIDECAR_SUFFIX = '.edatidx'
+    # characters of the JSON numbers that are not integers (NaN, Infinity)
+    FLOAT_CHARS = (b'.', b'e', b'E', b'N', b'I')
+
+    def __init__(self, json_path, entries, fingerprint=None):
+        """
+        `entries` is {entity: {function: (start, end, {ciphersuite: (start,
+        end)})}}, as returned by `utils.index_profiling_json_file`.
+        """
+        self._json_path = json_path
+        self._entries = entries
+        self._fingerprint = fingerprint
+        self._mapped_file = None
+
+    @property
+    def json_path(self):
+        return self._json_path
+
+    @property
+    def entries(self):
+        return self._entries
+
+    @classmethod
+    def sidecar_path(cls, json_path):
+        return json_path + cls.SIDECAR_SUFFIX
+
+    @classmethod
+    def build(cls, json_path):
+        """
+        Pre-scan `json_path`, without writing the sidecar.
+        """
+        fingerprint = file_fingerprint(json_path)
+        return cls(json_path, index_profiling_json_file(json_path), fingerprint)
+
+    @classmethod
+    def load(cls, json_path):
+        """
+        Read the sidecar of `json_path`, None when it is missing, unreadable
+        or older than the file.
+        """
+        try:
+            with open(cls.sidecar_path(json_path), 'r') as sidecar_file:
+                contents = json.load(sidecar_file)
+        except (OSError, ValueError):
+            return None
+
+        if (contents.get('version') != cls.VERSION or
+                contents.get('fingerprint') != file_fingerprint(json_path)):
+            return None
+
+        entries = OrderedDict()
+        for entity, functions in contents['entities']:
+            entries[entity] = OrderedDict(
+                (function, (start, end, OrderedDict(
+                    (ciphersuite, (cs_start, cs_end))
+                    for ciphersuite, cs_start, cs_end in ciphersuites)))
+                for function, start, end, ciphersuites in functions)
+        return cls(json_path, entries, contents['fingerprint'])
+
+    @classmethod
+    def load_or_build(cls, json_path, write_sidecar=False):
+        """
+        Read the sidecar of `json_path` or pre-scan the file, writing the
+        sidecar when `write_sidecar` is set.
+        """
+        index = cls.load(json_path)
+        if index is None:
+            index = cls.build(json_path)
+            if write_sidecar:
+                index.save()
+        return index
+
+    def save(self):
+        """
+        Write the sidecar next to the JSON file, replacing it atomically.
+        """
+        entities = [[entity, [[function, start, end,
+                               [[ciphersuite, cs_start, cs_end]
+                                for ciphersuite, (cs_start, cs_end)
+                                in ciphersuites.items()]]
+                              for function, (start, end, ciphersuites)
+                              in functions.items()]]
+                    for entity, functions in self._entries.items()]
+        contents = {
+            'version': self.VERSION,
+            'fingerprint': self._fingerprint,
+            'entities': entities,
+        }
+        sidecar_path = self.sidecar_path(self._json_path)
+        tmp_path = '{}.{}.tmp'.format(sidecar_path, os.getpid())
+        with open(tmp_path, 'w') as sidecar_file:
+            json.dump(contents, sidecar_file)
+        os.replace(tmp_path, sidecar_path)
+
+    def get_entities(self):
+        return list(self._entries)
+
+    def get_functions(self, entity):
+        return list(self._entries[entity])
+
+    def get_ciphersuites(self, entity, function):
+        return list(self._entries[entity][function][2])
+
+    def function_range(self, entity, function):
+        start, end, _ = self._entries[entity][function]
+        return start, end
+
+    def ciphersuite_range(self, entity, function, ciphersuite):
+        return self._entries[entity][function][2][ciphersuite]
+
+    def _get_mapped_file(self):
+        if self._mapped_file is None:
+            with open(self._json_path, 'rb') as json_file:
+                self._mapped_file = mmap.mmap(json_file.fileno(), 0,
+                                              access=mmap.ACCESS_READ)
+        return self._mapped_file
+
+    def decode_range(self, start, end):
+        """
+        Decode the JSON value in the byte range [start, end), reading it
+        from a memory map of the file, kept open between calls.
+        """
+        return parse_json_bytes_to_dict(self._get_mapped_file()[start:end])
+
+    def decode_ciphersuite(self, entity, function, ciphersuite):
+        """
+        {(bytes sent, bytes received): result} of a single ciphersuite.
+        """
+        return self.decode_range(*self.ciphersuite_range(entity, function,
+                                                         ciphersuite))
+
+    def iter_ciphersuites(self, entity, function):
+        """
+        Yield (ciphersuite, [(byte pair, result), ...]) of every ciphersuite
+        of `function`, decoding one at a time, so the whole function is
+        never held decoded in memory. The byte pair tuples are shared by
+        all of them.
+        """
+        return self.iter_ranges(self._entries[entity][function][2].items())
+
+    def iter_ranges(self, ranges):
+        """
+        Same as `iter_ciphersuites`, for the (ciphersuite, (start, end))
+        `ranges`, e.g. a part of the ciphersuites of a function.
+        """
+        mapped_file = self._get_mapped_file()
+        key_decoder = BytePairKeyDecoder()
+
+        def object_pairs_hook(pairs):
+            return [(key_decoder(key), value) for key, value in pairs]
+
+        for ciphersuite, (start, end) in ranges:
+            yield ciphersuite, json.loads(mapped_file[start:end],
+                                          object_pairs_hook=object_pairs_hook)
+
+    def scan_value_kind(self, ranges):
+        """
+        Kind of the values of the (ciphersuite, (start, end)) `ranges`, from
+        their bytes, without decoding them: 'samples' if any of them is a
+        list of samples, 'float' if any of them is not an integer, 'int'
+        otherwise. The keys of the ranges are byte pairs, so these
+        characters can only be found in the values.
+        """
+        mapped_file = self._get_mapped_file()
+        kind = 'int'
+        for _, (start, end) in ranges:
+            if mapped_file.find(b'[', start, end) != -1:
+                return 'samples'
+            if kind == 'int' and any(mapped_file.find(char, start, end) != -1
+                                     for char in self.FLOAT_CHARS):
+                kind = 'float'
+        return kind
+
+    def close(self):
+        if self._mapped_file is not None:
+            self._mapped_file.close()
+            self._mapped_file = None
@@ -0,0 +1,323 @@
+"""
+Opt-in timing and memory measures of the analysis stages (decode, build,
+sort, write, ...), see `StageRecorder`.
+"""
+import sys
+import time
+import tracemalloc
+
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def max_rss():
+    """
+    Peak resident set size of the process in bytes, None where unknown.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class StageRecord(object):
+    """
+    Measures of one run of a stage. Times are in seconds, memory in bytes.
+    `peak_allocated` is the peak of the memory allocated during the stage
+    (None without memory tracing), a lower bound when it stayed below a
+    peak reached before the stage. `counts` are the numbers of processed
+    items (e.g. rows, cells) and `info` describes the run (e.g. entity).
+    """
+
+    __slots__ = ('_name', '_depth', '_wall_time', '_cpu_time',
+                 '_peak_allocated', '_max_rss', '_counts', '_info')
+
+    def __init__(self, name, depth, wall_time, cpu_time, peak_allocated,
+                 max_rss, counts, info):
+        self._name = name
+        self._depth = depth
+        self._wall_time = wall_time
+        self._cpu_time = cpu_time
+        self._peak_allocated = peak_allocated
+        self._max_rss = max_rss
+        self._counts = counts
+        self._info = info
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def depth(self):
+        return self._depth
+
+    @property
+    def wall_time(self):
+        return self._wall_time
+
+    @property
+    def cpu_time(self):
+        return self._cpu_time
+
+    @property
+    def peak_allocated(self):
+        return self._peak_allocated
+
+    @property
+    def max_rss(self):
+        return self._max_rss
+
+    @property
+    def counts(self):
+        return self._counts
+
+    @property
+    def info(self):
+        return self._info
+
+    def as_dict(self):
+        return OrderedDict([
+            ('name', self._name),
+            ('depth', self._depth),
+            ('wall_time', self._wall_time),
+            ('cpu_time', self._cpu_time),
+            ('peak_allocated', self._peak_allocated),
+            ('max_rss', self._max_rss),
+            ('counts', self._counts),
+            ('info', self._info),
+        ])
+
+
+class _Stage(object):
+
+    def __init__(self, recorder, name, info):
+        self._recorder = recorder
+        self._name = name
+        self._info = info
+        self.counts = {}
+
+    def __enter__(self):
+        self._recorder._enter()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self.counts
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall_time = time.perf_counter() - self._wall
+        cpu_time = time.process_time() - self._cpu
+        depth, peak_allocated = self._recorder._exit()
+        self._recorder._add(StageRecord(self._name, depth, wall_time, cpu_time,
+                                        peak_allocated, max_rss(), self.counts,
+                                        self._info))
+        return False
+
+
+class _SplitStage(object):
+    """
+    Stage run in several intervals, e.g. one of two stages fused in a loop:
+    every `with` block adds to its times, and a single record is added by
+    `done`. Its `peak_allocated` is the largest one of its intervals.
+    """
+
+    def __init__(self, recorder, name, info):
+        self._recorder = recorder
+        self._name = name
+        self._info = info
+        self.counts = {}
+        self._wall_time = 0.0
+        self._cpu_time = 0.0
+        self._peak_allocated = None
+
+    def __enter__(self):
+        self._recorder._enter()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self.counts
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._wall_time += time.perf_counter() - self._wall
+        self._cpu_time += time.process_time() - self._cpu
+        _, peak_allocated = self._recorder._exit()
+        if peak_allocated is not None:
+            self._peak_allocated = max(self._peak_allocated or 0,
+                                       peak_allocated)
+        return False
+
+    def done(self):
+        self._recorder._add(StageRecord(self._name, len(self._recorder._stack),
+                                        self._wall_time, self._cpu_time,
+                                        self._peak_allocated, max_rss(),
+                                        self.counts, self._info))
+
+
+class StageRecorder(object):
+    """
+    Records a `StageRecord` for every stage run within it:
+
+        with recorder.stage('sort', entity='client') as counts:
+            ...
+            counts['cells'] = n
+
+    Stages may be nested, the measures of a stage include the ones nested in
+    it. Stages interleaved in a loop are measured with `split_stage`.
+    `hooks` are called with each record as soon as the stage ends. With
+    `trace_memory`, the allocations are traced with tracemalloc, which
+    slows the stages down noticeably.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=False, hooks=()):
+        self._trace_memory = trace_memory
+        self._hooks = list(hooks)
+        self._records = []
+        # [memory traced at the start, peak so far, peak of tracemalloc at
+        # the start] of the running stages
+        self._stack = []
+        self._owns_tracing = False
+
+    @property
+    def records(self):
+        return list(self._records)
+
+    def add_hook(self, hook):
+        self._hooks.append(hook)
+
+    def stage(self, name, **info):
+        return _Stage(self, name, info)
+
+    def split_stage(self, name, **info):
+        """
+        Stage measured over every `with` block of the returned object, and
+        recorded once by its `done` method:
+
+            decode = recorder.split_stage('decode')
+            build = recorder.split_stage('build')
+            for ...:
+                with decode:
+                    ...
+                with build:
+                    ...
+            decode.done()
+            build.done()
+        """
+        return _SplitStage(self, name, info)
+
+    def _enter(self):
+        if not self._trace_memory:
+            self._stack.append(None)
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], current)
+        self._stack.append([current, current, peak])
+
+    def _exit(self):
+        memory = self._stack.pop()
+        depth = len(self._stack)
+        if memory is None:
+            return depth, None
+
+        # tracemalloc only keeps the peak since it started (reset_peak is
+        # Python 3.9+): a peak above the one at the start of the stage was
+        # reached during it, else the memory traced at the start and end
+        # of the stages nested in it is the best known bound
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(memory[1], current, peak if peak > memory[2] else 0)
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        elif self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+        return depth, peak - memory[0]
+
+    def _add(self, record):
+        self._records.append(record)
+        for hook in self._hooks:
+            hook(record)
+
+    def summary(self):
+        """
+        Machine-readable summary: the totals of every stage name, in order
+        of first run, and every record.
+        """
+        totals = OrderedDict()
+        for record in self._records:
+            total = totals.setdefault(record.name, OrderedDict([
+                ('runs', 0), ('wall_time', 0.0), ('cpu_time', 0.0),
+                ('peak_allocated', None), ('counts', {})]))
+            total['runs'] += 1
+            total['wall_time'] += record.wall_time
+            total['cpu_time'] += record.cpu_time
+            if record.peak_allocated is not None:
+                total['peak_allocated'] = max(total['peak_allocated'] or 0,
+                                              record.peak_allocated)
+            for count, value in record.counts.items():
+                total['counts'][count] = total['counts'].get(count, 0) + value
+        return OrderedDict([
+            ('max_rss', max_rss()),
+            ('totals', totals),
+            ('stages', [record.as_dict() for record in self._records]),
+        ])
+
+
+class _NullStage(object):
+
+    def __init__(self):
+        self.counts = {}
+
+    def __enter__(self):
+        return self.counts
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def done(self):
+        pass
+
+
+class NullRecorder(object):
+    """
+    Recorder of the disabled instrumentation, its stages do nothing.
+    """
+
+    enabled = False
+
+    @property
+    def records(self):
+        return []
+
+    def stage(self, name, **info):
+        # a new one every time, so that the counts are not shared
+        return _NullStage()
+
+    def split_stage(self, name, **info):
+        return _NullStage()
+
+
+NULL_RECORDER = NullRecorder()
+
+
+def count_rows(rows, counts):
+    """
+    Pass `rows` through, adding their number and their number of values
+    (a numpy array in a row counting as its length) to `counts`.
+    """
+    n_rows = n_cells = 0
+    try:
+        for row in rows:
+            n_rows += 1
+            n_cells += sum(len(value) if hasattr(value, 'shape') else 1
+                           for value in row)
+            yield row
+    finally:
+        counts['rows'] = counts.get('rows', 0) + n_rows
+        counts['cells'] = counts.get('cells', 0) + n_cells
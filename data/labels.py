@@ -0,0 +1,140 @@
+"""
+Resolution of ciphersuite names into the labels shown in the results (e.g.
+TLS-RSA-WITH-AES-128-GCM-SHA256 -> AES-128-GCM-SHA256).
+"""
+import functools
+import re
+import weakref
+import numpy
+
+# tried in order, the label is the 'encr_name' group of the first match
+DEFAULT_LABEL_PATTERNS = (
+    r'WITH\-(?P<encr_name>.*)',
+    # TLS 1.3 suites have no key exchange, e.g. TLS1-3-AES-128-GCM-SHA256
+    r'^TLS1\-3\-(?P<encr_name>.*)',
+)
+DEFAULT_CACHE_SIZE = 4096
+
+
+class CiphersuiteLabelResolver(object):
+    """
+    Callable turning a ciphersuite name into its label, with a chain of
+    regular expressions compiled once and a bounded LRU of the resolved
+    labels. Names matching no pattern are passed to `fallback`, which
+    returns them unchanged by default.
+    """
+
+    def __init__(self, patterns=DEFAULT_LABEL_PATTERNS, fallback=None,
+                 maxsize=DEFAULT_CACHE_SIZE):
+        self._patterns = tuple(re.compile(pattern) for pattern in patterns)
+        self._fallback = fallback
+        self._resolve_cached = functools.lru_cache(maxsize)(self._resolve)
+
+    @property
+    def patterns(self):
+        return self._patterns
+
+    def _resolve(self, ciphersuite):
+        for pattern in self._patterns:
+            res = pattern.search(ciphersuite)
+            if res is None:
+                continue
+            if 'encr_name' in pattern.groupindex:
+                return res.group('encr_name')
+            return res.group(1) if pattern.groups else res.group(0)
+
+        if self._fallback is None:
+            return ciphersuite
+        return self._fallback(ciphersuite)
+
+    def __call__(self, ciphersuite):
+        return self._resolve_cached(ciphersuite)
+
+    def labels(self, ciphersuites):
+        """
+        Labels of `ciphersuites`, as a numpy str array.
+        """
+        return numpy.array([self._resolve_cached(ciphersuite)
+                            for ciphersuite in ciphersuites], dtype=str)
+
+    def cache_info(self):
+        return self._resolve_cached.cache_info()
+
+    def cache_clear(self):
+        self._resolve_cached.cache_clear()
+
+
+# {custom ciphersuite_label_fn: LRU of its labels}, the LRUs only hold a
+#  weak reference to their function, so that they go away with it
+_shared_label_caches = weakref.WeakKeyDictionary()
+
+
+def _shared_label_cache(ciphersuite_label_fn, maxsize):
+    try:
+        cache = _shared_label_caches.get(ciphersuite_label_fn)
+    except TypeError:
+        # not weakly referenceable, the LRU is not shared
+        return None
+    if cache is None:
+        fn_ref = weakref.ref(ciphersuite_label_fn)
+        cache = functools.lru_cache(maxsize)(
+                                lambda ciphersuite: fn_ref()(ciphersuite))
+        _shared_label_caches[ciphersuite_label_fn] = cache
+    return cache
+
+
+class MemoizedLabelFunction(CiphersuiteLabelResolver):
+    """
+    Bounded LRU in front of a custom ciphersuite_label_fn, which is expected
+    to always return the same label for a given name. The LRU is shared by
+    every `MemoizedLabelFunction` of the same function, so the labels are
+    resolved once per process for every container and file.
+    """
+
+    def __init__(self, ciphersuite_label_fn, maxsize=DEFAULT_CACHE_SIZE):
+        super().__init__(patterns=(), fallback=ciphersuite_label_fn,
+                         maxsize=maxsize)
+        shared = _shared_label_cache(ciphersuite_label_fn, maxsize)
+        if shared is not None:
+            self._resolve_cached = shared
+
+
+# shared by every file, so the labels are resolved once per process
+default_label_resolver = CiphersuiteLabelResolver()
+
+
+def as_label_resolver(ciphersuite_label_fn):
+    """
+    `ciphersuite_label_fn` as a `CiphersuiteLabelResolver`, memoizing plain
+    functions.
+    """
+    if isinstance(ciphersuite_label_fn, CiphersuiteLabelResolver):
+        return ciphersuite_label_fn
+    return MemoizedLabelFunction(ciphersuite_label_fn)
+
+
+def group_by_label(labels, profiling_results):
+    """
+    Average the rows of `profiling_results` sharing the same label (e.g. the
+    suites of every key exchange using the same cipher), in one pass over
+    the whole array. NaN cells are left out of the averages. Returns (group
+    labels, averaged results), in the order of the first row of each group.
+    """
+    labels = numpy.asarray(labels)
+    _, first_rows, inverse = numpy.unique(labels, return_index=True,
+                                          return_inverse=True)
+    # renumber the groups in the order of their first row
+    group_order = numpy.argsort(first_rows, kind='stable')
+    group_ids = numpy.empty_like(group_order)
+    group_ids[group_order] = numpy.arange(len(group_order))
+    inverse = group_ids[inverse.reshape(-1)]
+
+    values = numpy.asarray(profiling_results, dtype=numpy.float64)
+    valid = ~numpy.isnan(values)
+    rows = numpy.argsort(inverse, kind='stable')
+    starts = numpy.searchsorted(inverse[rows], numpy.arange(len(group_order)))
+    sums = numpy.add.reduceat(numpy.where(valid, values, 0)[rows], starts)
+    counts = numpy.add.reduceat(valid[rows].astype(numpy.int64), starts)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return labels[numpy.sort(first_rows)], means
@@ -2,10 +2,19 @@
 Module containing data models which can be used to query the JSON files
 containing the profiling information.
 """
-import re
 import numpy
 
-from utils import parse_json_file_to_dict
+from collections import OrderedDict
+
+from utils import iter_function_ciphersuites, parse_json_file_to_dict
+from utils.utils import BytePairKeyDecoder
+from data.cache import ParsedDataCache
+from data.index import ProfilingIndex
+from data.labels import as_label_resolver, default_label_resolver, group_by_label
+from data.fit import fit_report
+from data.grid import ResultGrid
+from data.instrumentation import NULL_RECORDER, StageRecorder
+from data.stats import SampleStatistics, aggregate_samples
 
 
 class Defaults(object):
@@ -13,21 +22,52 @@ class Defaults(object):
     DEFAULT_BYTES_SENT_LABEL = 'bytes sent'
     DEFAULT_BYTES_RECEIVED_LABEL = 'bytes received'
 
-    @staticmethod
-    def default_ciphersuite_label(ciphersuite_str):
-        REGEX = r'WITH\-(?P<encr_name>.*)'
-        pattern = re.compile(REGEX)
-        res = pattern.search(ciphersuite_str)
-        return res.group('encr_name')
+    # the name after WITH- (e.g. AES-128-GCM-SHA256), see data.labels
+    default_ciphersuite_label = default_label_resolver
+
+def ciphersuite_labels(ciphersuites, ciphersuite_label_fn):
+    return as_label_resolver(ciphersuite_label_fn).labels(ciphersuites)
+
+def _is_identity(order):
+    """
+    Whether the permutation `order` leaves the columns where they are.
+    """
+    return bool((order[1:] > order[:-1]).all())
 
 class EncryptionDataContainer(object):
+    """
+    Columnar representation of the profiling results of each entity: the
+    byte pairs are split into two int64 arrays (bytes sent and bytes
+    received), and the measurements are stored in a single
+    (ciphersuites x byte pairs) array, along with the raw ciphersuite names
+    and their labels.
+
+    When the byte pairs map to lists of samples instead of single values,
+    the samples are kept in a (ciphersuites x byte pairs x samples) array,
+    padded with NaN, and the results array holds the chosen statistic of
+    each cell (see `data.stats`).
+    """
 
     class EntityDTO(object):
 
-        def __init__(self, bytes_sent, bytes_received, profiling_results):
+        __slots__ = ('_bytes_sent', '_bytes_received', '_ciphersuites',
+                     '_labels', '_profiling_results', '_samples')
+
+        def __init__(self, bytes_sent, bytes_received, ciphersuites, labels,
+                     profiling_results, samples=None):
             self._bytes_sent = bytes_sent
             self._bytes_received = bytes_received
+            self._ciphersuites = ciphersuites
+            self._labels = labels
             self._profiling_results = profiling_results
+            self._samples = samples
+
+            # the arrays are handed out as is, protect them from being
+            #  modified by the callers
+            for array in (bytes_sent, bytes_received, ciphersuites, labels,
+                          profiling_results, samples):
+                if array is not None:
+                    array.flags.writeable = False
 
         @property
         def bytes_sent(self):
@@ -37,208 +77,992 @@ class EncryptionDataContainer(object):
         def bytes_received(self):
             return self._bytes_received
 
+        @property
+        def ciphersuites(self):
+            return self._ciphersuites
+
+        @property
+        def labels(self):
+            return self._labels
+
         @property
         def profiling_results(self):
             return self._profiling_results
 
+        @property
+        def samples(self):
+            return self._samples
+
+    class EntityBuilder(object):
+        """
+        Fills the columnar arrays of an entity one ciphersuite at a time. The
+        column of each value is found through a byte pair -> column index
+        computed from the byte pairs of the first ciphersuite.
+        """
+
+        __slots__ = ('_byte_pairs', '_pair_index', '_ciphersuites',
+                     '_profiling_results', '_samples')
+
+        def __init__(self, byte_pairs, expected_ciphersuites=16):
+            self._byte_pairs = list(byte_pairs)
+            self._pair_index = {pair: col
+                                for col, pair in enumerate(self._byte_pairs)}
+            self._ciphersuites = []
+            self._profiling_results = numpy.empty(
+                        (max(expected_ciphersuites, 1), len(self._byte_pairs)),
+                        dtype=numpy.int64)
+            # (capacity x byte pairs x samples), once a list of samples is found
+            self._samples = None
+
+        def _grow_samples(self, n_rows, n_samples):
+            samples = numpy.full((n_rows, len(self._byte_pairs), n_samples),
+                                 numpy.nan)
+            old_rows, _, old_samples = self._samples.shape
+            samples[:old_rows, :, :old_samples] = self._samples
+            self._samples = samples
+
+        def _add_samples(self, row, cols, values):
+            if self._samples is None:
+                # the values added so far become single samples
+                self._samples = self._profiling_results[..., numpy.newaxis].astype(
+                                                                numpy.float64)
+                self._profiling_results = None
+
+            values = [value if isinstance(value, list) else [value]
+                      for value in values]
+            n_samples = max((len(value) for value in values), default=0)
+            n_rows, _, max_samples = self._samples.shape
+            if row == n_rows or n_samples > max_samples:
+                self._grow_samples(2 * n_rows if row == n_rows else n_rows,
+                                   max(n_samples, max_samples))
+
+            samples_row = self._samples[row]
+            samples_row.fill(numpy.nan)
+            for col, value in zip(cols, values):
+                samples_row[col, :len(value)] = value
+
+        def add(self, ciphersuite, byte_pairs_results):
+            """
+            Add the row of `ciphersuite`, from an iterable of
+            (byte pair, profiling result). Byte pairs unknown to the first
+            ciphersuite are ignored, missing ones raise a KeyError. A profiling
+            result is either a single value or a list of samples.
+            """
+            pair_index = self._pair_index
+            cols = []
+            values = []
+            for pair, profiling_res in byte_pairs_results:
+                col = pair_index.get(pair)
+                if col is not None:
+                    cols.append(col)
+                    values.append(profiling_res)
+
+            if len(cols) != len(pair_index):
+                present = set(cols)
+                for pair, col in pair_index.items():
+                    if col not in present:
+                        raise KeyError(pair)
+
+            row = len(self._ciphersuites)
+            if (self._samples is not None or
+                    any(isinstance(value, list) for value in values)):
+                self._add_samples(row, cols, values)
+                self._ciphersuites.append(ciphersuite)
+                return
+
+            values = numpy.asarray(values)
+            if row == self._profiling_results.shape[0]:
+                self._profiling_results.resize(
+                        (2 * row, self._profiling_results.shape[1]),
+                        refcheck=False)
+            if (values.dtype.kind == 'f' and
+                    self._profiling_results.dtype.kind != 'f'):
+                self._profiling_results = self._profiling_results.astype(
+                                                                numpy.float64)
+
+            self._profiling_results[row, cols] = values
+            self._ciphersuites.append(ciphersuite)
+
+        def build(self, ciphersuite_label_fn, statistic='mean'):
+            n_pairs = len(self._byte_pairs)
+            n_ciphersuites = len(self._ciphersuites)
+            bytes_sent = numpy.fromiter((pair[0] for pair in self._byte_pairs),
+                                        dtype=numpy.int64, count=n_pairs)
+            bytes_received = numpy.fromiter((pair[1] for pair in self._byte_pairs),
+                                            dtype=numpy.int64, count=n_pairs)
+
+            samples = self._samples
+            if samples is None:
+                profiling_results = self._profiling_results
+                profiling_results.resize((n_ciphersuites, n_pairs),
+                                         refcheck=False)
+            else:
+                samples.resize((n_ciphersuites, n_pairs, samples.shape[2]),
+                               refcheck=False)
+                profiling_results = aggregate_samples(samples, statistic)
+
+            ciphersuites = numpy.array(self._ciphersuites, dtype=str)
+            labels = ciphersuite_labels(self._ciphersuites, ciphersuite_label_fn)
+
+            return EncryptionDataContainer.EntityDTO(bytes_sent, bytes_received,
+                                                     ciphersuites, labels,
+                                                     profiling_results, samples)
+
+    __slots__ = ('_json_path', '_recorder', '_streaming', '_cache',
+                 '_index_sidecar', '_statistic', '_bytes_sent_label',
+                 '_bytes_received_label', '_ciphersuite_label_fn', '_functions',
+                 '_index', '_sections', '_merge_indexes', '_is_parsed')
+
     def __init__(self, json_path, bytes_sent_label, bytes_received_label,
-                ciphersuite_label_fn):
+                ciphersuite_label_fn, streaming=False, cache=None,
+                statistic='mean', index_sidecar=False, recorder=None):
         self._json_path = json_path
+        self._recorder = recorder or NULL_RECORDER
+        self._streaming = streaming
+        self._cache = cache
+        self._index_sidecar = index_sidecar
+        self._statistic = statistic
         self._bytes_sent_label = bytes_sent_label
         self._bytes_received_label = bytes_received_label
-        self._ciphersuite_label_fn = ciphersuite_label_fn
+        # memoized, each name is resolved once for every entity and function
+        self._ciphersuite_label_fn = as_label_resolver(ciphersuite_label_fn)
 
-        self._client_bytes_sent = None
-        self._client_bytes_received = None
-        self._client_profiling_results = None
-
-        self._server_bytes_sent = None
-        self._server_bytes_received = None
-        self._server_profiling_results = None
+        # {entity: [function, ...]}, in file order
+        self._functions = None
+        # ProfilingIndex, the byte ranges of functions and ciphersuites
+        self._index = None
+        # {(entity, function): EntityDTO}, filled on first access
+        self._sections = {}
+        # {(entity, function): ({byte pair: column}, {ciphersuite: row})} of
+        #  the merged sections, extended by each merge
+        self._merge_indexes = {}
 
         self._is_parsed = False
 
+    @property
+    def bytes_sent_label(self):
+        return self._bytes_sent_label
+
+    @property
+    def recorder(self):
+        return self._recorder
+
+    def set_recorder(self, recorder):
+        self._recorder = recorder or NULL_RECORDER
+
+    @property
+    def bytes_received_label(self):
+        return self._bytes_received_label
+
+    @property
+    def client(self):
+        return self.get_entity('client')
+
+    @property
+    def server(self):
+        return self.get_entity('server')
+
+    def get_entities(self):
+        self.parse_if_not_parsed()
+        return list(self._functions)
+
+    def get_functions(self, entity):
+        """
+        Names of the profiled functions of `entity`, in file order.
+        """
+        self.parse_if_not_parsed()
+        return list(self._functions[entity])
+
+    def get_entity(self, entity, function=None):
+        """
+        Results of `function` for `entity`, the first profiled function by
+        default. Each function is only built on its first access.
+        """
+        self.parse_if_not_parsed()
+        function = self._resolve_function(entity, function)
+
+        section = self._sections.get((entity, function))
+        if section is None:
+            section = self._parse_section(entity, function)
+            self._sections[(entity, function)] = section
+        return section
+
     @property
     def client_bytes_sent(self):
-        return self._client_bytes_sent
+        return self.client.bytes_sent
 
     @property
     def client_bytes_received(self):
-        return self._client_bytes_received
+        return self.client.bytes_received
+
+    @property
+    def client_labels(self):
+        return self.client.labels
 
     @property
     def client_profiling_results(self):
-        return self._client_profiling_results
+        return self.client.profiling_results
 
     @property
     def server_bytes_sent(self):
-        return self._server_bytes_sent
+        return self.server.bytes_sent
 
     @property
     def server_bytes_received(self):
-        return self._server_bytes_received
+        return self.server.bytes_received
+
+    @property
+    def server_labels(self):
+        return self.server.labels
 
     @property
     def server_profiling_results(self):
-        return self._server_profiling_results
-    
-    def _get_entity_function_data(self, data, entity):
-        entity_data = data[entity]
-        return list(entity_data.values())[0]
+        return self.server.profiling_results
 
-    def _parse_entity_bytes_sent_and_received(self, data, entity):
-        bytes_sent = [self._bytes_sent_label]
-        bytes_received = [self._bytes_received_label]
+    def _parse_section(self, entity, function):
+        """
+        Decode only the byte range of `function` in the file, found by the
+        pre-scan of `parse`, one ciphersuite at a time: each one is copied
+        into the arrays and dropped before the next one is decoded.
+        """
+        start, end = self._index.function_range(entity, function)
+        if self._streaming:
+            # the tree of the function is never held in memory
+            ciphersuites = iter_function_ciphersuites(self._json_path, start)
+        else:
+            ciphersuites = self._index.iter_ciphersuites(entity, function)
+        n_ciphersuites = len(self._index.get_ciphersuites(entity, function))
 
-        fn_data = self._get_entity_function_data(data, entity)
+        # the decoding and the building are interleaved, but measured apart
+        decode = self._recorder.split_stage('decode', entity=entity,
+                                            function=function)
+        build = self._recorder.split_stage('build', entity=entity,
+                                           function=function)
+        builder = None
+        while True:
+            with decode:
+                entry = next(ciphersuites, None)
+            if entry is None:
+                break
+            cipher_name, byte_pairs = entry
+            with build:
+                if builder is None:
+                    # the byte pairs order is the one of the first ciphersuite
+                    builder = self.EntityBuilder((pair for pair, _ in byte_pairs),
+                                                 n_ciphersuites)
+                builder.add(cipher_name, byte_pairs)
+        with build:
+            if builder is None:
+                # a function without ciphersuites
+                builder = self.EntityBuilder((), 0)
+            section = builder.build(self._ciphersuite_label_fn, self._statistic)
 
-        first_entry = list(fn_data.values())[0]
+        decode.counts['bytes'] = end - start
+        build.counts['ciphersuites'] = len(section.ciphersuites)
+        build.counts['cells'] = section.profiling_results.size
+        decode.done()
+        build.done()
+        return section
 
-        for bytes in first_entry.keys():
-            bytes_sent.append(bytes[0])
-            bytes_received.append(bytes[1])
+    def _resolve_function(self, entity, function):
+        functions = self._functions[entity]
+        if function is None:
+            return functions[0]
+        if function not in functions:
+            raise KeyError('{} has no function {}'.format(entity, function))
+        return function
 
-        return bytes_sent, bytes_received
+    def _resolve_ciphersuite(self, ciphersuites, ciphersuite):
+        """
+        Position of `ciphersuite` in `ciphersuites`, given either as its name
+        in the file or as its label.
+        """
+        if ciphersuite in ciphersuites:
+            return ciphersuites.index(ciphersuite)
+        for position, name in enumerate(ciphersuites):
+            if self._ciphersuite_label_fn(name) == ciphersuite:
+                return position
+        raise KeyError('no ciphersuite {}'.format(ciphersuite))
 
-    def _parse_entity_profiling_results(self, data, entity, 
-                                        bytes_sent, bytes_received):
-        assert len(bytes_sent) == len(bytes_received)
-        byte_pairs = []
-        for i in range(len(bytes_sent)):
-            byte_pairs.append((bytes_sent[i], bytes_received[i]))
+    def get_ciphersuite(self, entity, ciphersuite, function=None):
+        """
+        Results of a single ciphersuite, given by name or label, as an
+        `EntityDTO` with a single row. Unless the function was already
+        built, only the byte range of the ciphersuite is decoded.
+        """
+        self.parse_if_not_parsed()
+        function = self._resolve_function(entity, function)
 
-        fn_data = self._get_entity_function_data(data, entity)
-        profiling_results = []
-        for cipher_name, cipher_profiling in fn_data.items():
-            cipher_label = self._ciphersuite_label_fn(cipher_name)
-            
-            bytes_profres_map = {}
-            for cipher_byte_pair, profiling_res in cipher_profiling.items():
-                bytes_profres_map[cipher_byte_pair] = profiling_res
+        section = self._sections.get((entity, function))
+        if section is not None:
+            row = self._resolve_ciphersuite(section.ciphersuites.tolist(),
+                                            ciphersuite)
+            samples = section.samples
+            return self.EntityDTO(section.bytes_sent, section.bytes_received,
+                                  section.ciphersuites[row:row + 1],
+                                  section.labels[row:row + 1],
+                                  section.profiling_results[row:row + 1],
+                                  None if samples is None
+                                  else samples[row:row + 1])
 
-            cipher_profiling_values = [bytes_profres_map[pair] for pair in byte_pairs] 
-            profiling_results.append([cipher_label, *cipher_profiling_values])
+        names = self._index.get_ciphersuites(entity, function)
+        name = names[self._resolve_ciphersuite(names, ciphersuite)]
+        byte_pairs = self._index.decode_ciphersuite(entity, function, name)
+        builder = self.EntityBuilder(byte_pairs.keys(), 1)
+        builder.add(name, byte_pairs.items())
+        return builder.build(self._ciphersuite_label_fn, self._statistic)
 
-        return profiling_results
+    @property
+    def nbytes(self):
+        """
+        Memory held by the arrays of the built functions.
+        """
+        # a snapshot, the sections may be added to by another thread
+        return sum(array.nbytes for section in list(self._sections.values())
+                   for array in (section.bytes_sent, section.bytes_received,
+                                 section.ciphersuites, section.labels,
+                                 section.profiling_results, section.samples)
+                   if array is not None)
 
+    def load_sections(self, sections):
+        """
+        Use the already built arrays of `sections`, {(entity, function):
+        {array name: array}} as returned by `export_sections`, instead of
+        parsing the file.
+        """
+        self._functions = OrderedDict()
+        self._sections = {}
+        self._merge_indexes = {}
+        for (entity, function), arrays in sections.items():
+            self._functions.setdefault(entity, []).append(function)
 
-    def _parse_entity(self, data, entity):
-        bytes_sent, bytes_received = self._parse_entity_bytes_sent_and_received(
-                                                                                data, 
-                                                                                entity)
-        profiling_results = self._parse_entity_profiling_results(data, 
-                                                                 entity,
-                                                                 bytes_sent[1:],
-                                                                 bytes_received[1:])
+            labels = ciphersuite_labels(arrays['ciphersuites'].tolist(),
+                                        self._ciphersuite_label_fn)
+            samples = arrays.get('samples')
+            if samples is None:
+                profiling_results = arrays['profiling_results']
+            else:
+                profiling_results = aggregate_samples(samples, self._statistic)
+            self._sections[(entity, function)] = self.EntityDTO(
+                                                    arrays['bytes_sent'],
+                                                    arrays['bytes_received'],
+                                                    arrays['ciphersuites'],
+                                                    labels,
+                                                    profiling_results,
+                                                    samples)
+        self._is_parsed = True
 
-        return self.EntityDTO(bytes_sent, bytes_received, profiling_results)
+    def export_sections(self):
+        """
+        {(entity, function): {array name: array}} of every function, built
+        if needed: the arrays of `ParsedDataCache.ARRAY_NAMES`, plus the
+        samples when the file holds lists of samples.
+        """
+        self.parse_if_not_parsed()
+        sections = OrderedDict()
+        for entity, functions in self._functions.items():
+            for function in functions:
+                section = self.get_entity(entity, function)
+                arrays = {name: getattr(section, name)
+                          for name in ParsedDataCache.ARRAY_NAMES}
+                if section.samples is not None:
+                    arrays['samples'] = section.samples
+                sections[(entity, function)] = arrays
+        return sections
 
-    def parse(self):
-        data = parse_json_file_to_dict(self._json_path)
+    def _load_from_cache(self):
+        cached_sections = self._cache.load(self._json_path)
+        if cached_sections is None:
+            return False
+        self.load_sections(cached_sections)
+        return True
 
-        client_parsing_res = self._parse_entity(data, 'client')
-        server_parsing_res = self._parse_entity(data, 'server')
+    def _store_to_cache(self):
+        self._cache.store(self._json_path, self.export_sections())
 
-        self._client_bytes_sent = client_parsing_res.bytes_sent
-        self._client_bytes_received = client_parsing_res.bytes_received
-        self._client_profiling_results = client_parsing_res.profiling_results
+    def parse(self):
+        """
+        Pre-scan the file, indexing the byte range of every function of
+        every entity, without decoding them. The results of each function
+        are decoded from its byte range on their first access, see
+        `get_entity`. With a cache, every function is built at once and
+        stored.
 
-        self._server_bytes_sent = server_parsing_res.bytes_sent
-        self._server_bytes_received = server_parsing_res.bytes_received
-        self._server_profiling_results = server_parsing_res.profiling_results
+        The pre-scan is read from the sidecar index of the file when it is
+        up to date, and written to it with `index_sidecar`.
+        """
+        self._sections = {}
+        self._merge_indexes = {}
+        if self._index is not None:
+            self._index.close()
+        self._index = None
+        if self._cache is not None:
+            with self._recorder.stage('cache load') as counts:
+                loaded = self._load_from_cache()
+                counts['functions'] = len(self._sections)
+            if loaded:
+                self._is_parsed = True
+                return
 
+        with self._recorder.stage('index') as counts:
+            self._index = ProfilingIndex.load_or_build(self._json_path,
+                                                       self._index_sidecar)
+            self._functions = OrderedDict((entity, self._index.get_functions(entity))
+                                          for entity in self._index.get_entities())
+            counts['functions'] = sum(len(functions) for functions
+                                      in self._functions.values())
         self._is_parsed = True
 
+        if self._cache is not None:
+            with self._recorder.stage('cache store'):
+                self._store_to_cache()
+
     def parse_if_not_parsed(self):
         if self._is_parsed:
             return
         self.parse()
 
+    def _get_merge_indexes(self, entity, function, section):
+        indexes = self._merge_indexes.get((entity, function))
+        if indexes is None:
+            if section is None:
+                indexes = ({}, {})
+            else:
+                pairs = zip(section.bytes_sent.tolist(),
+                            section.bytes_received.tolist())
+                indexes = ({pair: col for col, pair in enumerate(pairs)},
+                           {name: row for row, name in
+                            enumerate(section.ciphersuites.tolist())})
+            self._merge_indexes[(entity, function)] = indexes
+        return indexes
+
+    def _merge_section(self, entity, function, fn_data):
+        """
+        Return (new `EntityDTO`, number of byte pairs before the merge) of
+        `function` with the ciphersuites and byte pairs of `fn_data` appended
+        and its cells overwriting the existing ones. Only `fn_data` is
+        walked, the existing arrays are copied as blocks.
+        """
+        functions = self._functions.setdefault(entity, [])
+        section = None
+        if function in functions:
+            section = self.get_entity(entity, function)
+        else:
+            functions.append(function)
+        pair_index, ciphersuite_index = self._get_merge_indexes(entity,
+                                                                function,
+                                                                section)
+        old_rows, old_cols = len(ciphersuite_index), len(pair_index)
+
+        rows, cols, values = [], [], []
+        key_decoder = BytePairKeyDecoder()
+        for ciphersuite, byte_pairs in fn_data.items():
+            row = ciphersuite_index.setdefault(ciphersuite,
+                                               len(ciphersuite_index))
+            for pair, profiling_res in byte_pairs.items():
+                if isinstance(pair, str):
+                    pair = key_decoder(pair)
+                rows.append(row)
+                cols.append(pair_index.setdefault(pair, len(pair_index)))
+                values.append(profiling_res)
+        n_rows, n_cols = len(ciphersuite_index), len(pair_index)
+
+        new_pairs = list(pair_index)[old_cols:]
+        bytes_sent = numpy.array([pair[0] for pair in new_pairs], dtype=numpy.int64)
+        bytes_received = numpy.array([pair[1] for pair in new_pairs],
+                                     dtype=numpy.int64)
+        new_ciphersuites = list(ciphersuite_index)[old_rows:]
+        ciphersuites = numpy.array(new_ciphersuites, dtype=str)
+        labels = ciphersuite_labels(new_ciphersuites, self._ciphersuite_label_fn)
+        if section is not None:
+            bytes_sent = numpy.concatenate((section.bytes_sent, bytes_sent))
+            bytes_received = numpy.concatenate((section.bytes_received,
+                                                bytes_received))
+            ciphersuites = numpy.concatenate((section.ciphersuites, ciphersuites))
+            labels = numpy.concatenate((section.labels, labels))
+
+        old_samples = None if section is None else section.samples
+        if old_samples is None and not any(isinstance(value, list)
+                                           for value in values):
+            old_results = (numpy.empty((0, 0), dtype=numpy.int64)
+                           if section is None else section.profiling_results)
+            new_cells = n_rows * n_cols - old_rows * old_cols
+            covered = {(row, col) for row, col in zip(rows, cols)
+                       if row >= old_rows or col >= old_cols}
+            values = numpy.asarray(values)
+            if (len(covered) < new_cells or values.dtype.kind == 'f' or
+                    old_results.dtype.kind == 'f'):
+                profiling_results = numpy.full((n_rows, n_cols), numpy.nan)
+            else:
+                profiling_results = numpy.empty((n_rows, n_cols),
+                                                dtype=numpy.int64)
+            profiling_results[:old_rows, :old_cols] = old_results
+            profiling_results[rows, cols] = values
+            samples = None
+        else:
+            if old_samples is None:
+                old_samples = (numpy.empty((0, 0, 1)) if section is None else
+                               section.profiling_results[..., numpy.newaxis])
+            values = [value if isinstance(value, list) else [value]
+                      for value in values]
+            n_samples = max([old_samples.shape[2]] +
+                            [len(value) for value in values])
+            samples = numpy.full((n_rows, n_cols, n_samples), numpy.nan)
+            samples[:old_rows, :old_cols, :old_samples.shape[2]] = old_samples
+            for row, col, value in zip(rows, cols, values):
+                samples[row, col, :len(value)] = value
+                samples[row, col, len(value):] = numpy.nan
+            profiling_results = aggregate_samples(samples, self._statistic)
+
+        return self.EntityDTO(bytes_sent, bytes_received, ciphersuites, labels,
+                              profiling_results, samples), old_cols
+
+    def merge(self, fragment):
+        """
+        Merge a JSON fragment, with the same layout as the whole file, into
+        the parsed data. `fragment` is a path or a dict, with byte pairs
+        either decoded or as in the JSON file.
+        New ciphersuites and byte pairs are appended to the arrays of each
+        function (missing cells being NaN), new functions and entities are
+        added, and the results of existing cells are replaced. The merged
+        data lives in memory only, parsing the file again drops it.
+
+        Returns {(entity, function): number of byte pairs before the merge}
+        of the merged functions. Raises ValueError if `fragment` does not
+        have the layout of the file.
+        """
+        self.parse_if_not_parsed()
+        if not isinstance(fragment, dict):
+            fragment = parse_json_file_to_dict(fragment)
+        # check the layout before merging anything
+        if not (isinstance(fragment, dict) and
+                all(isinstance(functions, dict) and
+                    all(isinstance(fn_data, dict) and
+                        all(isinstance(byte_pairs, dict)
+                            for byte_pairs in fn_data.values())
+                        for fn_data in functions.values())
+                    for functions in fragment.values())):
+            raise ValueError('Not a layout of {entity: {function: '
+                             '{ciphersuite: {byte pair: result}}}}')
+
+        merged = OrderedDict()
+        for entity, functions in fragment.items():
+            for function, fn_data in functions.items():
+                if not fn_data:
+                    continue
+                with self._recorder.stage('merge', entity=entity,
+                                          function=function) as counts:
+                    section, n_pairs = self._merge_section(entity, function,
+                                                           fn_data)
+                    counts['cells'] = sum(len(byte_pairs) for byte_pairs
+                                          in fn_data.values())
+                self._sections[(entity, function)] = section
+                merged[(entity, function)] = n_pairs
+        return merged
+
 class EncryptionData(object):
 
+    __slots__ = ('_container', '_is_parsed', '_byte_orders', '_statistics',
+                 '_grids')
+
     def __init__(self, json_path,
                 bytes_sent_label=Defaults.DEFAULT_BYTES_SENT_LABEL,
                 bytes_received_label=Defaults.DEFAULT_BYTES_RECEIVED_LABEL,
-                ciphersuite_label_fn=Defaults.default_ciphersuite_label):
+                ciphersuite_label_fn=Defaults.default_ciphersuite_label,
+                streaming=False,
+                cache=None,
+                statistic='mean',
+                index_sidecar=False,
+                recorder=None):
+        """
+        `cache` is an optional `ParsedDataCache`, used to load the parsed
+        arrays from disk instead of parsing the JSON file again.
+
+        `index_sidecar` writes the byte-offset index of the file next to it
+        (see `data.index.ProfilingIndex`), so later runs skip the pre-scan.
+
+        `statistic` is the statistic of the samples reported as the
+        profiling result of each cell, when the file holds lists of samples
+        (see `data.stats.SampleStatistics.get`).
+
+        `recorder` is an optional `data.instrumentation.StageRecorder`,
+        measuring each stage of the analysis (see also `add_stage_hook`).
+        """
         self._container = EncryptionDataContainer(
                                                  json_path,
                                                  bytes_sent_label,
                                                  bytes_received_label,
-                                                 ciphersuite_label_fn)
+                                                 ciphersuite_label_fn,
+                                                 streaming,
+                                                 cache,
+                                                 statistic,
+                                                 index_sidecar,
+                                                 recorder)
         self._is_parsed = False
+        self._byte_orders = {}
+        self._statistics = {}
+        # {(entity, function, statistic, grouped): ResultGrid}
+        self._grids = {}
 
-    def client(self):
-        for client_res in self._container.client_profiling_results:
-            yield client_res
+    @classmethod
+    def from_sections(cls, json_path, sections, **kwargs):
+        """
+        `EncryptionData` of `json_path` from the arrays exported by
+        `export_sections`, e.g. built by another process, without parsing
+        the file. See `__init__` for the keyword arguments.
+        """
+        ed = cls(json_path, **kwargs)
+        ed._container.load_sections(sections)
+        return ed
 
-    def server(self):
-        for server_res in self._container.server_profiling_results:
-            yield server_res
+    def export_sections(self):
+        """
+        Arrays of every function, see `EncryptionDataContainer.export_sections`.
+        """
+        return self._container.export_sections()
 
-    def _sort_result_by_bytes(self, res):
+    @property
+    def nbytes(self):
         """
-        Sort the final result by the first row.
+        Memory held by the parsed arrays and the sorts, statistics and grids
+        computed from them. The caches are copied before they are summed, as
+        another thread may be filling them.
         """
-        # extract labels and results
-        labels = [sublist[0] for sublist in res]
-        mtrx_to_sort = numpy.array([sublist[1:] for sublist in res])
+        return (self._container.nbytes +
+                sum(order.nbytes for order in list(self._byte_orders.values())) +
+                sum(statistics.nbytes for statistics
+                    in list(self._statistics.values())) +
+                sum(grid.nbytes for grid in list(self._grids.values())))
 
-        # transpose matrix
-        rotated_mtrx = mtrx_to_sort.transpose()
-        # sort by column 0
-        sorted_mtrx = sorted(rotated_mtrx, key=lambda line: line[0])
-        # transpose matrix again
-        sorted_and_rotated_matrix = numpy.array(sorted_mtrx).transpose()
-        sorted_and_rotated_matrix = sorted_and_rotated_matrix.tolist()
+    @property
+    def recorder(self):
+        return self._container.recorder
 
-        matrix_size = len(sorted_and_rotated_matrix)
+    def add_stage_hook(self, hook):
+        """
+        Call `hook` with the `StageRecord` of every stage once it ends,
+        enabling the instrumentation if it was not.
+        """
+        recorder = self._container.recorder
+        if not recorder.enabled:
+            recorder = StageRecorder()
+            self._container.set_recorder(recorder)
+        recorder.add_hook(hook)
 
-        assert len(labels) == matrix_size, ('Mismatch'
-                               ' in the number of labels and matrix rows.')
-        # join labels and results
-        res = [[labels[i]] + sorted_and_rotated_matrix[i] for i in range(matrix_size)]
-        return res
+    def client(self, function=None):
+        for client_res in self._entity_rows(self._container.get_entity('client',
+                                                                      function)):
+            yield client_res
 
-    def get_client_bytes_sent_list(self):
-        self._container.parse_if_not_parsed()
-        return self._container.client_bytes_sent[1:]
+    def server(self, function=None):
+        for server_res in self._entity_rows(self._container.get_entity('server',
+                                                                      function)):
+            yield server_res
 
-    def get_client_bytes_received_list(self):
-        self._container.parse_if_not_parsed()
-        return self._container.client_bytes_received[1:]
+    def _entity_rows(self, entity):
+        """
+        Render the profiling results of an entity as [label, v1, v2, ...] lists.
+        """
+        for label, values in zip(entity.labels.tolist(),
+                                 entity.profiling_results):
+            yield [label] + values.tolist()
 
-    def get_client_xlxs_bytes_sent_result(self):
-        self._container.parse_if_not_parsed()
-        res = (self._container.client_bytes_sent, 
-               *self._container.client_profiling_results)
-        res = self._sort_result_by_bytes(res)
-        return res
+    def _section_key(self, entity, function):
+        if function is None:
+            function = self._container.get_functions(entity)[0]
+        return entity, function
 
-    def get_server_bytes_received_list(self):
+    def get_functions(self, entity=None):
+        """
+        Names of the profiled functions of `entity`, or {entity: functions}
+        for every entity of the file.
+        """
         self._container.parse_if_not_parsed()
-        return self._container.client_bytes_received[1:]
+        if entity is not None:
+            return self._container.get_functions(entity)
+        return OrderedDict((entity, self._container.get_functions(entity))
+                           for entity in self.get_entities())
 
-    def get_server_bytes_sent_list(self):
+    def get_entities(self):
         self._container.parse_if_not_parsed()
-        return self._container.server_bytes_sent[1:]
+        return self._container.get_entities()
 
-    def get_server_xlxs_bytes_sent_result(self):
-        self._container.parse_if_not_parsed()
-        res = (self._container.server_bytes_sent, 
-               *self._container.server_profiling_results)
-        res = self._sort_result_by_bytes(res)
-        return res
+    def _get_byte_order(self, entity, axis, function=None):
+        """
+        Permutation sorting the columns of `entity` by the bytes of `axis`
+        ('sent' or 'received'), ties being ordered by the other byte axis.
+        Permutations are cached, so every view of an entity sorts it once.
+        """
+        key = self._section_key(entity, function) + (axis,)
+        order = self._byte_orders.get(key)
+        if order is None:
+            keys = self._byte_order_keys(entity, axis, function)
+            with self.recorder.stage('sort', entity=key[0], function=key[1],
+                                     axis=axis) as counts:
+                # lexsort is stable and sorts by the last key first
+                order = numpy.lexsort(keys)
+                counts['columns'] = len(order)
+            order.flags.writeable = False
+            self._byte_orders[key] = order
+        return order
 
-    def get_client_xlxs_bytes_received_result(self):
-        self._container.parse_if_not_parsed()
-        res = (self._container.client_bytes_received,
-               *self._container.client_profiling_results)
-        res = self._sort_result_by_bytes(res)
-        return res
+    def _byte_order_keys(self, entity, axis, function=None):
+        entity_data = self._container.get_entity(entity, function)
+        if axis == 'sent':
+            return entity_data.bytes_received, entity_data.bytes_sent
+        if axis == 'received':
+            return entity_data.bytes_sent, entity_data.bytes_received
+        raise ValueError('Unknown byte axis: {}'.format(axis))
 
-    def get_server_xlxs_bytes_received_result(self):
-        self._container.parse_if_not_parsed()
-        res = (self._container.server_bytes_received,
-               *self._container.server_profiling_results)
-        res = self._sort_result_by_bytes(res)
-        return res
+    def _extend_byte_order(self, entity, axis, function, order):
+        """
+        Byte order of `function` after columns were appended to it, from
+        its `order` before: only the new columns are sorted, and then
+        inserted among the old ones.
+        """
+        secondary, primary = self._byte_order_keys(entity, axis, function)
+        keys = numpy.empty(len(primary), dtype=[('primary', numpy.int64),
+                                                ('secondary', numpy.int64)])
+        keys['primary'] = primary
+        keys['secondary'] = secondary
+
+        n_old = len(order)
+        new_order = n_old + numpy.lexsort((secondary[n_old:], primary[n_old:]))
+        # after the equal old columns, as a stable sort of all of them would
+        positions = numpy.searchsorted(keys[order], keys[new_order],
+                                       side='right')
+        order = numpy.insert(order, positions, new_order)
+        order.flags.writeable = False
+        return order
+
+    def merge(self, fragment):
+        """
+        Merge a JSON fragment (a path or a decoded dict), e.g. written by a
+        profiling run still in progress, into the parsed data, without
+        parsing the previous data again (see
+        `EncryptionDataContainer.merge`). The cached byte orders of the
+        merged functions are extended with the new byte pairs. Returns the
+        merged (entity, function) pairs.
+        """
+        merged = self._container.merge(fragment)
+        self._grids = {key: grid for key, grid in self._grids.items()
+                       if key[:2] not in merged}
+        for (entity, function), n_old_pairs in merged.items():
+            self._statistics.pop((entity, function), None)
+            for axis in ('sent', 'received'):
+                key = (entity, function, axis)
+                order = self._byte_orders.pop(key, None)
+                if order is not None and len(order) == n_old_pairs:
+                    self._byte_orders[key] = self._extend_byte_order(
+                                                    entity, axis, function, order)
+        return list(merged)
+
+    def get_statistics(self, entity, function=None):
+        """
+        `SampleStatistics` over the samples of `entity`. When the file holds
+        single values, each cell is handled as a single sample.
+        """
+        key = self._section_key(entity, function)
+        statistics = self._statistics.get(key)
+        if statistics is None:
+            entity_data = self._container.get_entity(entity, function)
+            samples = entity_data.samples
+            if samples is None:
+                samples = entity_data.profiling_results[..., numpy.newaxis].astype(
+                                                                numpy.float64)
+            with self.recorder.stage('statistics', entity=key[0],
+                                     function=key[1]) as counts:
+                statistics = SampleStatistics(samples)
+                counts['samples'] = samples.size
+            self._statistics[key] = statistics
+        return statistics
+
+    def get_sorted_data(self, entity, axis, statistic=None, function=None):
+        """
+        Return (bytes, profiling results) arrays of `entity`, with the columns
+        sorted by the bytes of `axis` ('sent' or 'received'). If `statistic`
+        is given, it replaces the profiling results (see `get_statistics`).
+        """
+        order = self._get_byte_order(entity, axis, function)
+        bytes_array, profiling_results = self._get_axis_data(entity, axis,
+                                                             statistic, function)
+        if _is_identity(order):
+            # already sorted in the file, the arrays are returned as is
+            return bytes_array, profiling_results
+        return bytes_array[order], profiling_results[:, order]
+
+    def _get_axis_data(self, entity, axis, statistic=None, function=None):
+        """
+        (bytes of `axis`, profiling results or `statistic`) of `entity`, in
+        file order and without copies.
+        """
+        entity_data = self._container.get_entity(entity, function)
+        bytes_array = (entity_data.bytes_sent if axis == 'sent'
+                       else entity_data.bytes_received)
+        if statistic is None:
+            return bytes_array, entity_data.profiling_results
+        return bytes_array, self.get_statistics(entity, function).get(statistic)
+
+    def get_fit_report(self, entity, axis, statistic=None, function=None,
+                       frequency=None):
+        """
+        Columns of the linear and piecewise fits of the results of every
+        ciphersuite of `entity` against the bytes of `axis`: fixed overhead
+        (intercept), cost per byte (slope), R² and throughput, in bytes
+        per second if the `frequency` of the results unit is given (see
+        `data.fit`).
+        """
+        entity_data = self._container.get_entity(entity, function)
+        bytes_array, profiling_results = self._get_axis_data(entity, axis,
+                                                             statistic, function)
+        with self.recorder.stage('fit', entity=entity, function=function,
+                                 axis=axis) as counts:
+            report = fit_report(entity_data.ciphersuites, entity_data.labels,
+                                bytes_array, profiling_results, frequency)
+            counts['cells'] = profiling_results.size
+        return report
+
+    def get_grid(self, entity, statistic=None, function=None, grouped=False):
+        """
+        `data.grid.ResultGrid` of `entity` over the (bytes sent, bytes
+        received) plane, to query ciphersuite subsets, byte ranges and
+        slices of both axes at once. With `grouped`, the ciphersuites
+        sharing a label are averaged into a single row.
+        """
+        key = self._section_key(entity, function) + (statistic, grouped)
+        grid = self._grids.get(key)
+        if grid is None:
+            entity_data = self._container.get_entity(entity, function)
+            _, profiling_results = self._get_axis_data(entity, 'sent',
+                                                       statistic, function)
+            if not grouped:
+                grid = ResultGrid.from_entity(entity_data, profiling_results)
+            else:
+                labels, profiling_results = group_by_label(entity_data.labels,
+                                                           profiling_results)
+                grid = ResultGrid(entity_data.bytes_sent,
+                                  entity_data.bytes_received, labels, labels,
+                                  profiling_results)
+            self._grids[key] = grid
+        return grid
+
+    def iter_heatmap_sheets(self, entity, statistic=None, function=None,
+                            grouped=False):
+        """
+        Yield (label, rows) of the (bytes sent x bytes received) plane of
+        every ciphersuite of `entity`, see `data.grid.ResultGrid.heatmap_rows`.
+        """
+        grid = self.get_grid(entity, statistic, function, grouped)
+        corner_label = '{} \\ {}'.format(self._container.bytes_sent_label,
+                                         self._container.bytes_received_label)
+        for row, label in enumerate(grid.labels.tolist()):
+            yield label, grid.heatmap_rows(row, corner_label)
+
+    def iter_xlxs_result_rows(self, entity, axis, statistic=None, function=None,
+                              grouped=False, reduction=None):
+        """
+        Same rows as the get_*_xlxs_*_result methods, sorted by the bytes of
+        `axis` ('sent' or 'received'), but as [label, values array] pairs
+        instead of lists, to be written without materializing every cell.
+        With `grouped`, the ciphersuites sharing a label are averaged into a
+        single row (see `data.labels.group_by_label`).
+        Each row is sorted as it is yielded, so at most one sorted row is
+        held in memory on top of the parsed arrays.
+        With a `reduction` (see `data.reduce`), the sorted results are
+        binned or downsampled along the byte axis, for every ciphersuite at
+        once, and the rows of the reduced results are yielded instead.
+        """
+        if axis == 'sent':
+            bytes_label = self._container.bytes_sent_label
+        else:
+            bytes_label = self._container.bytes_received_label
+        order = self._get_byte_order(entity, axis, function)
+        bytes_array, profiling_results = self._get_axis_data(entity, axis,
+                                                             statistic, function)
+        labels = self._container.get_entity(entity, function).labels
+        if grouped:
+            labels, profiling_results = group_by_label(labels, profiling_results)
+
+        if _is_identity(order):
+            order = slice(None)
+        if reduction is not None:
+            with self.recorder.stage('reduce') as counts:
+                rows = list(reduction.rows(bytes_label, bytes_array[order],
+                                           labels.tolist(),
+                                           profiling_results[:, order]))
+                counts['cells'] = profiling_results.size
+            yield from rows
+            return
+        yield [bytes_label, bytes_array[order]]
+        for label, values in zip(labels.tolist(), profiling_results):
+            yield [label, values[order]]
+
+    def _get_xlxs_result(self, entity, axis, function=None):
+        return [[label] + values.tolist()
+                for label, values in self.iter_xlxs_result_rows(
+                                                entity, axis, function=function)]
+
+    def get_data(self, entity, function=None):
+        """
+        Columnar results of `function` (the first profiled function by
+        default) for `entity`. The arrays are returned as is (read-only),
+        without any copies.
+        """
+        return self._container.get_entity(entity, function)
+
+    def get_client_data(self, function=None):
+        return self.get_data('client', function)
+
+    def get_server_data(self, function=None):
+        return self.get_data('server', function)
+
+    def get_ciphersuite_data(self, entity, ciphersuite, function=None):
+        """
+        Columnar results of a single ciphersuite, given by its name or its
+        label (e.g. 'CAMELLIA-256-GCM-SHA384'), decoding only its byte range
+        of the file when `function` was not loaded yet.
+        """
+        return self._container.get_ciphersuite(entity, ciphersuite, function)
+
+    def iter_xlxs_results(self, statistic=None, all_functions=False,
+                          grouped=False, reduction=None):
+        """
+        Yield (entity, function, byte axis, rows) for every entity and byte
+        axis, for the first function or, with `all_functions`, for every
+        function. All of them are computed from a single parse. See
+        `iter_xlxs_result_rows`.
+        """
+        for entity in self.get_entities():
+            functions = self.get_functions(entity)
+            if not all_functions:
+                functions = functions[:1]
+            for function in functions:
+                for axis in ('sent', 'received'):
+                    yield entity, function, axis, self.iter_xlxs_result_rows(
+                                                        entity, axis, statistic,
+                                                        function, grouped,
+                                                        reduction)
+
+    def get_client_bytes_sent_list(self, function=None):
+        return self.get_data('client', function).bytes_sent.tolist()
+
+    def get_client_bytes_received_list(self, function=None):
+        return self.get_data('client', function).bytes_received.tolist()
+
+    def get_client_xlxs_bytes_sent_result(self, function=None):
+        return self._get_xlxs_result('client', 'sent', function)
+
+    def get_server_bytes_received_list(self, function=None):
+        return self.get_data('server', function).bytes_received.tolist()
+
+    def get_server_bytes_sent_list(self, function=None):
+        return self.get_data('server', function).bytes_sent.tolist()
+
+    def get_server_xlxs_bytes_sent_result(self, function=None):
+        return self._get_xlxs_result('server', 'sent', function)
+
+    def get_client_xlxs_bytes_received_result(self, function=None):
+        return self._get_xlxs_result('client', 'received', function)
+
+    def get_server_xlxs_bytes_received_result(self, function=None):
+        return self._get_xlxs_result('server', 'received', function)
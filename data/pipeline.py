@@ -0,0 +1,126 @@
+"""
+Pipelined output of a single result: the ciphersuites are decoded and their
+rows built in worker processes while the rows already built are written,
+see `iter_pipelined_rows`.
+"""
+import collections
+import os
+
+import numpy
+
+from concurrent.futures import ProcessPoolExecutor
+
+from data.index import ProfilingIndex
+from data.labels import as_label_resolver, default_label_resolver
+from data.models import EncryptionDataContainer
+from data.stats import aggregate_samples
+
+# cells decoded by each task, enough to amortize sending them back
+DEFAULT_CHUNK_CELLS = 1 << 16
+
+
+def decode_rows(json_path, ranges, byte_pairs, statistic='mean', kind=None):
+    """
+    Decode the (ciphersuite, (start, end)) `ranges` of `json_path`, in a
+    worker. Returns (ciphersuites, results) with the results columns in the
+    order of `byte_pairs`, each cell being the `statistic` of its samples
+    when the file holds lists of samples.
+
+    `kind` is the kind of the values of every chunk of the function (see
+    `ProfilingIndex.scan_value_kind`), so that the results of each chunk
+    are the same as if the function was built at once: a chunk of integers
+    is cast to floats when other chunks hold floats, and its values are
+    taken as single samples when other chunks hold lists of samples.
+    """
+    index = ProfilingIndex(json_path, {})
+    try:
+        builder = EncryptionDataContainer.EntityBuilder(byte_pairs, len(ranges))
+        for ciphersuite, pairs in index.iter_ranges(ranges):
+            builder.add(ciphersuite, pairs)
+        # the labels are resolved by the consumer
+        section = builder.build(str, statistic)
+    finally:
+        index.close()
+    results = section.profiling_results
+    if kind == 'samples' and section.samples is None:
+        results = aggregate_samples(
+                    results[..., numpy.newaxis].astype(numpy.float64), statistic)
+    elif kind == 'float':
+        results = results.astype(numpy.float64, copy=False)
+    return section.ciphersuites.tolist(), results
+
+
+def _sorted_byte_pairs(byte_pairs, axis):
+    """
+    `byte_pairs` sorted by the bytes of `axis`, ties being ordered by the
+    other axis, as `EncryptionData` sorts its columns.
+    """
+    sent = numpy.fromiter((pair[0] for pair in byte_pairs), dtype=numpy.int64,
+                          count=len(byte_pairs))
+    received = numpy.fromiter((pair[1] for pair in byte_pairs),
+                              dtype=numpy.int64, count=len(byte_pairs))
+    if axis == 'sent':
+        order = numpy.lexsort((received, sent))
+    elif axis == 'received':
+        order = numpy.lexsort((sent, received))
+    else:
+        raise ValueError('Unknown byte axis: {}'.format(axis))
+    return [byte_pairs[i] for i in order.tolist()]
+
+
+def iter_pipelined_rows(json_path, entity, axis, bytes_label, function=None,
+                        ciphersuite_label_fn=None, statistic='mean', jobs=None,
+                        chunk_cells=DEFAULT_CHUNK_CELLS, executor=None,
+                        index_sidecar=False):
+    """
+    Yield the same rows as `EncryptionData.iter_xlxs_result_rows`, for the
+    default `function` of `entity`, while later rows are still being
+    decoded.
+
+    The byte order is computed from the first ciphersuite (whose byte pairs
+    every ciphersuite shares), so the bytes row comes first, and the kind
+    of the values from the bytes of every ciphersuite (see `decode_rows`).
+    Then chunks of about `chunk_cells` cells are decoded by `jobs` worker
+    processes (or the given `executor`). At most two chunks per worker are
+    in flight, so memory stays bounded whatever the speed of the consumer.
+    """
+    index = ProfilingIndex.load_or_build(json_path, index_sidecar)
+    try:
+        if function is None:
+            function = index.get_functions(entity)[0]
+        ranges = list(index.entries[entity][function][2].items())
+        # no byte pairs for a function without ciphersuites
+        _, byte_pairs = next(index.iter_ranges(ranges[:1]), (None, []))
+        kind = index.scan_value_kind(ranges)
+    finally:
+        index.close()
+    byte_pairs = _sorted_byte_pairs([pair for pair, _ in byte_pairs], axis)
+    label_fn = as_label_resolver(ciphersuite_label_fn or default_label_resolver)
+
+    yield [bytes_label, numpy.array([pair[0 if axis == 'sent' else 1]
+                                     for pair in byte_pairs],
+                                    dtype=numpy.int64)]
+
+    chunk_size = max(1, chunk_cells // max(len(byte_pairs), 1))
+    chunks = collections.deque(ranges[i:i + chunk_size]
+                               for i in range(0, len(ranges), chunk_size))
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+    max_pending = 2 * (jobs or os.cpu_count() or 1)
+    pending = collections.deque()
+    try:
+        while chunks or pending:
+            while chunks and len(pending) < max_pending:
+                pending.append(executor.submit(decode_rows, json_path,
+                                               chunks.popleft(), byte_pairs,
+                                               statistic, kind))
+            ciphersuites, results = pending.popleft().result()
+            for label, values in zip(label_fn.labels(ciphersuites).tolist(),
+                                     results):
+                yield [label, values]
+    finally:
+        for future in pending:
+            future.cancel()
+        if owns_executor:
+            executor.shutdown()
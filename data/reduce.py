@@ -0,0 +1,226 @@
+"""
+Reductions of the sorted byte axis of the results, for sweeps with far more
+byte sizes than a report can usefully show: binning, with the min, mean and
+max of every bin, and shape preserving downsampling. Both are computed for
+every ciphersuite at once.
+"""
+import functools
+
+import numpy
+
+
+def log_bin_edges(bytes_array, n_bins, align=1):
+    """
+    Lower edges of up to `n_bins` bins of logarithmically growing widths
+    covering the sorted `bytes_array`. Edges are rounded down to multiples
+    of `align` (e.g. the cipher block size, so that the steps of the
+    padding are not split across bins), which may merge the smallest bins.
+    """
+    low, high = max(int(bytes_array[0]), 1), int(bytes_array[-1]) + 1
+    edges = numpy.geomspace(low, max(high, low + 1), n_bins + 1)[:-1]
+    edges = numpy.unique((edges // align).astype(numpy.int64) * align)
+    edges[0] = min(edges[0], bytes_array[0])
+    return edges
+
+
+def fixed_bin_edges(bytes_array, width):
+    """
+    Lower edges of bins of `width` bytes, aligned on multiples of `width`,
+    covering the sorted `bytes_array`.
+    """
+    first = int(bytes_array[0]) // width * width
+    return numpy.arange(first, int(bytes_array[-1]) + 1, width,
+                        dtype=numpy.int64)
+
+
+class BinnedResults(object):
+    """
+    Results reduced to bins of the byte axis: the `lower` and `upper` byte
+    sizes found in each bin, the number of byte sizes in it (`counts`), and
+    the `min`, `mean` and `max` (ciphersuite x bin) of the results in it,
+    NaN cells left out. Empty bins are left out.
+    """
+
+    def __init__(self, lower, upper, counts, minimum, mean, maximum):
+        self._lower = lower
+        self._upper = upper
+        self._counts = counts
+        self._min = minimum
+        self._mean = mean
+        self._max = maximum
+
+    @property
+    def lower(self):
+        return self._lower
+
+    @property
+    def upper(self):
+        return self._upper
+
+    @property
+    def counts(self):
+        return self._counts
+
+    @property
+    def min(self):
+        return self._min
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def max(self):
+        return self._max
+
+
+def bin_results(bytes_array, profiling_results, edges):
+    """
+    `BinnedResults` of `profiling_results` (ciphersuite x bytes), whose
+    columns are sorted by `bytes_array`, over the bins starting at `edges`.
+    Byte sizes below the first edge fall into the first bin.
+    """
+    bins = numpy.searchsorted(edges, bytes_array, side='right') - 1
+    # the columns are sorted, so each bin is a contiguous run of them
+    starts = numpy.flatnonzero(numpy.concatenate(([True],
+                                                  bins[1:] != bins[:-1])))
+    ends = numpy.append(starts[1:], len(bins))
+
+    results = numpy.asarray(profiling_results, dtype=numpy.float64)
+    present = ~numpy.isnan(results)
+    counts = numpy.add.reduceat(present, starts, axis=1)
+    sums = numpy.add.reduceat(numpy.where(present, results, 0), starts, axis=1)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts
+    # fmin and fmax ignore NaN unless every value is NaN
+    return BinnedResults(bytes_array[starts], bytes_array[ends - 1],
+                         ends - starts,
+                         numpy.fmin.reduceat(results, starts, axis=1),
+                         mean,
+                         numpy.fmax.reduceat(results, starts, axis=1))
+
+
+def _normalize_rows(results):
+    """
+    Rows scaled to [0, 1], NaN cells replaced with the mean of their row,
+    so that every ciphersuite weighs the same in the downsampling.
+    """
+    missing = numpy.isnan(results)
+    if missing.any():
+        # the nan* reductions copy the results, only pay for them if needed
+        with numpy.errstate(invalid='ignore'):
+            means = numpy.nanmean(results, axis=1, keepdims=True)
+        results = numpy.where(missing, numpy.nan_to_num(means), results)
+    normalized = numpy.array(results, dtype=numpy.float64)
+    low = normalized.min(axis=1, keepdims=True)
+    span = normalized.max(axis=1, keepdims=True) - low
+    span[span == 0] = 1
+    normalized -= low
+    normalized /= span
+    return normalized
+
+
+def lttb_indices(bytes_array, profiling_results, n_columns):
+    """
+    Columns kept when downsampling the results to `n_columns` with the
+    largest triangle three buckets algorithm, shared by every ciphersuite:
+    the first and last columns are kept, and in each bucket between them
+    the column forming the largest triangles (summed over the ciphersuites)
+    with the previously kept column and the average of the next bucket.
+    Steps in the results make large triangles, so they are kept.
+    """
+    n = len(bytes_array)
+    if n <= n_columns:
+        return numpy.arange(n)
+    if n_columns < 3:
+        return numpy.array([0, n - 1][:n_columns])
+
+    x = numpy.asarray(bytes_array, dtype=numpy.float64)
+    x = (x - x[0]) / ((x[-1] - x[0]) or 1)
+    y = _normalize_rows(profiling_results)
+
+    # n_columns - 2 buckets between the first and the last column
+    edges = numpy.linspace(1, n - 1, n_columns - 1).astype(numpy.int64)
+    widths = numpy.diff(edges)
+    bucket_x = numpy.add.reduceat(x[:-1], edges[:-1]) / widths
+    bucket_y = numpy.add.reduceat(y[:, :-1], edges[:-1], axis=1) / widths
+    # the point after the last bucket is the last column
+    bucket_x = numpy.append(bucket_x[1:], x[-1])
+    bucket_y = numpy.column_stack((bucket_y[:, 1:], y[:, -1]))
+
+    selected = numpy.empty(n_columns, dtype=numpy.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_columns - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[:, previous, numpy.newaxis]
+        cx, cy = bucket_x[bucket], bucket_y[:, bucket, numpy.newaxis]
+        areas = numpy.abs((ax - cx) * (y[:, start:end] - ay) -
+                          (ax - x[start:end]) * (cy - ay))
+        previous = start + int(numpy.argmax(areas.sum(axis=0)))
+        selected[bucket + 1] = previous
+    return selected
+
+
+class Binning(object):
+    """
+    Reduction of the results to the bins whose lower edges are given by
+    `edges_fn(bytes_array)`, output as min, mean and max rows per
+    ciphersuite, the bytes row holding the lowest size of each bin.
+    """
+
+    STATISTICS = ('min', 'mean', 'max')
+
+    def __init__(self, edges_fn):
+        self._edges_fn = edges_fn
+
+    def rows(self, bytes_label, bytes_array, labels, profiling_results):
+        """
+        Yield the rows of the reduced results, in the [label, values array]
+        format of the exporters, from results sorted by `bytes_array`.
+        """
+        if not len(bytes_array):
+            yield [bytes_label, bytes_array]
+            return
+        binned = bin_results(bytes_array, profiling_results,
+                             self._edges_fn(bytes_array))
+        yield [bytes_label, binned.lower]
+        for row, label in enumerate(labels):
+            for statistic in self.STATISTICS:
+                yield ['{} {}'.format(label, statistic),
+                       getattr(binned, statistic)[row]]
+
+
+class LogBinning(Binning):
+    """
+    `n_bins` bins of logarithmically growing widths, see `log_bin_edges`.
+    """
+
+    def __init__(self, n_bins, align=1):
+        super().__init__(functools.partial(log_bin_edges, n_bins=n_bins,
+                                           align=align))
+
+
+class FixedBinning(Binning):
+    """
+    Bins of `width` bytes, see `fixed_bin_edges`.
+    """
+
+    def __init__(self, width):
+        super().__init__(functools.partial(fixed_bin_edges, width=width))
+
+
+class Downsampling(object):
+    """
+    Reduction of the results to `n_columns` of their columns, see
+    `lttb_indices`.
+    """
+
+    def __init__(self, n_columns):
+        self._n_columns = n_columns
+
+    def rows(self, bytes_label, bytes_array, labels, profiling_results):
+        columns = lttb_indices(bytes_array, profiling_results, self._n_columns)
+        yield [bytes_label, bytes_array[columns]]
+        for label, values in zip(labels, profiling_results[:, columns]):
+            yield [label, values]
@@ -0,0 +1,437 @@
+"""
+Long-running analysis server, keeping the parsed datasets in memory between
+requests, see `AnalysisServer`.
+
+Requests are HTTP GETs, over TCP or a Unix socket, naming the JSON file with
+a `path` parameter. Answers are JSON, except for `/export`, which returns the
+exported file:
+
+    /datasets                                   cached datasets
+    /functions?path=...                         {entity: [function, ...]}
+    /result?path=...&entity=client&axis=sent    rows sorted by the bytes of axis
+    /grid?path=...&entity=...&sent=16:1024      byte pairs and results, filtered
+    /slice?path=...&entity=...&sent=1024        results along the other axis
+    /export?path=...&format=xlsx                every entity and axis
+
+`/result`, `/grid` and `/slice` also take `function`, `statistic` and
+`grouped`; `/grid` and `/slice` take `ciphersuites` (comma separated names or
+labels). Byte selections are a size or an inclusive `low:high` range, either
+bound being optional.
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import tempfile
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from utils import EXPORT_FORMATS, export_results
+from data.cache import file_fingerprint
+from data.models import EncryptionData
+
+DEFAULT_MAX_BYTES = 1 << 30
+EXPORT_CONTENT_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'npz': 'application/octet-stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def load_sections(json_path, statistic='mean'):
+    """
+    Parse `json_path` and build every function, in a worker process. The
+    arrays are sent back to the server (see `EncryptionData.from_sections`).
+    """
+    return EncryptionData(json_path, statistic=statistic).export_sections()
+
+
+class DatasetCache(object):
+    """
+    LRU of `EncryptionData` keyed by path, each entry being valid as long as
+    the file keeps its size and modification time. The memory of the
+    datasets (`EncryptionData.nbytes`, which grows as sorts and grids are
+    computed) is bounded by `max_bytes`, the least recently used datasets
+    being dropped first. The most recent one is kept even if it is larger,
+    and so are the pinned ones (see `pinned`).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self._max_bytes = max_bytes
+        # {path: (fingerprint, EncryptionData)}, least recently used first
+        self._entries = OrderedDict()
+        # {path: number of users}, not to be dropped
+        self._pins = {}
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return sum(ed.nbytes for _, ed in self._entries.values())
+
+    def get(self, path, fingerprint):
+        """
+        Dataset of `path` if it is cached and `fingerprint` (see
+        `data.cache.file_fingerprint`) did not change, None otherwise.
+        """
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] != fingerprint:
+            del self._entries[path]
+            entry = None
+        if entry is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries.move_to_end(path)
+        return entry[1]
+
+    def put(self, path, fingerprint, ed):
+        self._entries[path] = (fingerprint, ed)
+        self._entries.move_to_end(path)
+        self.trim()
+
+    @contextlib.contextmanager
+    def pinned(self, path):
+        """
+        Keep the dataset of `path` while in the block, e.g. while it is used
+        by another thread.
+        """
+        self._pins[path] = self._pins.get(path, 0) + 1
+        try:
+            yield
+        finally:
+            self._pins[path] -= 1
+            if not self._pins[path]:
+                del self._pins[path]
+
+    def trim(self):
+        """
+        Drop the least recently used datasets until the memory bound is met,
+        skipping the pinned ones.
+        """
+        sizes = OrderedDict((path, ed.nbytes)
+                            for path, (_, ed) in self._entries.items())
+        total = sum(sizes.values())
+        newest = next(reversed(sizes), None)
+        for path, nbytes in sizes.items():
+            if total <= self._max_bytes:
+                break
+            if path == newest or path in self._pins:
+                continue
+            del self._entries[path]
+            total -= nbytes
+
+    def info(self):
+        return OrderedDict([
+            ('datasets', [OrderedDict([('path', path),
+                                       ('nbytes', ed.nbytes)])
+                          for path, (_, ed) in self._entries.items()]),
+            ('nbytes', self.nbytes),
+            ('max_bytes', self._max_bytes),
+            ('hits', self._hits),
+            ('misses', self._misses),
+        ])
+
+
+class RequestError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_values(array):
+    """
+    Array as a list, NaN (not valid JSON) being replaced with None.
+    """
+    values = array.tolist()
+    if array.dtype.kind != 'f':
+        return values
+    if array.ndim == 1:
+        return [None if value != value else value for value in values]
+    return [_json_values(row) for row in array]
+
+
+def _parse_bytes(value):
+    """
+    None, a size or an inclusive (low, high) range from a request parameter.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        if ':' not in value:
+            return int(value)
+        low, high = value.split(':', 1)
+        return int(low) if low else None, int(high) if high else None
+    except ValueError:
+        raise RequestError(400, 'invalid byte selection: {}'.format(value))
+
+
+def _parse_flag(value):
+    return value is not None and value.lower() in ('1', 'true', 'yes')
+
+
+class AnalysisServer(object):
+    """
+    Answers analysis requests on the datasets of a `DatasetCache`. Files
+    are parsed in a pool of `workers` processes (or the given `executor`),
+    so a large file does not hold up the requests on the cached ones, and
+    concurrent requests on the same file share a single parse. The sorts,
+    grids and exports computed on a dataset run in a thread, off the event
+    loop, the dataset being pinned in the cache meanwhile.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, workers=None,
+                 executor=None):
+        self._cache = DatasetCache(max_bytes)
+        self._workers = workers
+        self._executor = executor
+        # {(path, size, mtime_ns): future of the dataset}, being parsed
+        self._loading = {}
+        self._routes = {
+            '/datasets': self._datasets,
+            '/functions': self._functions,
+            '/result': self._result,
+            '/grid': self._grid,
+            '/slice': self._slice,
+            '/export': self._export,
+        }
+
+    @property
+    def cache(self):
+        return self._cache
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def get_dataset(self, json_path):
+        """
+        `EncryptionData` of `json_path`, parsed in the worker pool unless it
+        is cached.
+        """
+        path = os.path.realpath(json_path)
+        try:
+            fingerprint = file_fingerprint(path)
+        except OSError:
+            raise RequestError(404, 'no such file: {}'.format(json_path))
+        ed = self._cache.get(path, fingerprint)
+        if ed is not None:
+            return ed
+
+        key = (path, fingerprint['size'], fingerprint['mtime_ns'])
+        future = self._loading.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(path, fingerprint))
+            self._loading[key] = future
+            future.add_done_callback(lambda _: self._loading.pop(key, None))
+        # a request cancelled while waiting does not cancel the parse
+        return await asyncio.shield(future)
+
+    async def _load(self, path, fingerprint):
+        loop = asyncio.get_running_loop()
+        sections = await loop.run_in_executor(self._get_executor(),
+                                              load_sections, path)
+        ed = EncryptionData.from_sections(path, sections)
+        self._cache.put(path, fingerprint, ed)
+        return ed
+
+    async def handle(self, target):
+        """
+        Answer the request for `target` (path and query string), returning
+        (status, content type, body).
+        """
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        route = self._routes.get(url.path.rstrip('/') or '/')
+        try:
+            if route is None:
+                raise RequestError(404, 'unknown request: {}'.format(url.path))
+            response = await route(params)
+        except RequestError as e:
+            return e.status, 'application/json', self._json_body(
+                                                        {'error': str(e)})
+        except KeyError as e:
+            return 404, 'application/json', self._json_body(
+                                        {'error': 'not found: {}'.format(e.args[0])})
+        except ValueError as e:
+            return 400, 'application/json', self._json_body({'error': str(e)})
+        finally:
+            self._cache.trim()
+
+        if isinstance(response, tuple):
+            content_type, body = response
+            return 200, content_type, body
+        return 200, 'application/json', self._json_body(response)
+
+    def _json_body(self, response):
+        return json.dumps(response).encode('utf-8')
+
+    async def _dataset(self, params):
+        if 'path' not in params:
+            raise RequestError(400, 'missing parameter: path')
+        return await self.get_dataset(params['path'])
+
+    async def _run_on_dataset(self, params, fn, *args):
+        """
+        Result of `fn(ed, *args)`, `ed` being the dataset of the request,
+        run in a thread as computing sorts and grids takes a while.
+        """
+        ed = await self._dataset(params)
+        loop = asyncio.get_running_loop()
+        with self._cache.pinned(os.path.realpath(params['path'])):
+            return await loop.run_in_executor(None, functools.partial(
+                                                            fn, ed, *args))
+
+    async def _datasets(self, params):
+        return self._cache.info()
+
+    async def _functions(self, params):
+        ed = await self._dataset(params)
+        return ed.get_functions()
+
+    async def _result(self, params):
+        return await self._run_on_dataset(params, self._result_body, params)
+
+    def _result_body(self, ed, params):
+        rows = ed.iter_xlxs_result_rows(params.get('entity', 'client'),
+                                        params.get('axis', 'sent'),
+                                        params.get('statistic'),
+                                        params.get('function'),
+                                        _parse_flag(params.get('grouped')))
+        bytes_label, bytes_array = next(rows)
+        return OrderedDict([
+            ('bytes_label', bytes_label),
+            ('bytes', bytes_array.tolist()),
+            ('rows', [OrderedDict([('label', label),
+                                   ('values', _json_values(values))])
+                      for label, values in rows]),
+        ])
+
+    def _get_grid(self, ed, params):
+        grid = ed.get_grid(params.get('entity', 'client'),
+                           params.get('statistic'), params.get('function'),
+                           _parse_flag(params.get('grouped')))
+        ciphersuites = params.get('ciphersuites')
+        if ciphersuites:
+            grid = grid.select(ciphersuites=ciphersuites.split(','))
+        return grid
+
+    async def _grid(self, params):
+        return await self._run_on_dataset(params, self._grid_body, params,
+                                          _parse_bytes(params.get('sent')),
+                                          _parse_bytes(params.get('received')))
+
+    def _grid_body(self, ed, params, sent, received):
+        grid = self._get_grid(ed, params).select(sent=sent, received=received)
+        return OrderedDict([
+            ('labels', grid.labels.tolist()),
+            ('bytes_sent', grid.bytes_sent.tolist()),
+            ('bytes_received', grid.bytes_received.tolist()),
+            ('results', _json_values(grid.results)),
+        ])
+
+    async def _slice(self, params):
+        sent = _parse_bytes(params.get('sent'))
+        received = _parse_bytes(params.get('received'))
+        if (sent is None) == (received is None):
+            raise RequestError(400, 'one of sent or received is required')
+        if isinstance(sent, tuple) or isinstance(received, tuple):
+            raise RequestError(400, 'a slice is taken at a single byte size')
+        return await self._run_on_dataset(params, self._slice_body, params,
+                                          sent, received)
+
+    def _slice_body(self, ed, params, sent, received):
+        grid = self._get_grid(ed, params)
+        if sent is not None:
+            axis, (bytes_array, results) = 'received', grid.sent_slice(sent)
+        else:
+            axis, (bytes_array, results) = 'sent', grid.received_slice(received)
+        return OrderedDict([
+            ('axis', axis),
+            ('bytes', bytes_array.tolist()),
+            ('labels', grid.labels.tolist()),
+            ('results', _json_values(results)),
+        ])
+
+    async def _export(self, params):
+        fmt = params.get('format', 'xlsx')
+        if fmt not in EXPORT_FORMATS or fmt == 'csv':
+            # CSV results are written to one file each
+            raise RequestError(400, 'unsupported export format: {}'.format(fmt))
+        body = await self._run_on_dataset(params, self._export_to_bytes, fmt,
+                                          params.get('statistic'),
+                                          _parse_flag(params.get('grouped')))
+        return EXPORT_CONTENT_TYPES[fmt], body
+
+    def _export_to_bytes(self, ed, fmt, statistic, grouped):
+        sheets = (('{} bytes {}'.format(entity, axis), rows)
+                  for entity, _, axis, rows in ed.iter_xlxs_results(
+                                            statistic, grouped=grouped))
+        fd, path = tempfile.mkstemp(suffix='.' + fmt)
+        os.close(fd)
+        try:
+            export_results(sheets, path, fmt)
+            with open(path, 'rb') as export_file:
+                return export_file.read()
+        finally:
+            os.remove(path)
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Answer a single HTTP request, then close the connection.
+        """
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()).strip():
+                # the headers are not used
+                pass
+            if len(request_line) != 3:
+                status, content_type, body = 400, 'text/plain', b'bad request'
+            elif request_line[0] != 'GET':
+                status, content_type, body = 405, 'text/plain', b'GET only'
+            else:
+                status, content_type, body = await self.handle(request_line[1])
+        except Exception as e:
+            status, content_type, body = (500, 'application/json',
+                                          self._json_body({'error': repr(e)}))
+
+        writer.write('HTTP/1.1 {} {}\r\nContent-Type: {}\r\n'
+                     'Content-Length: {}\r\nConnection: close\r\n\r\n'.format(
+                        status, HTTP_REASONS[status], content_type,
+                        len(body)).encode('latin-1'))
+        writer.write(body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        """
+        Start listening on `host`:`port`, or on the Unix socket `unix_path`,
+        returning the `asyncio` server.
+        """
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self._handle_connection,
+                                                   path=unix_path)
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def serve_forever(self, host='127.0.0.1', port=8765, unix_path=None):
+        server = await self.start(host, port, unix_path)
+        async with server:
+            await server.serve_forever()
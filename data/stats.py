@@ -0,0 +1,140 @@
+"""
+Statistics over repeated measurements.
+
+The samples of an entity are stored in a (ciphersuites x byte pairs x
+samples) float array, padded with NaN when the cells have different numbers
+of samples. Every statistic is computed for the whole grid at once.
+"""
+import re
+
+import numpy
+
+
+STATISTIC_REGEX = re.compile(r'(?P<name>[a-z]+)(?P<param>\d+(\.\d+)?)?\Z')
+
+
+class SampleStatistics(object):
+    """
+    Vectorized statistics over NaN padded samples. The order statistics
+    (min, max, median, percentiles, trimmed means) share a single sort of
+    the samples, done on first use.
+    """
+
+    def __init__(self, samples):
+        self._samples = samples
+        self._counts = numpy.count_nonzero(~numpy.isnan(samples), axis=-1)
+        self._is_padded = bool((self._counts != samples.shape[-1]).any())
+        self._sorted = None
+
+    @property
+    def samples(self):
+        return self._samples
+
+    @property
+    def nbytes(self):
+        """
+        Memory held by the samples and the arrays computed from them.
+        """
+        return sum(array.nbytes for array in (self._samples, self._counts,
+                                              self._sorted)
+                   if array is not None)
+
+    def _get_sorted(self):
+        if self._sorted is None:
+            # NaN padding is sorted to the end of each cell
+            self._sorted = numpy.sort(self._samples, axis=-1)
+        return self._sorted
+
+    def _take(self, positions):
+        positions = numpy.clip(positions, 0, self._samples.shape[-1] - 1)
+        taken = numpy.take_along_axis(self._get_sorted(),
+                                      positions[..., numpy.newaxis], axis=-1)
+        return taken[..., 0]
+
+    def _empty_to_nan(self, values):
+        return numpy.where(self._counts > 0, values, numpy.nan)
+
+    def count(self):
+        return self._counts
+
+    def mean(self):
+        if not self._is_padded:
+            return self._samples.mean(axis=-1)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return numpy.nansum(self._samples, axis=-1) / self._counts
+
+    def std(self, ddof=0):
+        if not self._is_padded:
+            return self._samples.std(axis=-1, ddof=ddof)
+        deviations = self._samples - self.mean()[..., numpy.newaxis]
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return numpy.sqrt(numpy.nansum(deviations ** 2, axis=-1) /
+                              (self._counts - ddof))
+
+    def min(self):
+        return self._empty_to_nan(self._take(numpy.zeros_like(self._counts)))
+
+    def max(self):
+        return self._empty_to_nan(self._take(self._counts - 1))
+
+    def percentile(self, q):
+        """
+        `q`-th percentile (0 to 100), linearly interpolated like
+        numpy.percentile.
+        """
+        position = (self._counts - 1) * (q / 100.0)
+        low = numpy.floor(position).astype(numpy.int64)
+        high = numpy.ceil(position).astype(numpy.int64)
+        low_values = self._take(low)
+        high_values = self._take(high)
+        values = low_values + (high_values - low_values) * (position - low)
+        return self._empty_to_nan(values)
+
+    def median(self):
+        return self.percentile(50)
+
+    def trimmed_mean(self, proportion):
+        """
+        Mean of each cell after dropping `proportion` (0 to 0.5, exclusive)
+        of its samples at each end.
+        """
+        if not 0 <= proportion < 0.5:
+            raise ValueError('The trimmed proportion must be in [0, 0.5)')
+        cut = numpy.floor(self._counts * proportion).astype(numpy.int64)
+        cumsum = numpy.nancumsum(self._get_sorted(), axis=-1)
+
+        def cumsum_at(positions):
+            return numpy.take_along_axis(
+                    cumsum, numpy.clip(positions, 0, None)[..., numpy.newaxis],
+                    axis=-1)[..., 0]
+
+        # sum of the sorted samples in [cut, count - cut)
+        trimmed_sum = (cumsum_at(self._counts - cut - 1) -
+                       numpy.where(cut > 0, cumsum_at(cut - 1), 0))
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            values = trimmed_sum / (self._counts - 2 * cut)
+        return self._empty_to_nan(values)
+
+    def get(self, statistic):
+        """
+        Compute a statistic by name: 'mean', 'median', 'std', 'min', 'max',
+        'count', 'p<q>' for the q-th percentile (e.g. 'p95') or 'trim<pct>'
+        for the mean trimmed by pct percent at each end (e.g. 'trim10').
+        """
+        match = STATISTIC_REGEX.match(statistic)
+        if match is None:
+            raise ValueError('Unknown statistic: {}'.format(statistic))
+        name, param = match.group('name'), match.group('param')
+
+        if param is None and name in ('mean', 'median', 'std', 'min', 'max',
+                                      'count'):
+            return getattr(self, name)()
+        if param is not None and name == 'p':
+            return self.percentile(float(param))
+        if param is not None and name == 'trim':
+            return self.trimmed_mean(float(param) / 100.0)
+        raise ValueError('Unknown statistic: {}'.format(statistic))
+
+
+def aggregate_samples(samples, statistic='mean'):
+    return SampleStatistics(samples).get(statistic)
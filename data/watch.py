@@ -0,0 +1,49 @@
+"""
+Polling of a directory where a profiling run writes JSON fragments as it
+goes, to merge them as soon as they are complete.
+"""
+import glob
+import os
+
+
+class FragmentWatcher(object):
+    """
+    Reports the JSON files of `directory` once their size and modification
+    time stayed the same between two polls, i.e. once they are no longer
+    being written. A reported file is reported again if it changes.
+    """
+
+    def __init__(self, directory, pattern='*.json'):
+        self._directory = directory
+        self._pattern = pattern
+        # {path: (size, mtime_ns)} seen once, waiting to be unchanged
+        self._pending = {}
+        # {path: (size, mtime_ns)} already reported
+        self._reported = {}
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def poll(self):
+        """
+        Return the paths of the fragments completed since the last poll,
+        sorted by name.
+        """
+        ready = []
+        for path in sorted(glob.glob(os.path.join(self._directory,
+                                                  self._pattern))):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            fingerprint = (stat.st_size, stat.st_mtime_ns)
+            if self._reported.get(path) == fingerprint:
+                continue
+            if self._pending.get(path) == fingerprint:
+                del self._pending[path]
+                self._reported[path] = fingerprint
+                ready.append(path)
+            else:
+                self._pending[path] = fingerprint
+        return ready
@@ -1,45 +1,546 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import functools
+import itertools
+import json
+import os
+import sys
+import time
 
-from utils import write_excel_to_file
-from data.models import EncryptionData
+import numpy
 
-def run(json_path, out_filename, is_client, is_server, is_bs, is_br):
-    ed = EncryptionData(json_path)
+from collections import OrderedDict
 
-    if is_client:
-        if is_bs:
-            res = ed.get_client_xlxs_bytes_sent_result()
-        else:
-            res = ed.get_client_xlxs_bytes_received_result()
-    else:
-        if is_bs:
-            res = ed.get_server_xlxs_bytes_sent_result()
+from utils import EXPORT_FORMATS, export_result, export_results
+from utils import export_table, export_tables
+from data.batch import expand_json_paths, process_batch
+from data.cache import ParsedDataCache
+from data.compare import DEFAULT_THRESHOLD, iter_comparisons
+from data.instrumentation import NULL_RECORDER, StageRecorder, count_rows
+from data.models import Defaults, EncryptionData
+from data.pipeline import iter_pipelined_rows
+from data.reduce import Downsampling, FixedBinning, LogBinning
+from data.server import DEFAULT_MAX_BYTES, AnalysisServer
+from data.watch import FragmentWatcher
+
+def run(json_path, out_filename, is_client, is_server, is_bs, is_br,
+        streaming=False, cache=None, fmt='xlsx', statistic='mean',
+        function=None, index_sidecar=False, grouped=False, fit=False,
+        frequency=None, recorder=None, heatmap=False, reduction=None):
+    ed = EncryptionData(json_path, streaming=streaming, cache=cache,
+                        statistic=statistic, index_sidecar=index_sidecar,
+                        recorder=recorder)
+    write_result(ed, out_filename, is_client, is_bs, fmt, function, grouped,
+                 fit, frequency, heatmap, reduction)
+
+def heatmap_sheets(ed, sections, grouped=False):
+    """
+    (sheets, table) of the heatmaps of the (entity, function) `sections`,
+    see `EncryptionData.iter_heatmap_sheets`. The labels of the ciphersuites
+    do not fit in the length of a worksheet name, so the sheets are numbered
+    ('heatmap 1', ...), and the 'heatmaps' table gives the entity, function
+    and ciphersuite of each of them.
+    """
+    sheets = []
+    for entity, function in sections:
+        for label, rows in ed.iter_heatmap_sheets(entity, function=function,
+                                                  grouped=grouped):
+            sheets.append((entity, function, label, rows))
+    names = ['heatmap {}'.format(i) for i in range(1, len(sheets) + 1)]
+    table = OrderedDict([
+        ('sheet', numpy.array(names, dtype=str)),
+        ('entity', numpy.array([sheet[0] for sheet in sheets], dtype=str)),
+        ('function', numpy.array([sheet[1] for sheet in sheets], dtype=str)),
+        ('label', numpy.array([sheet[2] for sheet in sheets], dtype=str)),
+    ])
+    return ([(name, rows) for name, (_, _, _, rows) in zip(names, sheets)],
+            ('heatmaps', table))
+
+def write_result(ed, out_filename, is_client, is_bs, fmt='xlsx', function=None,
+                 grouped=False, fit=False, frequency=None, heatmap=False,
+                 reduction=None):
+    entity = 'client' if is_client else 'server'
+    axis = 'sent' if is_bs else 'received'
+    rows = ed.iter_xlxs_result_rows(entity, axis, function=function,
+                                    grouped=grouped, reduction=reduction)
+    tables = []
+    if fit:
+        tables = [('{} fit bytes {}'.format(entity, axis),
+                   ed.get_fit_report(entity, axis, function=function,
+                                     frequency=frequency))]
+
+    with ed.recorder.stage('write', format=fmt) as counts:
+        if ed.recorder.enabled:
+            rows = count_rows(rows, counts)
+        if not (fit or heatmap):
+            export_result(rows, out_filename, fmt)
+            return
+
+        sheets = [('{} bytes {}'.format(entity, axis), rows)]
+        if heatmap:
+            section = (entity, function or ed.get_functions(entity)[0])
+            heatmaps, heatmap_table = heatmap_sheets(ed, [section], grouped)
+            sheets += heatmaps
+            tables = tables + [heatmap_table]
+        export_results(sheets, out_filename, fmt, tables)
+
+def run_pipelined(json_path, out_filename, is_client, is_bs, fmt='xlsx',
+                  statistic='mean', function=None, index_sidecar=False,
+                  jobs=None, recorder=None):
+    """
+    Same output as `run`, the ciphersuites being decoded by `jobs` worker
+    processes while the rows already decoded are written, see
+    `data.pipeline.iter_pipelined_rows`.
+    """
+    entity = 'client' if is_client else 'server'
+    axis = 'sent' if is_bs else 'received'
+    bytes_label = (Defaults.DEFAULT_BYTES_SENT_LABEL if is_bs
+                   else Defaults.DEFAULT_BYTES_RECEIVED_LABEL)
+    rows = iter_pipelined_rows(json_path, entity, axis, bytes_label, function,
+                               statistic=statistic, jobs=jobs,
+                               index_sidecar=index_sidecar)
+    recorder = recorder or NULL_RECORDER
+    with recorder.stage('pipeline', format=fmt, jobs=jobs) as counts:
+        if recorder.enabled:
+            rows = count_rows(rows, counts)
+        export_result(rows, out_filename, fmt)
+
+def run_all(json_path, out_filename, split=False, streaming=False, cache=None,
+            fmt='xlsx', statistic='mean', all_functions=False,
+            index_sidecar=False, grouped=False, fit=False, frequency=None,
+            recorder=None, heatmap=False, reduction=None):
+    """
+    Output the results of every entity and byte axis from a single parse,
+    either as worksheets of one workbook or, with `split`, as one file each
+    (named after `out_filename`, e.g. out_client_bytes_sent.xlsx). With
+    `all_functions`, every profiled function is output, not only the first.
+    With `grouped`, the ciphersuites sharing a cipher are averaged together.
+    With `fit`, the throughput models of every result are added as extra
+    sheets (or files, with `split`), see `EncryptionData.get_fit_report`.
+    With `heatmap`, the (bytes sent x bytes received) plane of every
+    ciphersuite is added as well, in numbered sheets, see `heatmap_sheets`.
+    With a `reduction`, the results are binned or downsampled along their
+    byte axis, see `data.reduce`.
+    """
+    ed = EncryptionData(json_path, streaming=streaming, cache=cache,
+                        statistic=statistic, index_sidecar=index_sidecar,
+                        recorder=recorder)
+    write_all_results(ed, out_filename, split, fmt, all_functions, grouped,
+                      fit, frequency, heatmap, reduction)
+
+def write_all_results(ed, out_filename, split=False, fmt='xlsx',
+                      all_functions=False, grouped=False, fit=False,
+                      frequency=None, heatmap=False, reduction=None):
+    def sheet_name(entity, function, axis, kind='bytes'):
+        if all_functions:
+            return '{} {} {} {}'.format(entity, function, kind, axis)
+        return '{} {} {}'.format(entity, kind, axis)
+
+    results = list(ed.iter_xlxs_results(all_functions=all_functions,
+                                        grouped=grouped, reduction=reduction))
+    tables = []
+    if fit:
+        tables = ((sheet_name(entity, function, axis, 'fit bytes'),
+                   ed.get_fit_report(entity, axis, function=function,
+                                     frequency=frequency))
+                  for entity, function, axis, _ in results)
+
+    heatmaps = []
+    if heatmap:
+        sections = OrderedDict.fromkeys((entity, function)
+                                        for entity, function, _, _ in results)
+        heatmaps, heatmap_table = heatmap_sheets(ed, sections, grouped)
+        tables = itertools.chain(tables, [heatmap_table])
+
+    with ed.recorder.stage('write', format=fmt) as counts:
+        sheets = ((sheet_name(entity, function, axis),
+                   count_rows(res, counts) if ed.recorder.enabled else res)
+                  for entity, function, axis, res in results)
+        sheets = itertools.chain(sheets, heatmaps)
+
+        if not split:
+            export_results(sheets, out_filename, fmt, tables)
+            return
+
+        base, ext = os.path.splitext(out_filename)
+        for name, res in itertools.chain(sheets, tables):
+            path = '{}_{}{}'.format(base, name.replace(' ', '_'), ext or '.' + fmt)
+            if isinstance(res, dict):
+                export_table(res, path, fmt)
+            else:
+                export_result(res, path, fmt)
+
+def run_watch(json_path, fragments_dir, write, interval=2.0, streaming=False,
+              cache=None, statistic='mean', index_sidecar=False,
+              max_polls=None, recorder=None):
+    """
+    Output the results of `json_path` with `write(ed)`, then poll
+    `fragments_dir` every `interval` seconds, merging the JSON fragments
+    written there into the parsed data and outputting the results again,
+    without parsing the previous data again. Runs until interrupted, or for
+    `max_polls` polls.
+    """
+    ed = EncryptionData(json_path, streaming=streaming, cache=cache,
+                        statistic=statistic, index_sidecar=index_sidecar,
+                        recorder=recorder)
+    write(ed)
+    watcher = FragmentWatcher(fragments_dir)
+
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        time.sleep(interval)
+        polls += 1
+        merged = False
+        for path in watcher.poll():
+            start = time.perf_counter()
+            try:
+                ed.merge(path)
+            except (OSError, ValueError) as e:
+                # e.g. deleted since listed, or malformed, skip it
+                print('FAILED to merge {}: {}'.format(path, e), file=sys.stderr)
+                continue
+            merged = True
+            print('merged {:8.2f}s  {}'.format(time.perf_counter() - start,
+                                               path))
+        if merged:
+            write(ed)
+
+def run_batch(path, out_dir, job, jobs=None, ext='.xlsx'):
+    """
+    Run `job` over every JSON file of the `path` directory or glob, writing
+    one output per file in `out_dir` (in subdirectories when the files are
+    in several directories). Prints the timing of each file and
+    returns the number of failed files.
+    """
+    json_paths = expand_json_paths(path)
+    if not json_paths:
+        print('No JSON files found in {}'.format(path), file=sys.stderr)
+        return 0
+
+    start = time.perf_counter()
+    failed = 0
+    for result in process_batch(json_paths, out_dir, job, jobs, ext):
+        if result.ok:
+            print('ok     {:8.2f}s  {} -> {}'.format(result.elapsed,
+                                                    result.json_path,
+                                                    result.output))
         else:
-            res = ed.get_server_xlxs_bytes_received_result()
+            failed += 1
+            print('FAILED            {}\n{}'.format(result.json_path,
+                                                    result.error),
+                  file=sys.stderr)
+
+    print('{} files, {} failed, {:.2f}s'.format(len(json_paths), failed,
+                                               time.perf_counter() - start))
+    return failed
+
+def _dataset_names(json_paths):
+    names = [os.path.splitext(os.path.basename(path))[0] for path in json_paths]
+    if len(set(names)) != len(names):
+        return list(json_paths)
+    return names
+
+def diff_fit_report(datasets, names, entity, function, frequency=None):
+    """
+    Fit reports (see `EncryptionData.get_fit_report`) of `function` in every
+    dataset having it, against both byte axes, as a single table whose rows
+    are told apart by their 'dataset' and 'axis' columns.
+    """
+    reports = []
+    for ed, name in zip(datasets, names):
+        if function not in ed.get_functions().get(entity, []):
+            continue
+        for axis in ('sent', 'received'):
+            report = ed.get_fit_report(entity, axis, function=function,
+                                       frequency=frequency)
+            n_rows = len(report['ciphersuite'])
+            reports.append(OrderedDict(
+                        [('dataset', numpy.full(n_rows, name, dtype=object)),
+                         ('axis', numpy.full(n_rows, axis, dtype=object))] +
+                        list(report.items())))
+    return OrderedDict((column, numpy.concatenate([report[column]
+                                                   for report in reports]))
+                       for column in reports[0])
+
+def run_diff(json_paths, out_filename, threshold=DEFAULT_THRESHOLD,
+             relative=True, direction='increase', all_cells=False,
+             all_functions=False, fmt='xlsx', statistic='mean',
+             streaming=False, cache=None, fit=False, frequency=None):
+    """
+    Compare the results of several files to the first one, writing a report
+    of the cells whose delta is beyond `threshold` (every cell with
+    `all_cells`), one sheet per entity and function. With `fit`, a sheet
+    with the fits of every file is added per entity and function, see
+    `diff_fit_report`. Prints a summary and returns the number of flagged
+    cells.
+    """
+    datasets = [EncryptionData(path, streaming=streaming, cache=cache,
+                               statistic=statistic)
+                for path in json_paths]
+    names = _dataset_names(json_paths)
+
+    flagged = 0
+    sheets = []
+    for comparison in iter_comparisons(datasets, all_functions):
+        columns = comparison.report(names, threshold, relative, direction,
+                                    flagged_only=not all_cells)
+        n_flagged = int(columns['flagged'].sum())
+        flagged += n_flagged
+        print('{} {}: {} of {} cells flagged'.format(comparison.entity,
+                                                    comparison.function,
+                                                    n_flagged,
+                                                    comparison.baseline.size))
+        sheets.append(('{} {}'.format(comparison.entity, comparison.function),
+                       columns))
+        if fit:
+            sheets.append(('{} {} fit'.format(comparison.entity,
+                                              comparison.function),
+                           diff_fit_report(datasets, names, comparison.entity,
+                                           comparison.function, frequency)))
+
+    export_tables(sheets, out_filename, fmt)
+    return flagged
+
+def diff_main(argv):
+    parser = argparse.ArgumentParser(prog='edat.py diff',
+    description='Compare the profiling results of several JSON files to the first one (the baseline) and output the cells beyond a threshold.')
+
+    parser.add_argument('paths', type=str, nargs='+', help='JSON file paths, the baseline first, followed by the output file path')
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD, help='flag the deltas beyond this fraction of the baseline (default: {})'.format(DEFAULT_THRESHOLD))
+    parser.add_argument('--absolute', default=False, action='store_true', help='the threshold is an absolute delta instead of a fraction of the baseline')
+    parser.add_argument('--direction', choices=('increase', 'decrease', 'both'), default='increase', help='deltas to flag (default: increase, i.e. slower results)')
+    parser.add_argument('--all-cells', default=False, action='store_true', help='output every cell instead of only the flagged ones')
+    parser.add_argument('--all-functions', default=False, action='store_true', help='compare every profiled function instead of only the first one')
+    parser.add_argument('--check', default=False, action='store_true', help='exit with status 1 when any cell is flagged')
+    parser.add_argument('--fit', default=False, action='store_true', help='add sheets with the linear and piecewise fits of the results against the bytes of each ciphersuite: fixed overhead, cost per byte, R2 and throughput')
+    parser.add_argument('--frequency', type=float, default=None, help='with --fit, frequency of the results unit in Hz (e.g. the CPU frequency for cycles), to report the throughput in bytes per second')
 
-    write_excel_to_file(res, out_filename) 
+    parser.add_argument('-f', '--format', choices=EXPORT_FORMATS, default='xlsx', help='output format (default: xlsx)')
+    parser.add_argument('--statistic', type=str, default='mean', help='statistic of the samples to compare (default: mean)')
+    parser.add_argument('--stream', default=False, action='store_true', help='parse the JSON files incrementally, using less memory')
+
+    args = parser.parse_args(argv)
+    if len(args.paths) < 3:
+        parser.error('at least two JSON files and the output file are required')
+    if args.frequency is not None and not args.fit:
+        parser.error('--frequency requires --fit')
+
+    flagged = run_diff(args.paths[:-1], args.paths[-1], args.threshold,
+                       not args.absolute, args.direction, args.all_cells,
+                       args.all_functions, args.format, args.statistic,
+                       args.stream, fit=args.fit, frequency=args.frequency)
+    return 1 if args.check and flagged else 0
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(prog='edat.py serve',
+    description='Keep the parsed JSON files in memory and answer analysis requests over HTTP (see data/server.py for the requests).')
+
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on (default: 8765)')
+    parser.add_argument('--unix', type=str, default=None, metavar='PATH', help='listen on a Unix socket at PATH instead')
+    parser.add_argument('--max-memory', type=float, default=DEFAULT_MAX_BYTES / 2 ** 20, metavar='MB', help='memory of the parsed files kept in memory, the least recently used being dropped first (default: {:.0f})'.format(DEFAULT_MAX_BYTES / 2 ** 20))
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes parsing the files (default: number of CPUs)')
+
+    args = parser.parse_args(argv)
+
+    server = AnalysisServer(int(args.max_memory * 2 ** 20), args.jobs)
+    print('listening on {}'.format(args.unix or '{}:{}'.format(args.host, args.port)))
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
 
 if __name__ == '__main__':
+    if sys.argv[1:2] == ['diff']:
+        sys.exit(diff_main(sys.argv[2:]))
+    if sys.argv[1:2] == ['serve']:
+        sys.exit(serve_main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description='Encryption Data Analyzer Tool\n'
     'Reads JSON input data and outputs excel files for the specified analysis type.')
 
-    parser.add_argument('path', type=str, help='JSON file path')
-    parser.add_argument('output', type=str, help='server program path')
+    parser.add_argument('path', type=str, help='JSON file path (with --batch, a directory or glob of JSON files)')
+    parser.add_argument('output', type=str, help='output file path (with --batch, the output directory)')
 
-    entity_switcher = parser.add_mutually_exclusive_group(required=True)
+    entity_switcher = parser.add_mutually_exclusive_group()
     entity_switcher.add_argument('-c', '--client', default=False, action='store_true', help='use client profiling results')
     entity_switcher.add_argument('-s', '--server', default=False, action='store_true', help='user server profiling results')
 
-    sent_received_switcher = parser.add_mutually_exclusive_group(required=True)
+    sent_received_switcher = parser.add_mutually_exclusive_group()
     sent_received_switcher.add_argument('-bs', '--bytes-sent', default=False, action='store_true', help='use bytes sent')
     sent_received_switcher.add_argument('-br', '--bytes-received', default=False, action='store_true', help='use bytes received')
 
+    parser.add_argument('-a', '--all', default=False, action='store_true', help='output every entity and bytes sent/received combination, as worksheets of a single workbook')
+    parser.add_argument('--all-functions', default=False, action='store_true', help='with --all, output every profiled function instead of only the first one')
+    parser.add_argument('--function', type=str, default=None, help='profiled function to use (default: the first one of the entity)')
+    parser.add_argument('--split', default=False, action='store_true', help='with --all, output one file per combination instead')
+
+    parser.add_argument('--group-ciphers', default=False, action='store_true', help='average the ciphersuites sharing the same label (e.g. TLS-RSA-WITH-AES-128-GCM-SHA256 and TLS-ECDHE-RSA-WITH-AES-128-GCM-SHA256) into a single row')
+
+    parser.add_argument('--fit', default=False, action='store_true', help='add sheets with the linear and piecewise fits of the results against the bytes of each ciphersuite: fixed overhead, cost per byte, R2 and throughput')
+    parser.add_argument('--frequency', type=float, default=None, help='with --fit, frequency of the results unit in Hz (e.g. the CPU frequency for cycles), to report the throughput in bytes per second')
+    parser.add_argument('--heatmap', default=False, action='store_true', help='add a sheet per ciphersuite with its results over the (bytes sent x bytes received) plane')
+
+    reduction_switcher = parser.add_mutually_exclusive_group()
+    reduction_switcher.add_argument('--log-bins', type=int, default=None, metavar='N', help='reduce the results to N bins of logarithmically growing byte sizes, with the min, mean and max of every ciphersuite in each bin')
+    reduction_switcher.add_argument('--bin-width', type=int, default=None, metavar='BYTES', help='reduce the results to bins of BYTES byte sizes, with the min, mean and max of every ciphersuite in each bin')
+    reduction_switcher.add_argument('--downsample', type=int, default=None, metavar='N', help='keep N byte sizes, chosen to preserve the shape of the results (largest triangle three buckets)')
+    parser.add_argument('--align', type=int, default=1, metavar='BYTES', help='with --log-bins, round the bin edges down to multiples of BYTES (e.g. 16, the cipher block size) (default: 1)')
+
+    parser.add_argument('-f', '--format', choices=EXPORT_FORMATS, default='xlsx', help='output format (default: xlsx). Results wider than a spreadsheet allows are written transposed in xlsx and csv')
+
+    parser.add_argument('--statistic', type=str, default='mean', help='statistic of the samples to output when the file holds lists of samples per byte pair: mean, median, std, min, max, count, p<q> (e.g. p95) or trim<pct> (e.g. trim10) (default: mean)')
+
+    parser.add_argument('--batch', default=False, action='store_true', help='process every JSON file of a directory or glob, in parallel')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='with --batch or --pipeline, number of worker processes (default: number of CPUs)')
+    parser.add_argument('--pipeline', default=False, action='store_true', help='decode the ciphersuites in worker processes while the rows already decoded are written, instead of decoding everything first')
+
+    parser.add_argument('--watch', type=str, default=None, metavar='DIR', help='keep running, merging the JSON fragments written to DIR (with the same layout as the JSON file) into the parsed data and refreshing the output')
+    parser.add_argument('--interval', type=float, default=2.0, help='with --watch, seconds between two polls of the directory (default: 2)')
+
+    parser.add_argument('--stream', default=False, action='store_true', help='parse the JSON file incrementally, using less memory')
+    parser.add_argument('--profile', type=str, nargs='?', const='-', default=None, metavar='FILE', help='measure the wall and CPU time, the peak RSS and the row/cell counts of every stage (index, decode, build, sort, write, ...) and write them as JSON to FILE (default: stderr)')
+    parser.add_argument('--profile-memory', default=False, action='store_true', help='with --profile, also trace the peak memory allocated by every stage (slower)')
+    parser.add_argument('--cache', default=False, action='store_true', help='cache the parsed data on disk and reuse it in the following runs')
+    parser.add_argument('--cache-dir', type=str, default=None, help='directory of the cache (default: next to the JSON file)')
+    parser.add_argument('--index', default=False, action='store_true', help='write the byte offsets of every function and ciphersuite next to the JSON file (<path>.edatidx), so the following runs skip the pre-scan')
+
     args = parser.parse_args()
 
-    run(args.path, 
-        args.output,
-        args.client, 
-        args.server, 
-        args.bytes_sent, 
-        args.bytes_received)
\ No newline at end of file
+    if args.all:
+        if args.client or args.server or args.bytes_sent or args.bytes_received:
+            parser.error('--all can not be combined with -c/-s and -bs/-br')
+    else:
+        if not (args.client or args.server):
+            parser.error('one of the arguments -c/--client -s/--server is required')
+        if not (args.bytes_sent or args.bytes_received):
+            parser.error('one of the arguments -bs/--bytes-sent -br/--bytes-received is required')
+    if args.split and not args.all:
+        parser.error('--split requires --all')
+    if args.all_functions and not args.all:
+        parser.error('--all-functions requires --all')
+    if args.function and args.all:
+        parser.error('--function can not be combined with --all')
+    if args.watch and args.batch:
+        parser.error('--watch can not be combined with --batch')
+    if args.profile and args.batch:
+        parser.error('--profile can not be combined with --batch')
+    if args.profile_memory and not args.profile:
+        parser.error('--profile-memory requires --profile')
+    if args.pipeline:
+        for option in ('all', 'batch', 'watch', 'stream', 'cache', 'cache_dir',
+                       'group_ciphers', 'fit', 'heatmap', 'log_bins',
+                       'bin_width', 'downsample'):
+            if getattr(args, option):
+                parser.error('--pipeline can not be combined with --{}'.format(
+                                                    option.replace('_', '-')))
+
+    for option in ('log_bins', 'bin_width', 'downsample', 'align'):
+        if getattr(args, option) is not None and getattr(args, option) < 1:
+            parser.error('--{} must be positive'.format(option.replace('_', '-')))
+    if args.align != 1 and not args.log_bins:
+        parser.error('--align requires --log-bins')
+
+    reduction = None
+    if args.log_bins:
+        reduction = LogBinning(args.log_bins, args.align)
+    elif args.bin_width:
+        reduction = FixedBinning(args.bin_width)
+    elif args.downsample:
+        reduction = Downsampling(args.downsample)
+
+    cache = None
+    if args.cache or args.cache_dir:
+        cache = ParsedDataCache(args.cache_dir)
+
+    recorder = None
+    if args.profile:
+        recorder = StageRecorder(trace_memory=args.profile_memory)
+
+    if args.batch:
+        if args.all:
+            job = functools.partial(run_all, split=args.split,
+                                    streaming=args.stream, cache=cache,
+                                    fmt=args.format, statistic=args.statistic,
+                                    all_functions=args.all_functions,
+                                    index_sidecar=args.index,
+                                    grouped=args.group_ciphers,
+                                    fit=args.fit, frequency=args.frequency,
+                                    heatmap=args.heatmap, reduction=reduction)
+        else:
+            job = functools.partial(run, is_client=args.client,
+                                    is_server=args.server,
+                                    is_bs=args.bytes_sent,
+                                    is_br=args.bytes_received,
+                                    streaming=args.stream, cache=cache,
+                                    fmt=args.format, statistic=args.statistic,
+                                    function=args.function,
+                                    index_sidecar=args.index,
+                                    grouped=args.group_ciphers,
+                                    fit=args.fit, frequency=args.frequency,
+                                    heatmap=args.heatmap, reduction=reduction)
+        failed = run_batch(args.path, args.output, job, args.jobs,
+                           '.' + args.format)
+        sys.exit(1 if failed else 0)
+    elif args.watch:
+        if args.all:
+            write = functools.partial(write_all_results,
+                                      out_filename=args.output,
+                                      split=args.split, fmt=args.format,
+                                      all_functions=args.all_functions,
+                                      grouped=args.group_ciphers,
+                                      fit=args.fit, frequency=args.frequency,
+                                      heatmap=args.heatmap, reduction=reduction)
+        else:
+            write = functools.partial(write_result, out_filename=args.output,
+                                      is_client=args.client,
+                                      is_bs=args.bytes_sent, fmt=args.format,
+                                      function=args.function,
+                                      grouped=args.group_ciphers,
+                                      fit=args.fit, frequency=args.frequency,
+                                      heatmap=args.heatmap, reduction=reduction)
+        try:
+            run_watch(args.path, args.watch, write, args.interval, args.stream,
+                      cache, args.statistic, args.index, recorder=recorder)
+        except KeyboardInterrupt:
+            pass
+    elif args.pipeline:
+        run_pipelined(args.path, args.output, args.client, args.bytes_sent,
+                      args.format, args.statistic, args.function, args.index,
+                      args.jobs, recorder)
+    elif args.all:
+        run_all(args.path, args.output, args.split, args.stream, cache,
+                args.format, args.statistic, args.all_functions, args.index,
+                args.group_ciphers, args.fit, args.frequency, recorder,
+                args.heatmap, reduction)
+    else:
+        run(args.path, 
+            args.output,
+            args.client, 
+            args.server, 
+            args.bytes_sent, 
+            args.bytes_received,
+            args.stream,
+            cache,
+            args.format,
+            args.statistic,
+            args.function,
+            args.index,
+            args.group_ciphers,
+            args.fit,
+            args.frequency,
+            recorder,
+            args.heatmap,
+            reduction)
+
+    if recorder is not None:
+        summary = json.dumps(recorder.summary(), indent=2)
+        if args.profile == '-':
+            print(summary, file=sys.stderr)
+        else:
+            with open(args.profile, 'w') as profile_file:
+                profile_file.write(summary)
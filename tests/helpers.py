@@ -0,0 +1,23 @@
+"""
+Fixtures shared by the test cases.
+"""
+import json
+import os
+import tempfile
+
+
+def write_json(path, data):
+    with open(path, 'w') as json_file:
+        json.dump(data, json_file)
+
+
+def write_temp_json(test_case, data):
+    """
+    Write `data` to a temporary JSON file, removed when `test_case` ends,
+    returning its path.
+    """
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    test_case.addCleanup(os.remove, path)
+    write_json(path, data)
+    return path
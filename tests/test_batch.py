@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from data.batch import expand_json_paths, process_batch
+from data.models import EncryptionData
+
+
+def write_client_bytes_sent(json_path, output):
+    res = EncryptionData(json_path).get_client_xlxs_bytes_sent_result()
+    with open(output, 'w') as out_file:
+        out_file.write(repr(res))
+
+
+class BatchTestCase(unittest.TestCase):
+    RES_DIR = Path('./tests/res/')
+
+    def setUp(self):
+        self.in_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.in_dir)
+        self.addCleanup(shutil.rmtree, self.out_dir)
+
+        for filename in ('pencres_01.json', 'pencres_02.json'):
+            shutil.copy(os.path.join(self.RES_DIR, filename), self.in_dir)
+        with open(os.path.join(self.in_dir, 'pencres_bad.json'), 'w') as bad_file:
+            bad_file.write('{"client": ')
+
+    def test_expand_json_paths(self):
+        expected = [os.path.join(self.in_dir, name) for name in
+                    ('pencres_01.json', 'pencres_02.json', 'pencres_bad.json')]
+        self.assertSequenceEqual(expected, expand_json_paths(self.in_dir))
+        self.assertSequenceEqual(expected[:2], expand_json_paths(
+                                    os.path.join(self.in_dir, 'pencres_0*.json')))
+
+    def test_failures_do_not_abort_the_batch(self):
+        for jobs in (1, 2):
+            results = list(process_batch(expand_json_paths(self.in_dir),
+                                         self.out_dir, write_client_bytes_sent,
+                                         jobs=jobs, ext='.txt'))
+            results = {os.path.basename(result.json_path): result
+                       for result in results}
+
+            self.assertTrue(results['pencres_01.json'].ok)
+            self.assertTrue(results['pencres_02.json'].ok)
+            self.assertFalse(results['pencres_bad.json'].ok)
+            self.assertIn('Error', results['pencres_bad.json'].error)
+            self.assertTrue(os.path.exists(os.path.join(self.out_dir,
+                                                        'pencres_01.txt')))
+
+    def test_files_of_several_directories_do_not_collide(self):
+        for run in ('run1', 'run2'):
+            os.makedirs(os.path.join(self.in_dir, run))
+            shutil.copy(os.path.join(self.RES_DIR, 'pencres_01.json'),
+                        os.path.join(self.in_dir, run, 'edat.json'))
+        json_paths = expand_json_paths(os.path.join(self.in_dir, '*', 'edat.json'))
+        results = list(process_batch(json_paths, self.out_dir,
+                                     write_client_bytes_sent, jobs=1, ext='.txt'))
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertSequenceEqual([os.path.join(self.out_dir, run, 'edat.txt')
+                                  for run in ('run1', 'run2')],
+                                 [result.output for result in results])
+        self.assertTrue(all(os.path.exists(result.output) for result in results))
@@ -0,0 +1,65 @@
+import json
+import unittest
+from benchmarks.bench_suite import (PEAK_BYTES_PER_VALUE_TARGET, RETAINED_BYTES_PER_VALUE_TARGET,
+                                    measure, measure_memory_per_value, run_suite)
+from benchmarks.synthetic import generate_profiling_data
+from data.models import EncryptionData
+from tests.helpers import write_temp_json
+
+class SyntheticDataTestCase(unittest.TestCase):
+
+    def test_generation_is_deterministic(self):
+        self.assertEqual(generate_profiling_data(3, 10, seed=1),
+                         generate_profiling_data(3, 10, seed=1))
+        self.assertNotEqual(generate_profiling_data(3, 10, seed=1),
+                            generate_profiling_data(3, 10, seed=2))
+
+    def test_layout(self):
+        data = generate_profiling_data(25, 7, entities=('client',),
+                                       n_functions=4, n_samples=3)
+        self.assertEqual(['client'], list(data))
+        self.assertEqual(['mbedtls_ssl_write', 'mbedtls_ssl_read',
+                          'mbedtls_ssl_handshake', 'function_3'],
+                         list(data['client']))
+        ciphersuites = data['client']['mbedtls_ssl_read']
+        self.assertEqual(25, len(set(ciphersuites)))
+        self.assertIn('TLS-RSA-WITH-AES-128-GCM-SHA256', ciphersuites)
+        for byte_pairs in ciphersuites.values():
+            self.assertEqual(7, len(byte_pairs))
+            self.assertTrue(all(len(samples) == 3 for samples in byte_pairs.values()))
+
+    def test_generated_file_is_parsed(self):
+        path = write_temp_json(self, generate_profiling_data(5, 20, n_functions=2))
+
+        ed = EncryptionData(path)
+        self.assertEqual((5, 20), ed.get_client_data().profiling_results.shape)
+        self.assertEqual(['mbedtls_ssl_write', 'mbedtls_ssl_read'],
+                         ed.get_functions('server'))
+
+
+class BenchmarkSuiteTestCase(unittest.TestCase):
+
+    def test_measure(self):
+        calls = []
+        seconds, peak = measure(calls.append, repeat=2, setup=lambda: bytearray(1 << 16))
+        self.assertEqual(3, len(calls))
+        self.assertGreaterEqual(seconds, 0)
+        self.assertGreaterEqual(peak, 0)
+
+    def test_report(self):
+        report = run_suite(['tiny'], repeat=1)
+        stages = report['scales']['tiny']['stages']
+        self.assertEqual(['parse_json_file_to_dict', 'EncryptionDataContainer.parse',
+                          'EncryptionDataContainer.parse+build',
+                          'iter_xlxs_result_rows', 'write_excel_to_file'],
+                         list(stages))
+        self.assertEqual({'seconds', 'peak_memory'},
+                         set(stages['write_excel_to_file']))
+        json.dumps(report)
+
+    def test_memory_per_value_target(self):
+        path = write_temp_json(self, generate_profiling_data(20, 500))
+
+        memory = measure_memory_per_value(path)
+        self.assertLessEqual(memory['retained'], RETAINED_BYTES_PER_VALUE_TARGET)
+        self.assertLessEqual(memory['peak'], PEAK_BYTES_PER_VALUE_TARGET)
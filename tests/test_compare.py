@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+import numpy
+from data.compare import compare, iter_comparisons
+from data.models import EncryptionData
+from edat import run_diff
+from tests.helpers import write_temp_json
+
+class CompareTestCase(unittest.TestCase):
+    BASELINE = {
+        'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 10)': 100, '(2, 20)': 200},
+                          'TLS-RSA-WITH-B': {'(1, 10)': 10, '(2, 20)': 0}},
+                   'fn2': {'TLS-RSA-WITH-A': {'(1, 10)': 1}}},
+        'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 10)': 5}}},
+    }
+    OTHER = {
+        'client': {'fn': {'TLS-RSA-WITH-C': {'(1, 10)': 7, '(2, 20)': 8, '(3, 30)': 9},
+                          'TLS-RSA-WITH-B': {'(3, 30)': 1, '(1, 10)': 9, '(2, 20)': 3},
+                          'TLS-RSA-WITH-A': {'(2, 20)': 190, '(3, 30)': 300,
+                                             '(1, 10)': 110}}},
+        'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 10)': 5}}},
+    }
+
+    def setUp(self):
+        self.datasets = [EncryptionData(write_temp_json(self, self.BASELINE)),
+                         EncryptionData(write_temp_json(self, self.OTHER))]
+
+    def test_alignment(self):
+        comparison = compare(self.datasets, 'client')
+        self.assertSequenceEqual(['TLS-RSA-WITH-A', 'TLS-RSA-WITH-B', 'TLS-RSA-WITH-C'],
+                                 comparison.ciphersuites.tolist())
+        self.assertSequenceEqual(['A', 'B', 'C'], comparison.labels.tolist())
+        self.assertSequenceEqual([1, 2, 3], comparison.bytes_sent.tolist())
+        self.assertSequenceEqual([10, 20, 30], comparison.bytes_received.tolist())
+        numpy.testing.assert_array_equal(
+            [[[100, 200, numpy.nan], [10, 0, numpy.nan],
+              [numpy.nan, numpy.nan, numpy.nan]],
+             [[110, 190, 300], [9, 3, 1], [7, 8, 9]]],
+            comparison.values)
+
+    def test_deltas(self):
+        comparison = compare(self.datasets, 'client')
+        numpy.testing.assert_array_equal([[10, -10], [-1, 3]],
+                                         comparison.absolute_delta()[0, :2, :2])
+        numpy.testing.assert_allclose([[0.1, -0.05], [-0.1, numpy.nan]],
+                                      comparison.relative_delta()[0, :2, :2])
+
+    def test_flagged_cells(self):
+        comparison = compare(self.datasets, 'client')
+        self.assertEqual([(0, 0)], list(zip(*numpy.nonzero(
+                                        comparison.flagged(0.05)[0]))))
+        self.assertEqual([(0, 0), (1, 0)], list(zip(*numpy.nonzero(
+                                        comparison.flagged(0.05,
+                                                           direction='both')[0]))))
+        self.assertEqual([(0, 0), (1, 1)], list(zip(*numpy.nonzero(
+                                        comparison.flagged(2, relative=False)[0]))))
+        with self.assertRaises(ValueError):
+            comparison.flagged(direction='sideways')
+
+    def test_report(self):
+        columns = compare(self.datasets, 'client').report(['old', 'new'])
+        self.assertSequenceEqual(
+            ['ciphersuite', 'label', 'bytes sent', 'bytes received', 'old',
+             'new', 'new delta', 'new relative delta', 'flagged'], list(columns))
+        self.assertSequenceEqual(['TLS-RSA-WITH-A'], columns['ciphersuite'].tolist())
+        self.assertSequenceEqual([10], columns['new delta'].tolist())
+
+        columns = compare(self.datasets, 'client').report(['old', 'new'],
+                                                          flagged_only=False)
+        self.assertEqual(9, len(columns['flagged']))
+
+    def test_missing_function(self):
+        comparisons = list(iter_comparisons(self.datasets, all_functions=True))
+        self.assertSequenceEqual([('client', 'fn'), ('client', 'fn2'),
+                                  ('server', 'fn')],
+                                 [(c.entity, c.function) for c in comparisons])
+        numpy.testing.assert_array_equal([[[1]], [[numpy.nan]]],
+                                         comparisons[1].values)
+        self.assertFalse(comparisons[1].flagged(direction='both').any())
+
+    def test_diff_fit_report(self):
+        fd, path = tempfile.mkstemp(suffix='.npz')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        paths = [write_temp_json(self, self.BASELINE), write_temp_json(self, self.OTHER)]
+        run_diff(paths, path, all_functions=True, fmt='npz', fit=True, frequency=2)
+
+        arrays = numpy.load(path, allow_pickle=True)
+        # fn2 is only in the baseline
+        self.assertEqual(2, len(arrays['client_fn2_fit_dataset']))
+        datasets = arrays['client_fn_fit_dataset'].tolist()
+        self.assertEqual(4, datasets.count(os.path.splitext(os.path.basename(paths[0]))[0]))
+        self.assertEqual(6, datasets.count(os.path.splitext(os.path.basename(paths[1]))[0]))
+        rows = (arrays['client_fn_fit_axis'] == 'sent') & (arrays['client_fn_fit_label'] == 'A')
+        numpy.testing.assert_allclose([100, 95], arrays['client_fn_fit_slope'][rows])
+        numpy.testing.assert_allclose([0.02, 2 / 95],
+                                      arrays['client_fn_fit_throughput_bytes_s_'][rows])
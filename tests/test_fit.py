@@ -0,0 +1,83 @@
+import unittest
+import numpy
+from data.fit import fit_linear, fit_piecewise, candidate_breakpoints, throughput
+from data.models import EncryptionData
+from tests.helpers import write_temp_json
+
+class FitTestCase(unittest.TestCase):
+    BYTES = numpy.arange(0, 2048, 64)
+
+    def assert_close(self, expected, obtained):
+        numpy.testing.assert_allclose(expected, obtained, rtol=1e-7, atol=1e-6)
+
+    def test_linear_fit(self):
+        results = numpy.vstack([100 + 2 * self.BYTES, 7 + 0.5 * self.BYTES])
+        fit = fit_linear(self.BYTES, results)
+        self.assert_close([100, 7], fit.intercept)
+        self.assert_close([2, 0.5], fit.slope)
+        self.assert_close([1, 1], fit.r_squared)
+        self.assert_close([0.5, 2], fit.throughput())
+        self.assert_close([1e9, 4e9], fit.throughput(frequency=2e9))
+
+    def test_large_byte_offset(self):
+        bytes_array = 1e6 + numpy.arange(100)
+        results = numpy.vstack([5 + 2 * bytes_array, 40 + 0.25 * bytes_array])
+        fit = fit_linear(bytes_array, results)
+        self.assert_close([5, 40], fit.intercept)
+        self.assert_close([2, 0.25], fit.slope)
+
+        fit = fit_piecewise(bytes_array, results, breakpoints=[1e6 + 50])
+        self.assert_close([5, 40], fit.intercept)
+        self.assert_close([2, 0.25], fit.slope_after)
+
+    def test_no_ciphersuites(self):
+        fit = fit_linear(numpy.array([], dtype=numpy.int64), numpy.empty((0, 0)))
+        self.assertEqual(0, len(fit.slope))
+        fit = fit_piecewise(numpy.array([], dtype=numpy.int64), numpy.empty((0, 0)))
+        self.assertEqual(0, len(fit.slope_after))
+
+    def test_missing_cells_are_left_out(self):
+        results = numpy.vstack([100 + 2 * self.BYTES,
+                                numpy.full(len(self.BYTES), numpy.nan)]).astype(float)
+        results[0, [3, 10]] = numpy.nan
+        results[1, 5] = 3
+        fit = fit_linear(self.BYTES, results)
+        self.assert_close([100, numpy.nan], fit.intercept)
+        self.assert_close([2, numpy.nan], fit.slope)
+
+    def test_piecewise_fit(self):
+        bytes_array = numpy.arange(0, 4096, 16)
+        results = numpy.vstack([
+            50 + numpy.where(bytes_array < 1024, 3 * bytes_array,
+                             3 * 1024 + (bytes_array - 1024)),
+            10 + 4 * bytes_array,
+        ])
+        fit = fit_piecewise(bytes_array, results, breakpoints=[512, 1024, 2048])
+        self.assertEqual(1024, fit.breakpoint[0])
+        self.assert_close([50, 10], fit.intercept)
+        self.assert_close([3, 4], fit.slope)
+        self.assert_close([1, 4], fit.slope_after)
+        self.assert_close([1, 1], fit.r_squared)
+        self.assert_close([1, 0.25], fit.throughput())
+
+        self.assertGreater(fit_piecewise(bytes_array, results).r_squared[0],
+                           fit_linear(bytes_array, results).r_squared[0])
+
+    def test_candidate_breakpoints(self):
+        self.assertSequenceEqual([1, 2], candidate_breakpoints([0, 1, 2, 3, 4, 4]).tolist())
+        self.assertEqual(0, len(candidate_breakpoints([0, 1, 2])))
+        self.assertEqual(8, len(candidate_breakpoints(numpy.arange(100), 8)))
+
+    def test_throughput_of_non_positive_slopes(self):
+        self.assert_close([numpy.nan, numpy.nan, 4], throughput(numpy.array([0, -1, 0.25])))
+
+    def test_fit_report(self):
+        path = write_temp_json(self, {'client': {'fn': {
+            'TLS-RSA-WITH-A': {'(0, 1)': 10, '(100, 1)': 30, '(200, 1)': 50},
+        }}, 'server': {}})
+
+        columns = EncryptionData(path).get_fit_report('client', 'sent')
+        self.assertSequenceEqual(['A'], columns['label'].tolist())
+        self.assert_close([10], columns['intercept'])
+        self.assert_close([0.2], columns['slope'])
+        self.assert_close([5], columns['throughput (bytes/unit)'])
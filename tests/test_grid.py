@@ -0,0 +1,150 @@
+import os
+import re
+import tempfile
+import unittest
+import zipfile
+import numpy
+from data.grid import ResultGrid
+from data.models import EncryptionData
+from edat import run, run_all
+from tests.helpers import write_temp_json
+
+class ResultGridTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # 3 sizes sent x 2 sizes received, (16, 32) not measured
+        self.grid = ResultGrid(numpy.array([32, 16, 0, 32, 0]),
+                               numpy.array([0, 0, 0, 32, 32]),
+                               numpy.array(['TLS-RSA-WITH-A', 'TLS-PSK-WITH-B']),
+                               numpy.array(['A', 'B']),
+                               numpy.array([[3, 2, 1, 6, 4],
+                                            [30, 20, 10, 60, 40]]))
+
+    def test_axes(self):
+        self.assertSequenceEqual([0, 16, 32], self.grid.sent.tolist())
+        self.assertSequenceEqual([0, 32], self.grid.received.tolist())
+        self.assertEqual((2, 3, 2), self.grid.shape)
+        self.assertAlmostEqual(5 / 6, self.grid.density)
+
+    def test_dense(self):
+        dense = self.grid.dense()
+        numpy.testing.assert_array_equal([[1, 4], [2, numpy.nan], [3, 6]], dense[0])
+        numpy.testing.assert_array_equal([[10, 40], [20, numpy.nan], [30, 60]], dense[1])
+        self.assertIs(dense, self.grid.dense())
+        self.assertFalse(dense.flags.writeable)
+
+    def test_cell(self):
+        self.assertSequenceEqual([6, 60], self.grid.cell(32, 32).tolist())
+        with self.assertRaises(KeyError):
+            self.grid.cell(16, 32)
+        with self.assertRaises(KeyError):
+            self.grid.cell(8, 0)
+
+    def test_slices(self):
+        received, results = self.grid.sent_slice(32)
+        self.assertSequenceEqual([0, 32], received.tolist())
+        self.assertSequenceEqual([[3, 6], [30, 60]], results.tolist())
+
+        sent, results = self.grid.received_slice(32)
+        self.assertSequenceEqual([0, 32], sent.tolist())
+        self.assertSequenceEqual([[4, 6], [40, 60]], results.tolist())
+
+    def test_select(self):
+        grid = self.grid.select(ciphersuites=['TLS-PSK-WITH-B'], sent=(16, None))
+        self.assertSequenceEqual(['B'], grid.labels.tolist())
+        self.assertSequenceEqual([32, 16, 32], grid.bytes_sent.tolist())
+        self.assertSequenceEqual([[30, 20, 60]], grid.results.tolist())
+
+        grid = self.grid.select(ciphersuites=['A'], received=0)
+        self.assertSequenceEqual([[3, 2, 1]], grid.results.tolist())
+        self.assertEqual((1, 3, 1), grid.shape)
+
+    def test_rows(self):
+        rows = list(self.grid.iter_rows('received', 'bytes received'))
+        self.assertEqual('bytes received', rows[0][0])
+        self.assertSequenceEqual([0, 0, 0, 32, 32], rows[0][1].tolist())
+        self.assertSequenceEqual([1, 2, 3, 4, 6], rows[1][1].tolist())
+
+    def test_heatmap_rows(self):
+        rows = list(self.grid.heatmap_rows(1, 'sent \\ received'))
+        self.assertEqual('sent \\ received', rows[0][0])
+        self.assertSequenceEqual([0, 32], rows[0][1].tolist())
+        self.assertSequenceEqual([0, 16, 32], [row[0] for row in rows[1:]])
+        numpy.testing.assert_array_equal([20, numpy.nan], rows[2][1])
+
+
+class EncryptionDataGridTestCase(unittest.TestCase):
+    DATA = {
+        'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 1, '(3, 2)': 3, '(1, 4)': 5},
+                          'TLS-PSK-WITH-A': {'(1, 2)': 3, '(3, 2)': 5, '(1, 4)': 7}}},
+        'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 2}}},
+    }
+
+    def setUp(self):
+        self.ed = EncryptionData(write_temp_json(self, self.DATA))
+
+    def test_grid(self):
+        grid = self.ed.get_grid('client')
+        self.assertIs(grid, self.ed.get_grid('client'))
+        numpy.testing.assert_array_equal([[[1, 5], [3, numpy.nan]],
+                                          [[3, 7], [5, numpy.nan]]], grid.dense())
+
+        grouped = self.ed.get_grid('client', grouped=True)
+        self.assertEqual((1, 2, 2), grouped.shape)
+        self.assertSequenceEqual([2], grouped.cell(1, 2).tolist())
+
+    def test_heatmap_sheets(self):
+        sheets = [(label, list(rows)) for label, rows
+                  in self.ed.iter_heatmap_sheets('client', grouped=True)]
+        self.assertEqual(['A'], [label for label, _ in sheets])
+        rows = sheets[0][1]
+        self.assertEqual('bytes sent \\ bytes received', rows[0][0])
+        numpy.testing.assert_array_equal([2, 6], rows[1][1])
+        numpy.testing.assert_array_equal([4, numpy.nan], rows[2][1])
+
+    def test_merge_drops_grid(self):
+        grid = self.ed.get_grid('client')
+        self.ed.merge({'client': {'fn': {'TLS-RSA-WITH-A': {'(3, 4)': 9}}}})
+        self.assertIsNot(grid, self.ed.get_grid('client'))
+        numpy.testing.assert_array_equal([9, numpy.nan],
+                                         self.ed.get_grid('client').cell(3, 4))
+
+    def test_heatmap_sheets_are_exported(self):
+        fd, path = tempfile.mkstemp(suffix='.npz')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        run_all(self.ed._container._json_path, path, fmt='npz', heatmap=True)
+
+        arrays = numpy.load(path)
+        self.assertSequenceEqual(['heatmap 1', 'heatmap 2', 'heatmap 3'],
+                                 arrays['heatmaps_sheet'].tolist())
+        self.assertSequenceEqual(['client', 'client', 'server'],
+                                 arrays['heatmaps_entity'].tolist())
+        self.assertSequenceEqual(['A', 'A', 'A'], arrays['heatmaps_label'].tolist())
+        self.assertSequenceEqual([2, 4], arrays['heatmap_1_bytes'].tolist())
+        self.assertSequenceEqual(['1', '3'], arrays['heatmap_1_labels'].tolist())
+        self.assertEqual((2, 2), arrays['heatmap_1_values'].shape)
+
+    def test_heatmap_table_of_the_default_function(self):
+        fd, path = tempfile.mkstemp(suffix='.npz')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        run(self.ed._container._json_path, path, True, False, True, False,
+            fmt='npz', heatmap=True)
+
+        arrays = numpy.load(path)
+        self.assertSequenceEqual(['fn', 'fn'], arrays['heatmaps_function'].tolist())
+
+    def test_heatmap_sheet_names_keep_the_ciphersuites(self):
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        run_all(self.ed._container._json_path, path, all_functions=True,
+                heatmap=True)
+
+        with zipfile.ZipFile(path) as xlsx:
+            workbook = xlsx.read('xl/workbook.xml').decode('utf-8')
+        names = re.findall(r'<sheet name="([^"]*)"', workbook)
+        self.assertIn('heatmap 3', names)
+        self.assertIn('heatmaps', names)
+        self.assertFalse([name for name in names if '~' in name])
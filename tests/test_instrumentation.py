@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+import numpy
+from unittest import mock
+from data.instrumentation import NULL_RECORDER, StageRecorder, count_rows
+from data.models import EncryptionData
+from edat import run_all
+
+class StageRecorderTestCase(unittest.TestCase):
+
+    def test_nested_stages(self):
+        recorder = StageRecorder()
+        with recorder.stage('outer', entity='client') as outer:
+            outer['rows'] = 2
+            with recorder.stage('inner') as inner:
+                inner['cells'] = 5
+
+        inner, outer = recorder.records
+        self.assertEqual(('inner', 1, {'cells': 5}), (inner.name, inner.depth, inner.counts))
+        self.assertEqual(('outer', 0, {'entity': 'client'}), (outer.name, outer.depth, outer.info))
+        self.assertGreaterEqual(outer.wall_time, inner.wall_time)
+        self.assertIsNone(outer.peak_allocated)
+
+    def test_trace_memory(self):
+        recorder = StageRecorder(trace_memory=True)
+        with recorder.stage('outer'):
+            with recorder.stage('inner'):
+                data = bytearray(1 << 20)
+            del data
+
+        inner, outer = recorder.records
+        self.assertGreaterEqual(inner.peak_allocated, 1 << 20)
+        self.assertGreaterEqual(outer.peak_allocated, inner.peak_allocated)
+
+    def test_trace_memory_without_reset_peak(self):
+        # tracemalloc.reset_peak is Python 3.9+
+        recorder = StageRecorder(trace_memory=True)
+        with mock.patch.object(tracemalloc, 'reset_peak', None, create=True):
+            with recorder.stage('outer'):
+                data = bytearray(1 << 20)
+                del data
+                with recorder.stage('inner'):
+                    data = bytearray(4 << 20)
+                    del data
+
+        inner, outer = recorder.records
+        self.assertGreaterEqual(inner.peak_allocated, 4 << 20)
+        self.assertLess(inner.peak_allocated, 5 << 20)
+        self.assertGreaterEqual(outer.peak_allocated, inner.peak_allocated)
+
+    def test_hooks_and_summary(self):
+        names = []
+        recorder = StageRecorder(hooks=[lambda record: names.append(record.name)])
+        for _ in range(2):
+            with recorder.stage('sort') as counts:
+                counts['cells'] = 3
+        with recorder.stage('write'):
+            pass
+
+        self.assertEqual(['sort', 'sort', 'write'], names)
+        summary = json.loads(json.dumps(recorder.summary()))
+        self.assertEqual(['sort', 'write'], list(summary['totals']))
+        self.assertEqual(2, summary['totals']['sort']['runs'])
+        self.assertEqual({'cells': 6}, summary['totals']['sort']['counts'])
+        self.assertEqual(3, len(summary['stages']))
+
+    def test_null_recorder(self):
+        self.assertFalse(NULL_RECORDER.enabled)
+        with NULL_RECORDER.stage('sort', entity='client') as counts:
+            counts['cells'] = 1
+        self.assertEqual([], NULL_RECORDER.records)
+        with NULL_RECORDER.stage('sort') as counts:
+            self.assertEqual({}, counts)
+
+    def test_split_stages(self):
+        recorder = StageRecorder(trace_memory=True)
+        with recorder.stage('outer'):
+            decode = recorder.split_stage('decode', entity='client')
+            build = recorder.split_stage('build')
+            for _ in range(3):
+                with decode as counts:
+                    counts['bytes'] = counts.get('bytes', 0) + 10
+                with build:
+                    data = bytearray(1 << 20)
+                    del data
+            decode.done()
+            build.done()
+
+        decode, build, outer = recorder.records
+        self.assertEqual(('decode', 1, {'bytes': 30}, {'entity': 'client'}),
+                         (decode.name, decode.depth, decode.counts, decode.info))
+        self.assertGreaterEqual(build.peak_allocated, 1 << 20)
+        self.assertLess(build.peak_allocated, 2 << 20)
+        self.assertGreaterEqual(outer.wall_time, decode.wall_time + build.wall_time)
+
+    def test_null_split_stage(self):
+        stage = NULL_RECORDER.split_stage('decode')
+        with stage as counts:
+            counts['cells'] = 1
+        stage.done()
+        self.assertEqual([], NULL_RECORDER.records)
+
+    def test_count_rows(self):
+        counts = {}
+        rows = [['label', 1, 2], ['cs', numpy.arange(4)]]
+        self.assertEqual(rows, list(count_rows(rows, counts)))
+        self.assertEqual({'rows': 2, 'cells': 8}, counts)
+
+
+class InstrumentedEncryptionDataTestCase(unittest.TestCase):
+
+    CURR_DIR = os.path.dirname(os.path.abspath(__file__))
+    JSON_PATH = os.path.join(CURR_DIR, 'res', 'pencres_01.json')
+
+    def test_stage_hook(self):
+        records = []
+        ed = EncryptionData(self.JSON_PATH)
+        ed.add_stage_hook(records.append)
+        list(ed.iter_xlxs_result_rows('client', 'sent'))
+
+        self.assertEqual(['index', 'decode', 'build', 'sort'],
+                         [record.name for record in records])
+        self.assertEqual('client', records[1].info['entity'])
+        self.assertGreater(records[1].counts['bytes'], 0)
+        self.assertEqual(records[1].info, records[2].info)
+        self.assertGreater(records[2].counts['cells'], 0)
+        self.assertTrue(ed.recorder.enabled)
+
+    def test_disabled_by_default(self):
+        ed = EncryptionData(self.JSON_PATH)
+        list(ed.iter_xlxs_result_rows('client', 'sent'))
+        self.assertFalse(ed.recorder.enabled)
+
+    def test_run_all(self):
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        recorder = StageRecorder()
+        run_all(self.JSON_PATH, path, recorder=recorder)
+
+        totals = recorder.summary()['totals']
+        self.assertIn('sort', totals)
+        self.assertEqual(1, totals['write']['runs'])
+        self.assertGreater(totals['write']['counts']['rows'], 0)
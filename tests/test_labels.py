@@ -0,0 +1,100 @@
+import gc
+import unittest
+import weakref
+import numpy
+from data.labels import CiphersuiteLabelResolver, as_label_resolver, group_by_label
+from data.models import EncryptionData, Defaults
+from tests.helpers import write_temp_json
+
+class CiphersuiteLabelResolverTestCase(unittest.TestCase):
+
+    def test_default_labels(self):
+        self.assertEqual('CAMELLIA-256-GCM-SHA384', Defaults.default_ciphersuite_label(
+                                    'TLS-ECDHE-RSA-WITH-CAMELLIA-256-GCM-SHA384'))
+        self.assertEqual('AES-128-GCM-SHA256', Defaults.default_ciphersuite_label(
+                                    'TLS1-3-AES-128-GCM-SHA256'))
+
+    def test_unmatched_names_use_fallback(self):
+        self.assertEqual('TLS_AES_128_GCM_SHA256',
+                         CiphersuiteLabelResolver()('TLS_AES_128_GCM_SHA256'))
+        resolver = CiphersuiteLabelResolver(fallback=str.lower)
+        self.assertEqual('tls_aes_128_gcm_sha256',
+                         resolver('TLS_AES_128_GCM_SHA256'))
+
+    def test_pattern_chain(self):
+        resolver = CiphersuiteLabelResolver([r'^TLS_(.*)_SHA\d+$',
+                                             r'WITH-(?P<encr_name>[^-]+)',
+                                             r'RC4'])
+        self.assertSequenceEqual(['AES_128_GCM', 'AES', 'RC4', 'PSK'],
+                                 resolver.labels(['TLS_AES_128_GCM_SHA256',
+                                                  'TLS-RSA-WITH-AES-128-CBC-SHA',
+                                                  'SSL-RC4-MD5', 'PSK']).tolist())
+
+    def test_labels_are_memoized(self):
+        calls = []
+
+        def label_fn(ciphersuite):
+            calls.append(ciphersuite)
+            return ciphersuite[-1]
+
+        resolver = as_label_resolver(label_fn)
+        self.assertIs(resolver, as_label_resolver(resolver))
+        self.assertSequenceEqual(['A', 'B', 'A'],
+                                 resolver.labels(['A', 'B', 'A']).tolist())
+        resolver('B')
+        self.assertSequenceEqual(['A', 'B'], calls)
+
+    def test_label_fn_is_called_once_per_ciphersuite(self):
+        calls = []
+
+        def label_fn(ciphersuite):
+            calls.append(ciphersuite)
+            return 'abc'
+
+        path = write_temp_json(self, {'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 1}}},
+                                      'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 2}}}})
+
+        ed = EncryptionData(path, ciphersuite_label_fn=label_fn)
+        ed.get_client_data()
+        ed.get_server_data()
+        self.assertSequenceEqual(['TLS-RSA-WITH-A'], calls)
+
+    def test_label_fn_is_memoized_across_files(self):
+        calls = []
+
+        def label_fn(ciphersuite):
+            calls.append(ciphersuite)
+            return 'abc'
+
+        for _ in range(2):
+            path = write_temp_json(self, {'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 1}}}})
+            EncryptionData(path, ciphersuite_label_fn=label_fn).get_client_data()
+        self.assertSequenceEqual(['TLS-RSA-WITH-A'], calls)
+
+        # the shared labels do not keep the function alive
+        label_fn_ref = weakref.ref(label_fn)
+        del label_fn
+        gc.collect()
+        self.assertIsNone(label_fn_ref())
+
+
+class GroupByLabelTestCase(unittest.TestCase):
+
+    def test_rows_are_averaged_by_label(self):
+        labels, results = group_by_label(
+            ['AES', 'RC4', 'AES', 'AES'],
+            numpy.array([[1, 2], [10, 20], [3, numpy.nan], [5, 6]]))
+        self.assertSequenceEqual(['AES', 'RC4'], labels.tolist())
+        self.assertSequenceEqual([[3, 4], [10, 20]], results.tolist())
+
+    def test_grouped_result_rows(self):
+        path = write_temp_json(self, {'client': {'fn': {
+            'TLS-RSA-WITH-AES-128-GCM-SHA256': {'(1, 2)': 1, '(3, 4)': 3},
+            'TLS-ECDHE-RSA-WITH-AES-128-GCM-SHA256': {'(3, 4)': 5, '(1, 2)': 3},
+        }}, 'server': {}})
+
+        rows = [[label] + values.tolist() for label, values in
+                EncryptionData(path).iter_xlxs_result_rows('client', 'sent',
+                                                           grouped=True)]
+        self.assertSequenceEqual([[Defaults.DEFAULT_BYTES_SENT_LABEL, 1, 3],
+                                  ['AES-128-GCM-SHA256', 2, 4]], rows)
@@ -1,7 +1,13 @@
 import os
+import shutil
+import tempfile
 import unittest
+import numpy
 from pathlib import Path
+from data.cache import ParsedDataCache
+from data.index import ProfilingIndex
 from data.models import EncryptionData, Defaults
+from tests.helpers import write_json, write_temp_json
 
 class ModelsBaseTestCase(unittest.TestCase):
     RES_DIR = Path('./tests/res/')
@@ -10,6 +16,19 @@ class ModelsBaseTestCase(unittest.TestCase):
     TEST_JSON_01_PATH = os.path.join(RES_DIR, JSON_01_FILENAME)
     TEST_JSON_02_PATH = os.path.join(RES_DIR, JSON_02_FILENAME)
 
+    def sort_result_by_bytes(self, res):
+        """
+        Sorted result of the client results `res` (a bytes sent row, then
+        a row per ciphersuite), written to a file and read back.
+        """
+        bytes_sent = res[0][1:]
+        path = write_temp_json(self, {'client': {'fn': {
+            'TLS-RSA-WITH-' + row[0]: {'({}, 0)'.format(size): value
+                                       for size, value in zip(bytes_sent, row[1:])}
+            for row in res[1:]}}})
+        ed = EncryptionData(path, bytes_sent_label=res[0][0])
+        return ed.get_client_xlxs_bytes_sent_result()
+
 class EncryptionDataTestCase(ModelsBaseTestCase):
 
     def setUp(self):
@@ -226,7 +245,6 @@ class EncryptionDataTestCase(ModelsBaseTestCase):
                                 'Wrong XLXS result.')
 
     def test_results_sorting(self):
-        ed = EncryptionData(self.TEST_JSON_01_PATH)
         sample_res = [
             ['bytes', 3, 4, 2, 1],
             ['alg_1', 3, 4, 2, 1],
@@ -241,7 +259,7 @@ class EncryptionDataTestCase(ModelsBaseTestCase):
             ['alg_3', 1, 2, 3, 4],
         ]
 
-        obtained = ed._sort_result_by_bytes(sample_res)
+        obtained = self.sort_result_by_bytes(sample_res)
         self.assertSequenceEqual(expected, obtained, 'Results sorted wrong')
 
         sample_res = [
@@ -258,7 +276,7 @@ class EncryptionDataTestCase(ModelsBaseTestCase):
             ['alg_3', 5, 18, 4, 7],
         ]
 
-        obtained = ed._sort_result_by_bytes(sample_res)
+        obtained = self.sort_result_by_bytes(sample_res)
         self.assertSequenceEqual(expected, obtained, 'Results sorted wrong')
 
     def test_encryption_data_sent_bytes_result_client_mixed_bytes_order(self):
@@ -275,3 +293,468 @@ class EncryptionDataTestCase(ModelsBaseTestCase):
 
         self.assertSequenceEqual(expected_xlsx_result, obtained_xlxs_result,
                                 'Wrong XLXS result.')
+
+
+class StreamingEncryptionDataTestCase(ModelsBaseTestCase):
+
+    def assert_same_results(self, json_path):
+        ed = EncryptionData(json_path)
+        streamed_ed = EncryptionData(json_path, streaming=True)
+
+        self.assertSequenceEqual(ed.get_client_xlxs_bytes_sent_result(),
+                                 streamed_ed.get_client_xlxs_bytes_sent_result())
+        self.assertSequenceEqual(ed.get_client_xlxs_bytes_received_result(),
+                                 streamed_ed.get_client_xlxs_bytes_received_result())
+        self.assertSequenceEqual(ed.get_server_xlxs_bytes_sent_result(),
+                                 streamed_ed.get_server_xlxs_bytes_sent_result())
+        self.assertSequenceEqual(ed.get_server_xlxs_bytes_received_result(),
+                                 streamed_ed.get_server_xlxs_bytes_received_result())
+        self.assertSequenceEqual(list(ed.client()), list(streamed_ed.client()))
+        self.assertSequenceEqual(list(ed.server()), list(streamed_ed.server()))
+
+    def test_streaming_matches_full_parse(self):
+        self.assert_same_results(self.TEST_JSON_01_PATH)
+
+    def test_streaming_matches_full_parse_mixed_bytes_order(self):
+        self.assert_same_results(self.TEST_JSON_02_PATH)
+
+
+class ColumnarEncryptionDataTestCase(ModelsBaseTestCase):
+
+    def test_client_columnar_data(self):
+        ed = EncryptionData(self.TEST_JSON_02_PATH)
+        client = ed.get_client_data()
+
+        self.assertEqual(numpy.int64, client.bytes_sent.dtype)
+        self.assertEqual(numpy.int64, client.bytes_received.dtype)
+        self.assertSequenceEqual([0, 901, 1], client.bytes_sent.tolist())
+        self.assertSequenceEqual([100, 200, 300], client.bytes_received.tolist())
+        self.assertSequenceEqual(['RC4-128-SHA', 'CAMELLIA-256-GCM-SHA384'],
+                                 client.labels.tolist())
+        self.assertSequenceEqual(['TLS-RSA-WITH-RC4-128-SHA',
+                                  'TLS-ECDHE-RSA-WITH-CAMELLIA-256-GCM-SHA384'],
+                                 client.ciphersuites.tolist())
+        self.assertEqual((2, 3), client.profiling_results.shape)
+        self.assertSequenceEqual([[1992, 2005, 2001], [1, 2, 3]],
+                                 client.profiling_results.tolist())
+
+    def test_columnar_data_is_not_copied(self):
+        ed = EncryptionData(self.TEST_JSON_01_PATH)
+        first = ed.get_server_data().profiling_results
+        second = ed.get_server_data().profiling_results
+
+        self.assertIs(first, second)
+        self.assertFalse(first.flags.writeable)
+
+    def test_float_results(self):
+        data = {
+            'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 1, '(3, 4)': 2},
+                              'TLS-RSA-WITH-B': {'(3, 4)': 0.5, '(1, 2)': 1.5}}},
+            'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 1}}},
+        }
+        path = write_temp_json(self, data)
+        for streaming in (False, True):
+            client = EncryptionData(path, streaming=streaming).get_client_data()
+            self.assertEqual(numpy.float64, client.profiling_results.dtype)
+            self.assertSequenceEqual([[1, 2], [1.5, 0.5]],
+                                     client.profiling_results.tolist())
+
+
+class SortingEncryptionDataTestCase(ModelsBaseTestCase):
+
+    def test_results_sorting_keeps_row_types(self):
+        sample_res = [
+            ['bytes', 3, 1, 2],
+            ['alg_1', 0.5, 1.5, 2.5],
+        ]
+
+        obtained = self.sort_result_by_bytes(sample_res)
+        self.assertSequenceEqual([['bytes', 1, 2, 3], ['alg_1', 1.5, 2.5, 0.5]],
+                                 obtained)
+        self.assertTrue(all(type(elem) is int for elem in obtained[0][1:]))
+
+    def test_secondary_ordering_by_other_byte_axis(self):
+        data = {
+            'client': {'fn': {'TLS-RSA-WITH-A': {'(2, 30)': 1, '(1, 20)': 2,
+                                                 '(2, 10)': 3, '(1, 40)': 4}}},
+            'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 1)': 1}}},
+        }
+        ed = EncryptionData(write_temp_json(self, data))
+
+        self.assertSequenceEqual(
+            [[Defaults.DEFAULT_BYTES_SENT_LABEL, 1, 1, 2, 2], ['A', 2, 4, 3, 1]],
+            ed.get_client_xlxs_bytes_sent_result())
+        self.assertSequenceEqual(
+            [[Defaults.DEFAULT_BYTES_RECEIVED_LABEL, 10, 20, 30, 40],
+             ['A', 3, 2, 1, 4]],
+            ed.get_client_xlxs_bytes_received_result())
+
+    def test_byte_order_is_cached(self):
+        ed = EncryptionData(self.TEST_JSON_01_PATH)
+        ed.get_client_xlxs_bytes_sent_result()
+        order = ed._get_byte_order('client', 'sent')
+
+        ed.get_client_xlxs_bytes_sent_result()
+        self.assertIs(order, ed._get_byte_order('client', 'sent'))
+        self.assertSequenceEqual([0, 2, 1], order.tolist())
+
+
+class CachedEncryptionDataTestCase(ModelsBaseTestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def test_cached_results_match_parsed_results(self):
+        cache = ParsedDataCache(self.cache_dir)
+        expected = EncryptionData(self.TEST_JSON_02_PATH,
+                                  cache=cache).get_client_xlxs_bytes_sent_result()
+        self.assertIsNotNone(cache.load(self.TEST_JSON_02_PATH))
+
+        ed = EncryptionData(self.TEST_JSON_02_PATH, cache=cache)
+        self.assertSequenceEqual(expected, ed.get_client_xlxs_bytes_sent_result())
+        self.assertIsInstance(ed.get_client_data().profiling_results, numpy.memmap)
+
+    def test_labels_are_computed_on_load(self):
+        cache = ParsedDataCache(self.cache_dir)
+        EncryptionData(self.TEST_JSON_01_PATH, cache=cache).get_server_data()
+
+        ed = EncryptionData(self.TEST_JSON_01_PATH, cache=cache,
+                            ciphersuite_label_fn=lambda raw_str: 'abc')
+        self.assertSequenceEqual(['abc', 'abc'], ed.get_server_data().labels.tolist())
+
+    def test_modified_file_invalidates_cache(self):
+        path = write_temp_json(self, {
+            'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 1}}},
+            'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 2}}},
+        })
+        cache = ParsedDataCache(self.cache_dir)
+        EncryptionData(path, cache=cache).get_client_data()
+
+        write_json(path, {
+            'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 10, '(3, 4)': 30}}},
+            'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 20}}},
+        })
+        self.assertIsNone(cache.load(path))
+
+        client = EncryptionData(path, cache=cache).get_client_data()
+        self.assertSequenceEqual([[10, 30]], client.profiling_results.tolist())
+
+
+class AllResultsEncryptionDataTestCase(ModelsBaseTestCase):
+
+    def test_iter_xlxs_results(self):
+        ed = EncryptionData(self.TEST_JSON_01_PATH)
+        obtained = {(entity, axis): [[label] + values.tolist()
+                                     for label, values in rows]
+                    for entity, _, axis, rows in ed.iter_xlxs_results()}
+
+        self.assertEqual({('client', 'sent'), ('client', 'received'),
+                          ('server', 'sent'), ('server', 'received')},
+                         set(obtained))
+        self.assertSequenceEqual(ed.get_client_xlxs_bytes_sent_result(),
+                                 obtained[('client', 'sent')])
+        self.assertSequenceEqual(ed.get_server_xlxs_bytes_received_result(),
+                                 obtained[('server', 'received')])
+
+    def test_single_entity(self):
+        ed = EncryptionData(write_temp_json(self, {
+            'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 3, '(2, 4)': 5}}}}))
+        obtained = [(entity, axis) for entity, _, axis, _ in ed.iter_xlxs_results()]
+        self.assertSequenceEqual([('client', 'sent'), ('client', 'received')],
+                                 obtained)
+
+
+class SamplesEncryptionDataTestCase(ModelsBaseTestCase):
+    DATA = {
+        'client': {'fn': {
+            'TLS-RSA-WITH-A': {'(1, 10)': [10, 20, 60], '(2, 20)': [1, 2]},
+            'TLS-RSA-WITH-B': {'(2, 20)': [4, 5, 6, 7], '(1, 10)': 3},
+        }},
+        'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 10)': 5, '(2, 20)': 6}}},
+    }
+
+    def test_samples_are_aggregated(self):
+        path = write_temp_json(self, self.DATA)
+        for streaming in (False, True):
+            ed = EncryptionData(path, streaming=streaming)
+            client = ed.get_client_data()
+            self.assertEqual((2, 2, 4), client.samples.shape)
+            self.assertSequenceEqual([[30, 1.5], [3, 5.5]],
+                                     client.profiling_results.tolist())
+            self.assertIsNone(ed.get_server_data().samples)
+
+    def test_statistic_parameter(self):
+        path = write_temp_json(self, self.DATA)
+        ed = EncryptionData(path, statistic='median')
+        self.assertSequenceEqual(
+            [[Defaults.DEFAULT_BYTES_SENT_LABEL, 1, 2], ['A', 20, 1.5], ['B', 3, 5.5]],
+            ed.get_client_xlxs_bytes_sent_result())
+
+    def test_statistics_of_sorted_results(self):
+        path = write_temp_json(self, self.DATA)
+        ed = EncryptionData(path)
+        rows = list(ed.iter_xlxs_result_rows('client', 'sent', statistic='max'))
+        self.assertSequenceEqual([[60, 2], [3, 7]],
+                                 [values.tolist() for _, values in rows[1:]])
+        self.assertSequenceEqual([[3, 2], [1, 4]],
+                                 ed.get_statistics('client').count().tolist())
+        # single values are handled as one sample
+        self.assertSequenceEqual([[1, 1]],
+                                 ed.get_statistics('server').count().tolist())
+
+    def test_cached_samples(self):
+        path = write_temp_json(self, self.DATA)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        cache = ParsedDataCache(cache_dir)
+        EncryptionData(path, cache=cache).get_client_data()
+
+        client = EncryptionData(path, cache=cache,
+                                statistic='min').get_client_data()
+        self.assertEqual((2, 2, 4), client.samples.shape)
+        self.assertSequenceEqual([[10, 1], [3, 4]],
+                                 client.profiling_results.tolist())
+
+
+class FunctionsEncryptionDataTestCase(ModelsBaseTestCase):
+    DATA = {
+        'client': {
+            'mbedtls_ssl_write': {'TLS-RSA-WITH-A': {'(1, 10)': 1, '(2, 20)': 2}},
+            'mbedtls_ssl_read': {'TLS-RSA-WITH-A': {'(3, 30)': [3, 5]},
+                                 'TLS-RSA-WITH-B': {'(3, 30)': [7]}},
+        },
+        'server': {
+            'mbedtls_ssl_handshake': {'TLS-RSA-WITH-A': {'(5, 50)': 5}},
+        },
+    }
+
+    def test_list_functions(self):
+        path = write_temp_json(self, self.DATA)
+        for streaming in (False, True):
+            ed = EncryptionData(path, streaming=streaming)
+            self.assertSequenceEqual(['client', 'server'], ed.get_entities())
+            self.assertSequenceEqual(['mbedtls_ssl_write', 'mbedtls_ssl_read'],
+                                     ed.get_functions('client'))
+            self.assertEqual({'client': ['mbedtls_ssl_write', 'mbedtls_ssl_read'],
+                              'server': ['mbedtls_ssl_handshake']},
+                             dict(ed.get_functions()))
+
+    def test_function_results(self):
+        path = write_temp_json(self, self.DATA)
+        for streaming in (False, True):
+            ed = EncryptionData(path, streaming=streaming)
+            self.assertSequenceEqual([1, 2], ed.get_client_bytes_sent_list())
+            self.assertSequenceEqual([3], ed.get_client_bytes_sent_list(
+                                                    'mbedtls_ssl_read'))
+            self.assertSequenceEqual(
+                [[Defaults.DEFAULT_BYTES_RECEIVED_LABEL, 30], ['A', 4], ['B', 7]],
+                ed.get_client_xlxs_bytes_received_result('mbedtls_ssl_read'))
+            self.assertSequenceEqual([['A', 5]], list(ed.server()))
+
+    def test_functions_are_built_lazily(self):
+        path = write_temp_json(self, self.DATA)
+        for streaming in (False, True):
+            ed = EncryptionData(path, streaming=streaming)
+            ed.get_client_data('mbedtls_ssl_read')
+            self.assertEqual({('client', 'mbedtls_ssl_read')},
+                             set(ed._container._sections))
+
+    def test_function_without_ciphersuites(self):
+        path = write_temp_json(self, {'client': {'fn': {}}, 'server': {}})
+        for streaming in (False, True):
+            ed = EncryptionData(path, streaming=streaming)
+            self.assertSequenceEqual(['fn'], ed.get_functions('client'))
+            client = ed.get_client_data()
+            self.assertEqual((0, 0), client.profiling_results.shape)
+            self.assertSequenceEqual([], client.labels.tolist())
+            self.assertSequenceEqual([[Defaults.DEFAULT_BYTES_SENT_LABEL]],
+                                     ed.get_client_xlxs_bytes_sent_result())
+
+    def test_unknown_function(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        with self.assertRaises(KeyError):
+            ed.get_client_data('mbedtls_ssl_handshake')
+
+    def test_all_functions_results(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        obtained = [(entity, function, axis)
+                    for entity, function, axis, _ in ed.iter_xlxs_results(
+                                                        all_functions=True)]
+        self.assertSequenceEqual([
+            ('client', 'mbedtls_ssl_write', 'sent'),
+            ('client', 'mbedtls_ssl_write', 'received'),
+            ('client', 'mbedtls_ssl_read', 'sent'),
+            ('client', 'mbedtls_ssl_read', 'received'),
+            ('server', 'mbedtls_ssl_handshake', 'sent'),
+            ('server', 'mbedtls_ssl_handshake', 'received'),
+        ], obtained)
+
+    def test_cached_functions(self):
+        path = write_temp_json(self, self.DATA)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        cache = ParsedDataCache(cache_dir)
+        EncryptionData(path, cache=cache).get_client_data()
+
+        ed = EncryptionData(path, cache=cache)
+        self.assertSequenceEqual(['mbedtls_ssl_write', 'mbedtls_ssl_read'],
+                                 ed.get_functions('client'))
+        self.assertSequenceEqual([[4], [7]], ed.get_client_data(
+                                    'mbedtls_ssl_read').profiling_results.tolist())
+
+
+class IndexSidecarEncryptionDataTestCase(ModelsBaseTestCase):
+    DATA = {
+        'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 1, '(3, 4)': 3}}},
+        'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 2, '(3, 4)': 4},
+                          'TLS-ECDHE-RSA-WITH-CAMELLIA-256-GCM-SHA384':
+                                {'(3, 4)': [8, 10], '(1, 2)': [6]}}},
+    }
+
+    def write_temp_json(self, data):
+        path = super().write_temp_json(data)
+        self.addCleanup(lambda: os.path.exists(ProfilingIndex.sidecar_path(path))
+                        and os.remove(ProfilingIndex.sidecar_path(path)))
+        return path
+
+    def test_single_ciphersuite_is_decoded_alone(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        server = ed.get_ciphersuite_data('server', 'CAMELLIA-256-GCM-SHA384')
+        self.assertSequenceEqual(['TLS-ECDHE-RSA-WITH-CAMELLIA-256-GCM-SHA384'],
+                                 server.ciphersuites.tolist())
+        self.assertSequenceEqual([3, 1], server.bytes_sent.tolist())
+        self.assertSequenceEqual([[9, 6]], server.profiling_results.tolist())
+        self.assertEqual({}, ed._container._sections)
+
+    def test_single_ciphersuite_of_built_function(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        ed.get_server_data()
+        server = ed.get_ciphersuite_data('server',
+                                         'TLS-ECDHE-RSA-WITH-CAMELLIA-256-GCM-SHA384')
+        self.assertSequenceEqual(['CAMELLIA-256-GCM-SHA384'], server.labels.tolist())
+        self.assertSequenceEqual([1, 3], server.bytes_sent.tolist())
+        self.assertSequenceEqual([[6, 9]], server.profiling_results.tolist())
+
+    def test_unknown_ciphersuite(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        with self.assertRaises(KeyError):
+            ed.get_ciphersuite_data('client', 'CAMELLIA-256-GCM-SHA384')
+
+    def test_sidecar_is_written_and_reused(self):
+        path = write_temp_json(self, self.DATA)
+        self.assertIsNone(ProfilingIndex.load(path))
+        EncryptionData(path).get_client_data()
+        self.assertIsNone(ProfilingIndex.load(path))
+
+        EncryptionData(path, index_sidecar=True).get_client_data()
+        index = ProfilingIndex.load(path)
+        self.assertEqual(ProfilingIndex.build(path).entries, index.entries)
+        self.assertEqual({'A': {(1, 2): 2, (3, 4): 4}},
+                         {'A': index.decode_ciphersuite('server', 'fn',
+                                                        'TLS-RSA-WITH-A')})
+        index.close()
+
+        ed = EncryptionData(path)
+        self.assertSequenceEqual([[1, 3]], ed.get_client_data().profiling_results.tolist())
+
+    def test_ciphersuites_are_decoded_one_at_a_time(self):
+        index = ProfilingIndex.build(write_temp_json(self, self.DATA))
+        self.addCleanup(index.close)
+        ciphersuites = list(index.iter_ciphersuites('server', 'fn'))
+        self.assertEqual([('TLS-RSA-WITH-A', [((1, 2), 2), ((3, 4), 4)]),
+                          ('TLS-ECDHE-RSA-WITH-CAMELLIA-256-GCM-SHA384',
+                           [((3, 4), [8, 10]), ((1, 2), [6])])], ciphersuites)
+        # the byte pairs are decoded once for every ciphersuite
+        self.assertIs(ciphersuites[0][1][0][0], ciphersuites[1][1][1][0])
+
+    def test_sorted_views(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        bytes_sent, results = ed.get_sorted_data('server', 'sent')
+        self.assertIs(ed.get_server_data().profiling_results, results)
+        self.assertSequenceEqual([1, 3], bytes_sent.tolist())
+
+    def test_modified_file_invalidates_sidecar(self):
+        path = write_temp_json(self, self.DATA)
+        ProfilingIndex.build(path).save()
+        self.assertIsNotNone(ProfilingIndex.load(path))
+
+        write_json(path, {'client': {'fn': {'TLS-RSA-WITH-A': {'(5, 6)': 7}}},
+                          'server': self.DATA['server']})
+        self.assertIsNone(ProfilingIndex.load(path))
+        self.assertSequenceEqual(
+            [[7]], EncryptionData(path).get_client_data().profiling_results.tolist())
+
+
+class MergeEncryptionDataTestCase(ModelsBaseTestCase):
+    DATA = {
+        'client': {'fn': {'TLS-RSA-WITH-A': {'(2, 20)': 2, '(1, 10)': 1},
+                          'TLS-RSA-WITH-B': {'(2, 20)': 4, '(1, 10)': 3}}},
+        'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 10)': 5}}},
+    }
+
+    def test_new_ciphersuite(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        self.assertSequenceEqual([('client', 'fn')], ed.merge(
+            {'client': {'fn': {'TLS-RSA-WITH-C': {'(1, 10)': 5, '(2, 20)': 6}}}}))
+        client = ed.get_client_data()
+        self.assertSequenceEqual(['A', 'B', 'C'], client.labels.tolist())
+        self.assertSequenceEqual([[2, 1], [4, 3], [6, 5]],
+                                 client.profiling_results.tolist())
+        self.assertEqual(numpy.int64, client.profiling_results.dtype)
+
+    def test_new_byte_pairs_and_replaced_cells(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        self.assertSequenceEqual([[1, 2], [3, 4]],
+                                 [row[1:] for row in
+                                  ed.get_client_xlxs_bytes_sent_result()[1:]])
+        ed.merge({'client': {'fn': {'TLS-RSA-WITH-A': {'(0, 30)': 0, '(1, 10)': 10}}}})
+        numpy.testing.assert_array_equal(
+            [[0, 1, 2], [0, 10, 2], [numpy.nan, 3, 4]],
+            [row[1:] for row in ed.get_client_xlxs_bytes_sent_result()])
+        numpy.testing.assert_array_equal(
+            [[10, 20, 30], [10, 2, 0], [3, 4, numpy.nan]],
+            [row[1:] for row in ed.get_client_xlxs_bytes_received_result()])
+
+    def test_byte_order_is_extended(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        ed.get_client_xlxs_bytes_sent_result()
+        ed.merge({'client': {'fn': {'TLS-RSA-WITH-A': {'(2, 5)': 0, '(0, 1)': 0,
+                                                       '(9, 0)': 0, '(2, 30)': 0}}}})
+        self.assertSequenceEqual([0, 1, 2, 2, 2, 9],
+                                 ed.get_client_xlxs_bytes_sent_result()[0][1:])
+        self.assertSequenceEqual(
+            numpy.lexsort((ed.get_client_data().bytes_received,
+                           ed.get_client_data().bytes_sent)).tolist(),
+            ed._get_byte_order('client', 'sent').tolist())
+
+    def test_new_function_and_samples(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        ed.merge({'client': {'fn2': {'TLS-RSA-WITH-A': {'(1, 10)': [1, 3]}}},
+                  'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 10)': [7, 9, 11]}}}})
+        self.assertSequenceEqual(['fn', 'fn2'], ed.get_functions('client'))
+        self.assertSequenceEqual([[2.0]], ed.get_client_data('fn2')
+                                            .profiling_results.tolist())
+        self.assertSequenceEqual([[9.0]], ed.get_server_data().profiling_results.tolist())
+        self.assertEqual((1, 1, 3), ed.get_server_data().samples.shape)
+
+    def test_merged_arrays_are_new_arrays(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        before = ed.get_client_data()
+        ed.merge({'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 10)': 100}}}})
+        self.assertSequenceEqual([[2, 1], [4, 3]], before.profiling_results.tolist())
+        self.assertFalse(ed.get_client_data().profiling_results.flags.writeable)
+
+    def test_merge_file_fragment(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        ed.merge(write_temp_json(
+            self, {'server': {'fn': {'TLS-RSA-WITH-B': {'(1, 10)': 6}}}}))
+        self.assertSequenceEqual([['A', 5], ['B', 6]], list(ed.server()))
+
+    def test_merge_malformed_fragment(self):
+        ed = EncryptionData(write_temp_json(self, self.DATA))
+        with self.assertRaises(ValueError):
+            ed.merge({'client': {'fn': ['TLS-RSA-WITH-A']}})
+        with self.assertRaises(ValueError):
+            ed.merge(write_temp_json(self, [1]))
+        self.assertSequenceEqual([['A', 5]], list(ed.server()))
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.synthetic import write_profiling_json_file
+from data.models import EncryptionData
+from data.pipeline import iter_pipelined_rows
+from edat import run, run_pipelined
+from tests.helpers import write_json
+
+class CountingExecutor(ThreadPoolExecutor):
+
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+class PipelineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_json(self, **kwargs):
+        path = os.path.join(self.directory, 'results.json')
+        write_profiling_json_file(path, 12, 40, **kwargs)
+        return path
+
+    def assert_same_rows(self, expected, obtained):
+        expected, obtained = list(expected), list(obtained)
+        self.assertEqual([row[0] for row in expected], [row[0] for row in obtained])
+        for expected_row, row in zip(expected, obtained):
+            numpy.testing.assert_array_equal(expected_row[1], row[1])
+
+    def test_same_rows_as_sequential(self):
+        path = self.write_json()
+        for axis, bytes_label in (('sent', 'bytes sent'), ('received', 'bytes received')):
+            with CountingExecutor() as executor:
+                rows = iter_pipelined_rows(path, 'server', axis, bytes_label,
+                                           chunk_cells=100, executor=executor)
+                self.assert_same_rows(EncryptionData(path).iter_xlxs_result_rows('server', axis),
+                                      rows)
+                self.assertEqual(6, executor.submitted)
+
+    def test_samples(self):
+        path = self.write_json(n_samples=3, n_functions=2)
+        ed = EncryptionData(path, statistic='median')
+        with ThreadPoolExecutor(1) as executor:
+            rows = iter_pipelined_rows(path, 'client', 'sent', 'bytes sent',
+                                       function='mbedtls_ssl_read', statistic='median',
+                                       chunk_cells=100, executor=executor)
+            self.assert_same_rows(ed.iter_xlxs_result_rows('client', 'sent',
+                                                           function='mbedtls_ssl_read'),
+                                  rows)
+
+    def test_value_kinds_mixed_across_chunks(self):
+        pairs = ['(1, 2)', '(3, 2)']
+        for last, statistic in (({'(1, 2)': 1.5, '(3, 2)': 2}, 'mean'),
+                                ({'(1, 2)': [1, 3], '(3, 2)': 2}, 'count')):
+            data = {'client': {'fn': {'TLS-RSA-WITH-A': dict.fromkeys(pairs, 4),
+                                      'TLS-RSA-WITH-B': dict.fromkeys(pairs, 5),
+                                      'TLS-RSA-WITH-C': last}},
+                    'server': {}}
+            path = os.path.join(self.directory, 'mixed.json')
+            write_json(path, data)
+
+            expected = list(EncryptionData(path, statistic=statistic)
+                            .iter_xlxs_result_rows('client', 'sent'))
+            with ThreadPoolExecutor(1) as executor:
+                # a chunk per ciphersuite
+                rows = list(iter_pipelined_rows(path, 'client', 'sent', 'bytes sent',
+                                                statistic=statistic, chunk_cells=2,
+                                                executor=executor))
+            self.assert_same_rows(expected, rows)
+            self.assertEqual([row[1].dtype for row in expected],
+                             [row[1].dtype for row in rows])
+
+    def test_function_without_ciphersuites(self):
+        path = os.path.join(self.directory, 'empty.json')
+        write_json(path, {'client': {'fn': {}}, 'server': {}})
+        with CountingExecutor() as executor:
+            rows = list(iter_pipelined_rows(path, 'client', 'sent', 'bytes sent',
+                                            executor=executor))
+            self.assertEqual(0, executor.submitted)
+        self.assert_same_rows(EncryptionData(path).iter_xlxs_result_rows('client', 'sent'),
+                              rows)
+
+    def test_bounded_in_flight_chunks(self):
+        path = self.write_json()
+        with CountingExecutor() as executor:
+            rows = iter_pipelined_rows(path, 'client', 'sent', 'bytes sent', jobs=1,
+                                       chunk_cells=40, executor=executor)
+            next(rows)
+            next(rows)
+            self.assertEqual(2, executor.submitted)
+            rows.close()
+
+    def test_run_pipelined(self):
+        path = self.write_json()
+        sequential = os.path.join(self.directory, 'sequential.csv')
+        pipelined = os.path.join(self.directory, 'pipelined.csv')
+        run(path, sequential, False, True, False, True, fmt='csv')
+        run_pipelined(path, pipelined, False, False, fmt='csv', jobs=1)
+        with open(sequential) as expected, open(pipelined) as obtained:
+            self.assertEqual(expected.read(), obtained.read())
@@ -0,0 +1,103 @@
+import unittest
+import numpy
+from data.models import EncryptionData
+from data.reduce import (Downsampling, FixedBinning, LogBinning, bin_results,
+                         fixed_bin_edges, log_bin_edges, lttb_indices)
+from tests.helpers import write_temp_json
+
+class BinningTestCase(unittest.TestCase):
+
+    def test_log_bin_edges(self):
+        bytes_array = numpy.arange(0, 1025)
+        edges = log_bin_edges(bytes_array, 10)
+        self.assertEqual(0, edges[0])
+        self.assertTrue(numpy.all(numpy.diff(edges) > 0))
+        self.assertLessEqual(len(edges), 10)
+
+        aligned = log_bin_edges(bytes_array, 10, align=16)
+        self.assertTrue(numpy.all(aligned % 16 == 0))
+        self.assertLess(len(aligned), len(edges))
+
+    def test_fixed_bin_edges(self):
+        edges = fixed_bin_edges(numpy.array([5, 20, 47]), 16)
+        self.assertSequenceEqual([0, 16, 32], edges.tolist())
+
+    def test_bin_results(self):
+        bytes_array = numpy.array([0, 8, 16, 24, 40])
+        results = numpy.array([[1, 3, 5, numpy.nan, 9],
+                               [2, 2, 4, 8, 6]])
+        binned = bin_results(bytes_array, results, numpy.array([0, 16, 32, 48]))
+        # the bin starting at 48 is empty, so left out
+        self.assertSequenceEqual([0, 16, 40], binned.lower.tolist())
+        self.assertSequenceEqual([8, 24, 40], binned.upper.tolist())
+        self.assertSequenceEqual([2, 2, 1], binned.counts.tolist())
+        self.assertSequenceEqual([[1, 5, 9], [2, 4, 6]], binned.min.tolist())
+        self.assertSequenceEqual([[2, 5, 9], [2, 6, 6]], binned.mean.tolist())
+        self.assertSequenceEqual([[3, 5, 9], [2, 8, 6]], binned.max.tolist())
+
+    def test_rows(self):
+        rows = list(FixedBinning(16).rows('bytes sent', numpy.array([0, 8, 16]),
+                                          ['A'], numpy.array([[1, 3, 5]])))
+        self.assertEqual(['bytes sent', 'A min', 'A mean', 'A max'],
+                         [label for label, _ in rows])
+        self.assertSequenceEqual([0, 16], rows[0][1].tolist())
+        self.assertSequenceEqual([2, 5], rows[2][1].tolist())
+
+
+class DownsamplingTestCase(unittest.TestCase):
+
+    def test_small_results_are_kept(self):
+        self.assertSequenceEqual([0, 1, 2],
+                                 lttb_indices(numpy.arange(3),
+                                              numpy.zeros((1, 3)), 5).tolist())
+
+    def test_keeps_steps(self):
+        # block cipher like steps of 16 bytes
+        bytes_array = numpy.arange(0, 256)
+        results = numpy.vstack((100 + bytes_array // 16 * 16,
+                                200 + bytes_array // 16 * 32))
+        columns = lttb_indices(bytes_array, results, 40)
+        self.assertEqual(40, len(columns))
+        self.assertEqual(0, columns[0])
+        self.assertEqual(255, columns[-1])
+        self.assertTrue(numpy.all(numpy.diff(columns) > 0))
+        # every step is kept, on either of its sides
+        steps = numpy.unique(bytes_array[columns] // 16)
+        self.assertSequenceEqual(list(range(16)), steps.tolist())
+
+    def test_rows(self):
+        results = numpy.array([[0, 1, 9, 1, 0], [0, 2, 18, 2, numpy.nan]])
+        rows = list(Downsampling(3).rows('bytes received', numpy.arange(5),
+                                         ['A', 'B'], results))
+        self.assertSequenceEqual([0, 2, 4], rows[0][1].tolist())
+        self.assertSequenceEqual([0, 9, 0], rows[1][1].tolist())
+
+
+class EncryptionDataReductionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        data = {'client': {'fn': {
+            'TLS-RSA-WITH-A': {'({}, 0)'.format(size): size for size in range(64)},
+            'TLS-PSK-WITH-B': {'({}, 0)'.format(size): 2 * size for size in range(64)},
+        }}, 'server': {}}
+        self.ed = EncryptionData(write_temp_json(self, data))
+
+    def test_binned_rows(self):
+        rows = list(self.ed.iter_xlxs_result_rows('client', 'sent',
+                                                  reduction=FixedBinning(32)))
+        self.assertEqual(7, len(rows))
+        self.assertSequenceEqual([0, 32], rows[0][1].tolist())
+        self.assertSequenceEqual([15.5, 47.5], rows[2][1].tolist())
+        self.assertSequenceEqual([62, 126], rows[6][1].tolist())
+
+    def test_log_binned_rows(self):
+        rows = list(self.ed.iter_xlxs_result_rows('client', 'sent',
+                                                  reduction=LogBinning(4, 16)))
+        self.assertTrue(numpy.all(rows[0][1] % 16 == 0))
+
+    def test_downsampled_rows(self):
+        rows = list(self.ed.iter_xlxs_result_rows('client', 'sent',
+                                                  reduction=Downsampling(8)))
+        self.assertEqual(3, len(rows))
+        self.assertEqual(8, len(rows[0][1]))
+        self.assertSequenceEqual((2 * rows[1][1]).tolist(), rows[2][1].tolist())
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from data.models import EncryptionData
+from data.server import AnalysisServer, DatasetCache, load_sections
+from tests.helpers import write_json, write_temp_json
+
+class DatasetCacheTestCase(unittest.TestCase):
+    CURR_DIR = os.path.dirname(os.path.abspath(__file__))
+    JSON_PATH = os.path.join(CURR_DIR, 'res', 'pencres_01.json')
+
+    def dataset(self):
+        ed = EncryptionData(self.JSON_PATH)
+        ed.get_client_data()
+        return ed
+
+    def test_least_recently_used_is_dropped(self):
+        ed = self.dataset()
+        cache = DatasetCache(max_bytes=2 * ed.nbytes)
+        cache.put('a', {}, ed)
+        cache.put('b', {}, self.dataset())
+        self.assertIs(ed, cache.get('a', {}))
+        cache.put('c', {}, self.dataset())
+
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get('b', {}))
+        self.assertIs(ed, cache.get('a', {}))
+        self.assertEqual(2, cache.info()['hits'])
+
+    def test_most_recent_is_kept(self):
+        cache = DatasetCache(max_bytes=1)
+        ed = self.dataset()
+        cache.put('a', {}, ed)
+        self.assertIs(ed, cache.get('a', {}))
+
+    def test_pinned_is_kept(self):
+        cache = DatasetCache(max_bytes=1)
+        ed = self.dataset()
+        cache.put('a', {}, ed)
+        with cache.pinned('a'):
+            cache.put('b', {}, self.dataset())
+            self.assertIs(ed, cache.get('a', {}))
+            cache.put('c', {}, self.dataset())
+            self.assertEqual(2, len(cache))
+        cache.trim()
+        self.assertEqual(1, len(cache))
+        self.assertIsNone(cache.get('a', {}))
+
+    def test_modified_file_is_a_miss(self):
+        cache = DatasetCache()
+        cache.put('a', {'size': 1, 'mtime_ns': 1}, self.dataset())
+        self.assertIsNone(cache.get('a', {'size': 1, 'mtime_ns': 2}))
+        self.assertEqual(0, len(cache))
+
+
+class AnalysisServerTestCase(unittest.TestCase):
+    DATA = {
+        'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 1, '(3, 2)': 3, '(1, 4)': 5},
+                          'TLS-PSK-WITH-B': {'(1, 2)': 2, '(3, 2)': 4, '(1, 4)': 6}}},
+        'server': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 7}}},
+    }
+
+    def setUp(self):
+        self.path = write_temp_json(self, self.DATA)
+        self.server = AnalysisServer(executor=ThreadPoolExecutor(2))
+        self.addCleanup(self.server.close)
+
+    def request(self, target):
+        status, content_type, body = asyncio.run(self.server.handle(target))
+        if content_type == 'application/json':
+            body = json.loads(body)
+        return status, body
+
+    def test_result(self):
+        status, body = self.request('/result?path={}&entity=client&axis=received'
+                                    .format(self.path))
+        self.assertEqual(200, status)
+        self.assertEqual([2, 2, 4], body['bytes'])
+        self.assertEqual({'label': 'B', 'values': [2, 4, 6]}, body['rows'][1])
+
+    def test_grid_and_slice(self):
+        status, body = self.request('/grid?path={}&sent=2:&ciphersuites=A'
+                                    .format(self.path))
+        self.assertEqual(200, status)
+        self.assertEqual({'labels': ['A'], 'bytes_sent': [3], 'bytes_received': [2],
+                          'results': [[3]]}, body)
+
+        status, body = self.request('/slice?path={}&sent=1'.format(self.path))
+        self.assertEqual(('received', [2, 4], [[1, 5], [2, 6]]),
+                         (body['axis'], body['bytes'], body['results']))
+
+    def test_export(self):
+        status, content_type, body = asyncio.run(
+                    self.server.handle('/export?path={}&format=npz'.format(self.path)))
+        self.assertEqual(200, status)
+        self.assertTrue(body.startswith(b'PK'))
+
+    def test_errors(self):
+        self.assertEqual(404, self.request('/result?path=/no/such/file.json')[0])
+        self.assertEqual(404, self.request('/unknown')[0])
+        self.assertEqual(400, self.request('/result')[0])
+        self.assertEqual(404, self.request('/slice?path={}&sent=8'.format(self.path))[0])
+        self.assertEqual(400, self.request('/slice?path={}&sent=x'.format(self.path))[0])
+
+    def test_dataset_is_parsed_once(self):
+        async def requests():
+            return await asyncio.gather(*[self.server.get_dataset(self.path)
+                                          for _ in range(4)])
+
+        with mock.patch('data.server.load_sections', wraps=load_sections) as load:
+            datasets = asyncio.run(requests())
+        self.assertTrue(all(ed is datasets[0] for ed in datasets))
+        self.assertEqual(1, load.call_count)
+
+    def test_modified_file_is_parsed_again(self):
+        self.request('/functions?path={}'.format(self.path))
+        write_json(self.path, {'client': {'other': {'TLS-RSA-WITH-A': {'(1, 2)': 1}}},
+                               'server': self.DATA['server']})
+        os.utime(self.path, ns=(0, 0))
+        status, body = self.request('/functions?path={}'.format(self.path))
+        self.assertEqual(['other'], body['client'])
+
+    def test_http(self):
+        async def get(target):
+            server = await self.server.start(port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write('GET {} HTTP/1.1\r\nHost: localhost\r\n\r\n'
+                             .format(target).encode())
+                response = await reader.read()
+                writer.close()
+            return response
+
+        response = asyncio.run(get('/functions?path={}'.format(self.path)))
+        headers, body = response.split(b'\r\n\r\n', 1)
+        self.assertTrue(headers.startswith(b'HTTP/1.1 200 OK'))
+        self.assertEqual({'client': ['fn'], 'server': ['fn']}, json.loads(body))
@@ -0,0 +1,55 @@
+import unittest
+import numpy
+from data.stats import SampleStatistics, aggregate_samples
+
+class SampleStatisticsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.samples = rng.normal(1000, 50, size=(3, 4, 9))
+        # ragged cells, padded with NaN
+        self.samples[0, 0, 3:] = numpy.nan
+        self.samples[2, 1, 1:] = numpy.nan
+        self.statistics = SampleStatistics(self.samples)
+
+    def assert_close(self, expected, obtained):
+        self.assertTrue(numpy.allclose(expected, obtained, equal_nan=True))
+
+    def test_matches_numpy_nan_functions(self):
+        self.assert_close(numpy.nanmean(self.samples, axis=-1),
+                          self.statistics.mean())
+        self.assert_close(numpy.nanmedian(self.samples, axis=-1),
+                          self.statistics.median())
+        self.assert_close(numpy.nanstd(self.samples, axis=-1),
+                          self.statistics.std())
+        self.assert_close(numpy.nanmin(self.samples, axis=-1),
+                          self.statistics.min())
+        self.assert_close(numpy.nanmax(self.samples, axis=-1),
+                          self.statistics.max())
+        self.assert_close(numpy.nanpercentile(self.samples, 95, axis=-1),
+                          self.statistics.get('p95'))
+
+    def test_count(self):
+        counts = self.statistics.count()
+        self.assertEqual(3, counts[0, 0])
+        self.assertEqual(1, counts[2, 1])
+        self.assertEqual(9, counts[1, 1])
+
+    def test_trimmed_mean(self):
+        samples = numpy.array([[[1, 2, 3, 4, 100, numpy.nan],
+                                [5, 1, 2, 3, 4, 1000]]], dtype=numpy.float64)
+        # 20% of 5 samples -> 1 dropped at each end, 20% of 6 -> 1 as well
+        self.assertSequenceEqual([[3, 3.5]],
+                                 aggregate_samples(samples, 'trim20').tolist())
+        self.assert_close([[22, 1015 / 6.0]], aggregate_samples(samples, 'trim0'))
+
+    def test_unpadded_samples(self):
+        samples = numpy.arange(24, dtype=numpy.float64).reshape((2, 3, 4))
+        statistics = SampleStatistics(samples)
+        self.assert_close(samples.mean(axis=-1), statistics.mean())
+        self.assert_close(numpy.median(samples, axis=-1), statistics.median())
+
+    def test_unknown_statistic(self):
+        for statistic in ('avg', 'p', 'mean5', 'trim50'):
+            with self.assertRaises(ValueError):
+                self.statistics.get(statistic)
@@ -0,0 +1,234 @@
+import csv
+import os
+import tempfile
+import unittest
+import zipfile
+import numpy
+from collections import OrderedDict
+from xml.etree import ElementTree
+from pathlib import Path
+from utils.streaming import iter_profiling_json_file
+from utils.streaming import index_profiling_json_file, iter_function_ciphersuites
+from utils.utils import convert_to_literal, BytePairKeyDecoder
+from utils.utils import write_excel_to_file, write_excel_sheets_to_file
+from utils.utils import parse_json_bytes_to_dict
+from utils import exporters
+
+class StreamingReaderTestCase(unittest.TestCase):
+    TEST_JSON_PATH = os.path.join(Path('./tests/res/'), 'pencres_02.json')
+
+    def test_events_are_independent_of_chunk_size(self):
+        expected = list(iter_profiling_json_file(self.TEST_JSON_PATH,
+                                                 convert_to_literal))
+        # tiny chunks force every token to be split across reads
+        for chunk_size in (1, 2, 7):
+            obtained = list(iter_profiling_json_file(self.TEST_JSON_PATH,
+                                                     convert_to_literal,
+                                                     chunk_size=chunk_size))
+            self.assertSequenceEqual(expected, obtained)
+
+    def test_select_and_list_functions(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as json_file:
+            json_file.write('{"client": {"f1": {"A": {"(1, 2)": [1, 2], "a}": 3},'
+                            ' "B": {"(1, 2)": 4}}, "f2": {"A": {"(1, 2)": 5}}},'
+                            ' "server": {"f3": {"A": {"(1, 2)": 6}}}}')
+        self.addCleanup(os.remove, path)
+
+        for chunk_size in (1, 5, 1 << 16):
+            events = list(iter_profiling_json_file(
+                            path, convert_to_literal, chunk_size=chunk_size,
+                            select=lambda entity, function: function != 'f1'))
+            self.assertSequenceEqual(
+                [('client', 'f2', 'A', [((1, 2), 5)]),
+                 ('server', 'f3', 'A', [((1, 2), 6)])], events)
+            self.assertEqual({'client': ['f1', 'f2'], 'server': ['f3']},
+                             {entity: list(functions) for entity, functions
+                              in index_profiling_json_file(
+                                        path, chunk_size=chunk_size).items()})
+
+    def test_index_byte_ranges(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'wb') as json_file:
+            json_file.write('{"client": {\r\n "fé": {"A": {"(1, 2)": 3}},\r\n'
+                            ' "f2": {"B": {"(1, 2)": [4, 5]}, "C": {"(1, 2)": 6}}},'
+                            ' "server": {"ß": {"A": {"(3, 4)": 7}}}}'.encode('utf-8'))
+        self.addCleanup(os.remove, path)
+        with open(path, 'rb') as json_file:
+            contents = json_file.read()
+
+        for chunk_size in (1, 3, 1 << 16):
+            index = index_profiling_json_file(path, chunk_size=chunk_size)
+            self.assertEqual(['client', 'server'], list(index))
+            self.assertEqual(['fé', 'f2'], list(index['client']))
+
+            start, end, ciphersuites = index['client']['f2']
+            self.assertEqual({'B': {(1, 2): [4, 5]}, 'C': {(1, 2): 6}},
+                             parse_json_bytes_to_dict(contents[start:end]))
+            self.assertEqual(['B', 'C'], list(ciphersuites))
+            self.assertEqual({(1, 2): 6},
+                             parse_json_bytes_to_dict(
+                                        contents[slice(*ciphersuites['C'])]))
+            self.assertSequenceEqual(
+                [('B', [((1, 2), [4, 5])]), ('C', [((1, 2), 6)])],
+                list(iter_function_ciphersuites(path, start, convert_to_literal,
+                                                chunk_size=chunk_size)))
+
+            start, end, _ = index['server']['ß']
+            self.assertEqual({'A': {(3, 4): 7}},
+                             parse_json_bytes_to_dict(contents[start:end]))
+
+    def test_events_content(self):
+        events = list(iter_profiling_json_file(self.TEST_JSON_PATH,
+                                               convert_to_literal))
+        self.assertEqual(4, len(events))
+        entity, function, ciphersuite, byte_pairs = events[1]
+        self.assertEqual('client', entity)
+        self.assertEqual('mbedtls_ssl_write', function)
+        self.assertEqual('TLS-ECDHE-RSA-WITH-CAMELLIA-256-GCM-SHA384', ciphersuite)
+        self.assertSequenceEqual([((1, 300), 3), ((0, 100), 1), ((901, 200), 2)],
+                                 byte_pairs)
+
+
+class BytePairKeyDecoderTestCase(unittest.TestCase):
+
+    def test_decodes_byte_pairs(self):
+        decoder = BytePairKeyDecoder()
+        self.assertEqual((0, 100), decoder('(0, 100)'))
+        self.assertEqual((901, 200), decoder('( 901,200 )'))
+
+    def test_keys_are_interned(self):
+        decoder = BytePairKeyDecoder()
+        self.assertIs(decoder('(1, 300)'), decoder('(1, 300)'))
+
+    def test_falls_back_to_literal_eval(self):
+        decoder = BytePairKeyDecoder()
+        self.assertEqual((1.5, 2), decoder('(1.5, 2)'))
+        self.assertEqual('client', decoder('client'))
+
+
+def read_xlsx_cells(path, sheet=1):
+    """
+    Return the cells of a worksheet as a list of rows of strings.
+    """
+    ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    with zipfile.ZipFile(path) as xlsx_file:
+        root = ElementTree.fromstring(
+            xlsx_file.read('xl/worksheets/sheet{}.xml'.format(sheet)))
+    return [[''.join(cell.itertext()) for cell in row.findall('x:c', ns)]
+            for row in root.iter('{%s}row' % ns['x'])]
+
+
+class ExcelWriterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def test_rows_from_generator_with_arrays(self):
+        def rows():
+            yield ['bytes', numpy.array([1, 2, 3])]
+            yield ['alg_1', numpy.array([0.5, 1.5, 2.5])]
+            yield ['alg_2', 4, 5, 6]
+
+        write_excel_to_file(rows(), self.path)
+        self.assertSequenceEqual([['bytes', '1', '2', '3'],
+                                  ['alg_1', '0.5', '1.5', '2.5'],
+                                  ['alg_2', '4', '5', '6']],
+                                 read_xlsx_cells(self.path))
+
+
+class ExcelSheetNamesTestCase(unittest.TestCase):
+
+    def test_long_sheet_names(self):
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        name = 'client mbedtls_ssl_write bytes received'
+        write_excel_sheets_to_file([(name, [[1]]), (name, [[2]]), ('a/b', [[3]])],
+                                   path)
+        with zipfile.ZipFile(path) as xlsx_file:
+            workbook = xlsx_file.read('xl/workbook.xml').decode('utf-8')
+        self.assertIn('name="client mbedtls_ssl_write bytes"', workbook)
+        self.assertIn('name="client mbedtls_ssl_write byte~1"', workbook)
+        self.assertIn('name="a_b"', workbook)
+
+
+class ExportersTestCase(unittest.TestCase):
+    ROWS = [
+        ['bytes', numpy.array([1, 2, 3])],
+        ['alg_1', numpy.array([10, 20, 30])],
+        ['alg_2', numpy.array([0.5, 1.5, 2.5])],
+    ]
+
+    def temp_path(self, suffix):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_transpose_result(self):
+        self.assertSequenceEqual(
+            [['bytes', 'alg_1', 'alg_2'], [1, 10, 0.5], [2, 20, 1.5], [3, 30, 2.5]],
+            [[row[0]] + row[1].tolist() if len(row) == 2 else row
+             for row in exporters.transpose_result(self.ROWS)])
+
+    def test_wide_results_are_transposed(self):
+        rows = list(exporters.fit_spreadsheet_limits(iter(self.ROWS)))
+        self.assertEqual(len(self.ROWS), len(rows))
+        self.assertTrue(all(row is expected for row, expected in zip(rows, self.ROWS)))
+        transposed = list(exporters.fit_spreadsheet_limits(self.ROWS,
+                                                           max_columns=3))
+        self.assertEqual(4, len(transposed))
+
+        with self.assertRaises(ValueError):
+            exporters.fit_spreadsheet_limits(self.ROWS, max_columns=3,
+                                             max_rows=3)
+
+    def test_csv_export(self):
+        path = self.temp_path('.csv')
+        exporters.export_result(iter(self.ROWS), path, 'csv')
+        with open(path, newline='') as csv_file:
+            self.assertSequenceEqual([['bytes', '1', '2', '3'],
+                                      ['alg_1', '10', '20', '30'],
+                                      ['alg_2', '0.5', '1.5', '2.5']],
+                                     list(csv.reader(csv_file)))
+
+    def test_npz_export(self):
+        path = self.temp_path('.npz')
+        exporters.export_results([('client bytes sent', iter(self.ROWS))],
+                                 path, 'npz')
+        with numpy.load(path) as arrays:
+            self.assertEqual('bytes', arrays['client_bytes_sent_bytes_label'])
+            self.assertSequenceEqual([1, 2, 3],
+                                     arrays['client_bytes_sent_bytes'].tolist())
+            self.assertSequenceEqual(['alg_1', 'alg_2'],
+                                     arrays['client_bytes_sent_labels'].tolist())
+            self.assertEqual((2, 3), arrays['client_bytes_sent_values'].shape)
+
+    @unittest.skipIf(exporters.pyarrow is None, 'pyarrow is not installed')
+    def test_parquet_export(self):
+        path = self.temp_path('.parquet')
+        exporters.export_result(iter(self.ROWS), path, 'parquet')
+        table = exporters.pyarrow.parquet.read_table(path)
+        self.assertEqual(6, table.num_rows)
+        self.assertSequenceEqual([1, 2, 3, 1, 2, 3],
+                                 table.column('bytes').to_pylist())
+
+    def test_table_export(self):
+        columns = OrderedDict([('ciphersuite', numpy.array(['A', 'B'])),
+                               ('delta', numpy.array([1.5, -2.0]))])
+        path = self.temp_path('.csv')
+        exporters.export_tables([('diff', columns)], path, 'csv')
+        table_path = exporters._sheet_filename(path, 'diff')
+        self.addCleanup(os.remove, table_path)
+        with open(table_path, newline='') as csv_file:
+            self.assertSequenceEqual([['ciphersuite', 'delta'], ['A', '1.5'],
+                                      ['B', '-2.0']], list(csv.reader(csv_file)))
+
+        path = self.temp_path('.npz')
+        exporters.export_tables([('diff', columns)], path, 'npz')
+        with numpy.load(path) as arrays:
+            self.assertSequenceEqual([1.5, -2.0], arrays['diff_delta'].tolist())
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from data.watch import FragmentWatcher
+from edat import run_watch
+from tests.helpers import write_temp_json
+
+class FragmentWatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_fragment(self, name, contents):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as fragment_file:
+            fragment_file.write(contents)
+        return path
+
+    def test_fragments_are_reported_once_complete(self):
+        watcher = FragmentWatcher(self.directory)
+        first = self.write_fragment('b.json', '{"client": ')
+        self.write_fragment('notes.txt', '')
+        self.assertSequenceEqual([], watcher.poll())
+
+        self.write_fragment('b.json', '{"client": {}}')
+        second = self.write_fragment('a.json', '{}')
+        self.assertSequenceEqual([], watcher.poll())
+        self.assertSequenceEqual([second, first], watcher.poll())
+        self.assertSequenceEqual([], watcher.poll())
+
+    def test_changed_fragments_are_reported_again(self):
+        watcher = FragmentWatcher(self.directory)
+        path = self.write_fragment('a.json', '{}')
+        watcher.poll()
+        self.assertSequenceEqual([path], watcher.poll())
+
+        self.write_fragment('a.json', '{"server": {}}')
+        watcher.poll()
+        self.assertSequenceEqual([path], watcher.poll())
+
+
+class RunWatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_bad_fragments_are_skipped(self):
+        json_path = write_temp_json(self, {
+            'client': {'fn': {'TLS-RSA-WITH-A': {'(1, 2)': 1}}}, 'server': {}})
+        malformed = os.path.join(self.directory, 'a.json')
+        with open(malformed, 'w') as fragment_file:
+            fragment_file.write('[1]')
+        good = os.path.join(self.directory, 'c.json')
+        with open(good, 'w') as fragment_file:
+            fragment_file.write(
+                '{"client": {"fn": {"TLS-RSA-WITH-A": {"(3, 4)": 2}}}}')
+        # b.json is listed, then deleted before being merged
+        deleted = os.path.join(self.directory, 'b.json')
+
+        written = []
+        with mock.patch.object(FragmentWatcher, 'poll',
+                               side_effect=[[malformed, deleted, good], []]), \
+                mock.patch('sys.stderr') as stderr:
+            run_watch(json_path, self.directory,
+                      lambda ed: written.append(ed.get_client_data()
+                                                .profiling_results.tolist()),
+                      interval=0, max_polls=2)
+        self.assertSequenceEqual([[[1]], [[1, 2]]], written)
+        errors = ''.join(call[1][0] for call in stderr.write.mock_calls)
+        self.assertIn(malformed, errors)
+        self.assertIn(deleted, errors)
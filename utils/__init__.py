@@ -1,2 +1,9 @@
 from .utils import parse_json_file_to_dict
+from .utils import iter_profiling_json_file
+from .utils import index_profiling_json_file
+from .utils import iter_function_ciphersuites
+from .utils import parse_json_bytes_to_dict
 from .utils import write_excel_to_file
+from .utils import write_excel_sheets_to_file
+from .exporters import EXPORT_FORMATS, export_result, export_results
+from .exporters import export_table, export_tables
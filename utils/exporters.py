@@ -0,0 +1,253 @@
+"""
+Exporters of the results to the supported output formats.
+
+A result is an iterable of rows, the first one being the bytes row, as
+written by `write_excel_to_file`: [label, v1, v2, ...] lists or
+[label, values array] pairs. Several results are passed as "sheets", an
+iterable of (name, rows).
+
+Tables, such as diff reports, are passed as (name, columns) sheets instead,
+columns being an ordered {column name: values array}.
+"""
+import csv
+import itertools
+import os
+import re
+
+import numpy
+
+from .utils import write_excel_to_file, write_excel_sheets_to_file
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+EXPORT_FORMATS = ('xlsx', 'csv', 'npz', 'parquet')
+
+XLSX_MAX_COLUMNS = 16384
+XLSX_MAX_ROWS = 1048576
+
+
+def _split_row(row):
+    """
+    Return the (label, values array) of a row in any of the row formats.
+    """
+    if len(row) == 2 and isinstance(row[1], numpy.ndarray):
+        return row[0], row[1]
+    return row[0], numpy.asarray(row[1:])
+
+
+def _row_width(row):
+    return sum(len(elem) if isinstance(elem, numpy.ndarray) else 1
+               for elem in row)
+
+
+def _result_arrays(rows):
+    (bytes_label, bytes_array), *results = [_split_row(row) for row in rows]
+    if results:
+        labels, values = zip(*results)
+        values = numpy.vstack(values)
+    else:
+        labels, values = (), numpy.empty((0, len(bytes_array)))
+    return bytes_label, bytes_array, numpy.array(labels, dtype=str), values
+
+
+def transpose_result(rows):
+    """
+    Turn a result into its row oriented layout: one row per byte size, with
+    a column per ciphersuite, the header being [bytes label, labels...].
+    """
+    bytes_label, bytes_array, labels, values = _result_arrays(rows)
+
+    yield [bytes_label] + labels.tolist()
+    for byte, column in zip(bytes_array.tolist(), values.T):
+        yield [byte, column]
+
+
+def fit_spreadsheet_limits(rows, max_columns=XLSX_MAX_COLUMNS,
+                           max_rows=XLSX_MAX_ROWS):
+    """
+    Return the rows unchanged if they fit in a spreadsheet, or transposed if
+    the wide layout has too many columns and the transposed one fits.
+    Only wide results are held in memory to be transposed.
+    """
+    rows = iter(rows)
+    first_row = next(rows, None)
+    if first_row is None:
+        return []
+    if _row_width(first_row) <= max_columns:
+        # the rows are passed on as they come
+        return itertools.chain([first_row], rows)
+    rows = [first_row] + list(rows)
+    if _row_width(first_row) > max_rows or len(rows) > max_columns:
+        raise ValueError('Result of {} x {} cells does not fit in a spreadsheet '
+                         'in any layout'.format(len(rows), _row_width(rows[0])))
+    return transpose_result(rows)
+
+
+def _sheet_filename(filename, name):
+    base, ext = os.path.splitext(filename)
+    return '{}_{}{}'.format(base, re.sub(r'\W+', '_', name), ext)
+
+
+def write_csv_to_file(rows, filename):
+    """
+    Write the rows as they come, without holding the result in memory.
+    """
+    with open(filename, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        for row in rows:
+            label, values = _split_row(row)
+            writer.writerow([label] + values.tolist())
+
+
+def _table_arrays(name, columns):
+    prefix = re.sub(r'\W+', '_', name) + '_' if name else ''
+    return {prefix + re.sub(r'\W+', '_', column): values
+            for column, values in columns.items()}
+
+
+def write_npz_sheets_to_file(sheets, filename, tables=()):
+    """
+    Store each result as `<name>_bytes_label`, `<name>_bytes`,
+    `<name>_labels` and `<name>_values` (ciphersuites x bytes) arrays, and
+    each table as `<name>_<column>` arrays.
+    """
+    arrays = {}
+    for name, columns in tables:
+        arrays.update(_table_arrays(name, columns))
+    for name, rows in sheets:
+        prefix = re.sub(r'\W+', '_', name) + '_' if name else ''
+        bytes_label, bytes_array, labels, values = _result_arrays(rows)
+        arrays[prefix + 'bytes_label'] = numpy.array(bytes_label, dtype=str)
+        arrays[prefix + 'bytes'] = bytes_array
+        arrays[prefix + 'labels'] = labels
+        arrays[prefix + 'values'] = values
+    with open(filename, 'wb') as npz_file:
+        numpy.savez(npz_file, **arrays)
+
+
+def write_parquet_sheets_to_file(sheets, filename):
+    """
+    Store the results in long format, with one (result, ciphersuite, bytes,
+    value) record per cell. Requires pyarrow.
+    """
+    if pyarrow is None:
+        raise ImportError('pyarrow is required to export to Parquet')
+
+    results = [(name, _result_arrays(rows)) for name, rows in sheets]
+    # the tables must share a schema to be concatenated
+    value_dtype = numpy.result_type(*[values for _, (_, _, _, values) in results]
+                                    or [numpy.int64])
+
+    tables = []
+    for name, (_, bytes_array, labels, values) in results:
+        values = values.astype(value_dtype, copy=False)
+        n_labels, n_bytes = values.shape
+        tables.append(pyarrow.table({
+            'result': pyarrow.array([name or ''] * values.size).dictionary_encode(),
+            'ciphersuite': pyarrow.DictionaryArray.from_arrays(
+                                numpy.repeat(numpy.arange(n_labels), n_bytes),
+                                labels.tolist()),
+            'bytes': numpy.tile(bytes_array, n_labels),
+            'value': values.ravel(),
+        }))
+    pyarrow.parquet.write_table(pyarrow.concat_tables(tables), filename)
+
+
+def export_result(rows, filename, fmt='xlsx'):
+    if fmt == 'xlsx':
+        write_excel_to_file(fit_spreadsheet_limits(rows), filename)
+    elif fmt == 'csv':
+        write_csv_to_file(fit_spreadsheet_limits(rows), filename)
+    else:
+        export_results([('', rows)], filename, fmt)
+
+
+def export_results(sheets, filename, fmt='xlsx', tables=()):
+    """
+    Export several results into `filename`, followed by the (name, columns)
+    `tables`. CSV files have no sheets, so each result is written to its
+    own file, named after `filename`, and so are the tables in Parquet.
+    """
+    if fmt == 'xlsx':
+        sheets = ((name, fit_spreadsheet_limits(rows)) for name, rows in sheets)
+        write_excel_sheets_to_file(itertools.chain(
+                            sheets, ((name, _table_rows(columns))
+                                     for name, columns in tables)), filename)
+    elif fmt == 'csv':
+        for name, rows in sheets:
+            write_csv_to_file(fit_spreadsheet_limits(rows),
+                              _sheet_filename(filename, name))
+        export_tables(tables, filename, fmt)
+    elif fmt == 'npz':
+        write_npz_sheets_to_file(sheets, filename, tables)
+    elif fmt == 'parquet':
+        write_parquet_sheets_to_file(sheets, filename)
+        for name, columns in tables:
+            export_table(columns, _sheet_filename(filename, name), fmt)
+    else:
+        raise ValueError('Unknown export format: {}'.format(fmt))
+
+
+def _table_rows(columns):
+    yield list(columns)
+    yield from zip(*(values.tolist() for values in columns.values()))
+
+
+def _table_to_parquet(name, columns):
+    size = len(next(iter(columns.values()), ()))
+    table = {'result': pyarrow.array([name] * size).dictionary_encode()}
+    table.update(columns)
+    return pyarrow.table(table)
+
+
+def export_table(columns, filename, fmt='xlsx'):
+    """
+    Export a single table into `filename`.
+    """
+    if fmt == 'xlsx':
+        write_excel_to_file(_table_rows(columns), filename)
+    elif fmt == 'csv':
+        with open(filename, 'w', newline='') as csv_file:
+            csv.writer(csv_file).writerows(_table_rows(columns))
+    elif fmt == 'npz':
+        with open(filename, 'wb') as npz_file:
+            numpy.savez(npz_file, **_table_arrays('', columns))
+    elif fmt == 'parquet':
+        if pyarrow is None:
+            raise ImportError('pyarrow is required to export to Parquet')
+        pyarrow.parquet.write_table(pyarrow.table(dict(columns)), filename)
+    else:
+        raise ValueError('Unknown export format: {}'.format(fmt))
+
+
+def export_tables(sheets, filename, fmt='xlsx'):
+    """
+    Export several tables into `filename`: as worksheets, one CSV file each,
+    `<name>_<column>` npz arrays or a single Parquet table with a `result`
+    column.
+    """
+    if fmt == 'xlsx':
+        write_excel_sheets_to_file(((name, _table_rows(columns))
+                                    for name, columns in sheets), filename)
+    elif fmt == 'csv':
+        for name, columns in sheets:
+            export_table(columns, _sheet_filename(filename, name), fmt)
+    elif fmt == 'npz':
+        arrays = {}
+        for name, columns in sheets:
+            arrays.update(_table_arrays(name, columns))
+        with open(filename, 'wb') as npz_file:
+            numpy.savez(npz_file, **arrays)
+    elif fmt == 'parquet':
+        if pyarrow is None:
+            raise ImportError('pyarrow is required to export to Parquet')
+        pyarrow.parquet.write_table(pyarrow.concat_tables(
+                                        [_table_to_parquet(name, columns)
+                                         for name, columns in sheets]), filename)
+    else:
+        raise ValueError('Unknown export format: {}'.format(fmt))
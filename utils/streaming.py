@@ -0,0 +1,243 @@
+"""
+Incremental reader for the profiling JSON files.
+
+The profiling dumps have a fixed layout:
+
+    entity (client/server) -> function -> ciphersuite -> "(sent, received)" -> value
+
+Instead of loading the whole document in memory, the outer levels are
+tokenized from a chunked buffer and only one ciphersuite object is decoded
+at a time, so the memory used by the reader is bounded by the size of a
+single ciphersuite entry.
+
+Files are read as latin-1, so that offsets in the text are offsets in
+bytes, which allows indexing the sections of a file and seeking to them
+later. Names are converted back from UTF-8 when returned.
+"""
+import io
+import json
+import re
+
+from collections import OrderedDict
+from json.decoder import scanstring
+
+
+CHUNK_SIZE = 1 << 16
+ENCODING = 'latin-1'
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# an object without nested objects, like the byte pairs of a ciphersuite
+FLAT_OBJECT = re.compile(r'\{[^{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}"]*)*\}')
+
+
+class _BufferedJSONReader(object):
+    """
+    Minimal pull tokenizer over a text file, reading it in chunks.
+    """
+
+    def __init__(self, json_file, chunk_size=CHUNK_SIZE, offset=0):
+        self._file = json_file
+        self._chunk_size = chunk_size
+        self._buf = ''
+        self._pos = 0
+        # file offset of the start of the buffer
+        self._offset = offset
+        self._eof = False
+
+    def _fill(self):
+        """
+        Read more data, dropping what was already consumed. The read size
+        grows with the pending data, so values spanning many chunks are
+        re-decoded a logarithmic number of times only.
+        """
+        if self._eof:
+            return False
+        pending = self._buf[self._pos:]
+        chunk = self._file.read(max(self._chunk_size, len(pending)))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = pending + chunk
+        self._offset += self._pos
+        self._pos = 0
+        return True
+
+    def _error(self, msg):
+        return ValueError('{} (offset {})'.format(msg, self.tell()))
+
+    def tell(self):
+        """
+        File offset of the current position.
+        """
+        return self._offset + self._pos
+
+    def peek(self):
+        """
+        Skip whitespace and return the next significant character without
+        consuming it.
+        """
+        while True:
+            self._pos = WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise self._error('Unexpected end of JSON data')
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self._error('Expected {!r}'.format(char))
+        self._pos += 1
+
+    def read_string(self):
+        self.expect('"')
+        while True:
+            try:
+                value, self._pos = scanstring(self._buf, self._pos)
+                return value
+            except ValueError:
+                if not self._fill():
+                    raise
+
+    def read_value(self, decoder):
+        """
+        Decode one complete JSON value using `decoder`.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def skip_value(self, decoder):
+        """
+        Skip one complete JSON value. Objects without nested objects are
+        matched with a regular expression, without building any Python
+        objects, other values are decoded with `decoder`.
+        """
+        if self.peek() != '{':
+            self.read_value(decoder)
+            return
+        while True:
+            end = self._buf.find('}', self._pos)
+            if end != -1:
+                break
+            if not self._fill():
+                raise self._error('Unexpected end of JSON data')
+
+        match = None
+        if self._buf.find('{', self._pos + 1, end) == -1:
+            match = FLAT_OBJECT.match(self._buf, self._pos)
+        if match is None:
+            # nested objects, or braces in strings
+            self.read_value(decoder)
+        else:
+            self._pos = match.end()
+
+    def iter_object_keys(self):
+        """
+        Iterate over the keys of the object at the current position. The
+        caller must consume the value of each key before resuming.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.read_string()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise self._error('Expected "," or "}"')
+
+
+def _utf8(name):
+    try:
+        return name.encode(ENCODING).decode('utf-8')
+    except UnicodeError:
+        # \u escapes outside of latin-1, already decoded by the JSON decoder
+        return name
+
+
+def _open_at(path, offset=0):
+    binary_file = open(path, 'rb')
+    binary_file.seek(offset)
+    return io.TextIOWrapper(binary_file, encoding=ENCODING, newline='')
+
+
+def iter_profiling_json_file(path, key_decoder, chunk_size=CHUNK_SIZE,
+                             select=None):
+    """
+    Walk a profiling JSON file, yielding one
+    (entity, function, ciphersuite, byte_pairs) tuple per ciphersuite, where
+    `byte_pairs` is a list of (decoded key, value) in file order. If given,
+    only the functions for which `select(entity, function)` is true are
+    decoded, the others are skipped.
+    """
+    decoder = json.JSONDecoder(object_pairs_hook=list)
+    with _open_at(path) as json_file:
+        reader = _BufferedJSONReader(json_file, chunk_size)
+        for entity in reader.iter_object_keys():
+            entity = _utf8(entity)
+            for function in reader.iter_object_keys():
+                function = _utf8(function)
+                selected = select is None or select(entity, function)
+                for ciphersuite in reader.iter_object_keys():
+                    if not selected:
+                        reader.skip_value(decoder)
+                        continue
+                    pairs = reader.read_value(decoder)
+                    yield (entity, function, _utf8(ciphersuite),
+                           [(key_decoder(key), value) for key, value in pairs])
+
+
+def iter_function_ciphersuites(path, offset, key_decoder, chunk_size=CHUNK_SIZE):
+    """
+    Walk the function object starting at byte `offset` (see
+    `index_profiling_json_file`), yielding a (ciphersuite, byte_pairs) tuple
+    per ciphersuite, like `iter_profiling_json_file`.
+    """
+    decoder = json.JSONDecoder(object_pairs_hook=list)
+    with _open_at(path, offset) as json_file:
+        reader = _BufferedJSONReader(json_file, chunk_size, offset)
+        for ciphersuite in reader.iter_object_keys():
+            pairs = reader.read_value(decoder)
+            yield (_utf8(ciphersuite),
+                   [(key_decoder(key), value) for key, value in pairs])
+
+
+def index_profiling_json_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Pre-scan a profiling JSON file, returning
+    {entity: {function: (start, end, {ciphersuite: (start, end)})}}, in file
+    order, with the byte range of each function and ciphersuite object. The
+    ciphersuite objects are skipped without being decoded.
+    """
+    decoder = json.JSONDecoder(object_pairs_hook=list)
+    index = OrderedDict()
+    with _open_at(path) as json_file:
+        reader = _BufferedJSONReader(json_file, chunk_size)
+        for entity in reader.iter_object_keys():
+            functions = index[_utf8(entity)] = OrderedDict()
+            for function in reader.iter_object_keys():
+                reader.peek()
+                start = reader.tell()
+                ciphersuites = OrderedDict()
+                for ciphersuite in reader.iter_object_keys():
+                    reader.peek()
+                    ciphersuite_start = reader.tell()
+                    reader.skip_value(decoder)
+                    ciphersuites[_utf8(ciphersuite)] = (ciphersuite_start,
+                                                        reader.tell())
+                functions[_utf8(function)] = (start, reader.tell(), ciphersuites)
+    return index
@@ -1,9 +1,16 @@
 import ast
 import json
+import re
+import numpy
 import xlsxwriter
 
 from collections import OrderedDict
 
+from . import streaming
+
+EXCEL_MAX_SHEET_NAME = 31
+BYTE_PAIR_KEY_REGEX = re.compile(r'\(\s*(-?\d+)\s*,\s*(-?\d+)\s*\)\Z')
+
 def convert_dict_keys_to_str(orig_dict):
     if not isinstance(orig_dict, dict):
         return orig_dict
@@ -11,13 +18,49 @@ def convert_dict_keys_to_str(orig_dict):
                     for key, value in orig_dict.items())
     return dict(dict_entries)
 
-def parse_json_to_internal_dict(dictionary):
-    def convert_to_literal(value):
+def convert_to_literal(value):
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+class BytePairKeyDecoder(object):
+    """
+    Decoder for the "(sent, received)" byte pair keys. Every ciphersuite
+    uses the same set of keys, so results are memoized: each distinct key is
+    decoded once and the same tuple object is shared by all ciphersuites.
+    Keys in an unexpected format fall back to `convert_to_literal`.
+    """
+
+    def __init__(self):
+        self._interned = {}
+
+    def __call__(self, key):
         try:
-            return ast.literal_eval(value)
-        except (ValueError, SyntaxError):
-            return value
+            return self._interned[key]
+        except KeyError:
+            pass
+        match = BYTE_PAIR_KEY_REGEX.match(key)
+        if match is None:
+            value = convert_to_literal(key)
+        else:
+            value = (int(match.group(1)), int(match.group(2)))
+        self._interned[key] = value
+        return value
+
+def make_profiling_object_pairs_hook(key_decoder):
+    """
+    Build a `json` object_pairs_hook that decodes keys only on the byte pair
+    level objects, i.e. the leaves of the document, whose values are not
+    objects themselves. Entity, function and ciphersuite names are kept as is.
+    """
+    def object_pairs_hook(pairs):
+        if pairs and not isinstance(pairs[0][1], dict):
+            return OrderedDict((key_decoder(key), value) for key, value in pairs)
+        return OrderedDict(pairs)
+    return object_pairs_hook
 
+def parse_json_to_internal_dict(dictionary):
     if not isinstance(dictionary, dict):
         return dictionary
 
@@ -36,20 +79,102 @@ def parse_json_file_to_dict(path):
     written "just to work".
     """
     with open(path, 'r') as json_file:
-        json_contents = json.load(json_file, 
-                                  object_hook=parse_json_to_internal_dict)
+        object_pairs_hook = make_profiling_object_pairs_hook(BytePairKeyDecoder())
+        json_contents = json.load(json_file, object_pairs_hook=object_pairs_hook)
     return json_contents
 
-def write_excel_to_file(content, filename):
-    workbook = xlsxwriter.Workbook(filename)
-    worksheet = workbook.add_worksheet()
+def iter_profiling_json_file(path, select=None):
+    """
+    Stream the profiling JSON file one ciphersuite at a time, without
+    building the whole document in memory. See `utils.streaming`.
+    """
+    return streaming.iter_profiling_json_file(path, BytePairKeyDecoder(),
+                                              select=select)
+
+def index_profiling_json_file(path):
+    """
+    Byte ranges of every function of every entity, see `utils.streaming`.
+    """
+    return streaming.index_profiling_json_file(path)
+
+def iter_function_ciphersuites(path, offset):
+    """
+    Stream the ciphersuites of the function object at byte `offset`.
+    """
+    return streaming.iter_function_ciphersuites(path, offset,
+                                                BytePairKeyDecoder())
+
+def parse_json_bytes_to_dict(contents):
+    """
+    Decode a part of a profiling JSON file, given as bytes, like
+    `parse_json_file_to_dict` does for the whole file.
+    """
+    object_pairs_hook = make_profiling_object_pairs_hook(BytePairKeyDecoder())
+    return json.loads(contents, object_pairs_hook=object_pairs_hook)
 
-    row_index = 0
-    for row in content:
-        column_index = 0
-        for elem in row:
+def _write_row(worksheet, row_index, row):
+    """
+    Write one row, expanding the NumPy arrays it contains into cells. Arrays
+    skip the per-cell type dispatch of `worksheet.write`.
+    """
+    column_index = 0
+    for elem in row:
+        if isinstance(elem, numpy.ndarray):
+            write_cell = (worksheet.write_number if elem.dtype.kind in 'iuf'
+                          else worksheet.write)
+            for value in elem.tolist():
+                write_cell(row_index, column_index, value)
+                column_index += 1
+        else:
             worksheet.write(row_index, column_index, elem)
             column_index += 1
-        
-        row_index += 1
-    workbook.close()
\ No newline at end of file
+
+def _write_worksheet(worksheet, content):
+    for row_index, row in enumerate(content):
+        _write_row(worksheet, row_index, row)
+
+def _new_workbook(filename):
+    # in constant memory mode each row is flushed to disk as soon as the
+    #  next one is started, so rows must be written in order. NaN results
+    #  (e.g. statistics of cells without samples) are written as #NUM!
+    return xlsxwriter.Workbook(filename, {'constant_memory': True,
+                                          'nan_inf_to_errors': True})
+
+def write_excel_to_file(content, filename):
+    """
+    Write `content`, an iterable of rows, into a workbook. Rows are written
+    one at a time, so `content` can be a generator. Each row is a sequence
+    of cells, in which NumPy arrays are expanded, e.g. [label, values_array].
+    """
+    workbook = _new_workbook(filename)
+    worksheet = workbook.add_worksheet()
+    _write_worksheet(worksheet, content)
+    workbook.close()
+
+def _worksheet_name(name, used_names):
+    """
+    Make `name` a valid and unique worksheet name: at most 31 characters,
+    none of []:*?/\\.
+    """
+    name = re.sub(r'[\[\]:*?/\\]', '_', name)[:EXCEL_MAX_SHEET_NAME].strip()
+    unique_name = name
+    index = 1
+    while unique_name.lower() in used_names:
+        suffix = '~{}'.format(index)
+        unique_name = name[:EXCEL_MAX_SHEET_NAME - len(suffix)] + suffix
+        index += 1
+    used_names.add(unique_name.lower())
+    return unique_name
+
+def write_excel_sheets_to_file(sheets, filename):
+    """
+    Write several results into one workbook, `sheets` being an iterable of
+    (worksheet name, content). Names are shortened to fit in a worksheet
+    name if needed.
+    """
+    workbook = _new_workbook(filename)
+    used_names = set()
+    for name, content in sheets:
+        worksheet = workbook.add_worksheet(_worksheet_name(name, used_names))
+        _write_worksheet(worksheet, content)
+    workbook.close()